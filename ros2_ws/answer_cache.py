@@ -0,0 +1,132 @@
+"""
+Answer Cache - Cache semântico de respostas para perguntas sobre o rulebook.
+Guarda (embedding da pergunta -> resposta final, ids dos chunks usados).
+Uma pergunta nova reaproveita a resposta de outra com similaridade de cosseno
+acima do limiar do modelo de embeddings e com os mesmos termos de conteúdo
+(perguntas que só diferem por um "not" ficam muito próximas no espaço vetorial).
+Entradas são invalidadas quando os chunks de origem mudam.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import FrozenSet, Iterable, List, Optional
+
+import numpy as np
+
+from lexical_index import STOPWORDS, TOKEN_PATTERN
+from vector_utils import normalize_rows
+
+
+DEFAULT_SIMILARITY_THRESHOLD = 0.92
+DEFAULT_MAX_ENTRIES = 256
+
+# Limiar por modelo de embeddings (trecho do nome do modelo -> limiar).
+# Os hashing embeddings são lexicais: perguntas diferentes com as mesmas palavras
+# passam de 0.92 ("allowed" x "not allowed" = 0.922), então o limiar é mais alto.
+SIMILARITY_THRESHOLDS = {
+    "hashing": 0.95,
+    "nomic-embed-text": 0.92,
+    "all-MiniLM-L6-v2": 0.90,
+}
+
+# Palavras interrogativas mudam a resposta ("how" x "why"): contam como termos
+QUESTION_STOPWORDS = STOPWORDS - {"how", "what", "when", "where", "which", "who", "why"}
+
+
+def threshold_for_model(model: Optional[str]) -> float:
+    """Limiar de similaridade para o modelo de embeddings (o padrão se desconhecido)."""
+    for name, threshold in SIMILARITY_THRESHOLDS.items():
+        if model and name in model:
+            return threshold
+    return DEFAULT_SIMILARITY_THRESHOLD
+
+
+def content_terms(question: str) -> FrozenSet[str]:
+    """Termos de conteúdo da pergunta (negações e palavras interrogativas incluídas)."""
+    return frozenset(term for term in TOKEN_PATTERN.findall(question.lower())
+                     if term not in QUESTION_STOPWORDS)
+
+
+class CachedAnswer:
+    def __init__(self, question: str, vector: np.ndarray, answer: str, chunk_ids: List[str]):
+        self.question = question
+        self.vector = vector
+        self.answer = answer
+        self.chunk_ids = set(chunk_ids)
+        self.terms = content_terms(question)
+
+
+class SemanticAnswerCache:
+    """
+    Cache LRU limitado de respostas, consultado por similaridade de embeddings.
+    Sem `threshold`, usa o limiar do modelo (threshold_for_model).
+    """
+
+    def __init__(self, threshold: Optional[float] = None,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # pergunta -> CachedAnswer
+        self._matrix = None             # vetores empilhados (reconstruído quando necessário)
+        self._keys = []
+        self._model = None              # modelo de embeddings das entradas
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, question: str, vector, model: Optional[str] = None) -> Optional[CachedAnswer]:
+        """
+        Retorna a resposta mais similar acima do limiar, com os mesmos termos de
+        conteúdo da pergunta e calculada com o mesmo modelo; senão None.
+        """
+        query = normalize_rows(vector)[0]
+        threshold = self.threshold if self.threshold is not None else threshold_for_model(model)
+        terms = content_terms(question)
+        with self._lock:
+            if self._entries and model == self._model:
+                if self._matrix is None:
+                    self._keys = list(self._entries.keys())
+                    self._matrix = np.stack([self._entries[key].vector for key in self._keys])
+                scores = self._matrix @ query
+                for best in np.argsort(-scores):
+                    if scores[best] < threshold:
+                        break
+                    entry = self._entries[self._keys[best]]
+                    if entry.terms == terms:
+                        self._entries.move_to_end(entry.question)
+                        self.hits += 1
+                        return entry
+            self.misses += 1
+            return None
+
+    def store(self, question: str, vector, answer: str, chunk_ids: Iterable[str],
+              model: Optional[str] = None):
+        with self._lock:
+            if model != self._model:
+                # Vetores de outro modelo não são comparáveis com os novos
+                self._entries.clear()
+                self._model = model
+            self._entries[question] = CachedAnswer(question, normalize_rows(vector)[0], answer, list(chunk_ids))
+            self._entries.move_to_end(question)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def invalidate(self, added_ids: Optional[Iterable[str]] = None,
+                   removed_ids: Optional[Iterable[str]] = None):
+        """
+        Chamado quando o índice muda. Chunks novos podem mudar qualquer resposta,
+        então esvaziam o cache; chunks removidos derrubam só as respostas que os usaram.
+        """
+        with self._lock:
+            if (added_ids is None and removed_ids is None) or added_ids:
+                self._entries.clear()
+            elif removed_ids:
+                removed = set(removed_ids)
+                for key in [k for k, entry in self._entries.items() if entry.chunk_ids & removed]:
+                    del self._entries[key]
+            self._matrix = None
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
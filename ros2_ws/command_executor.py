@@ -0,0 +1,137 @@
+"""
+Command Executor - Agente ReAct de comandos construído uma única vez.
+create_react_agent renderiza a descrição e os nomes das ferramentas no prompt e
+monta o grafo de runnables (prompt -> LLM com stop -> parser); o AgentExecutor
+envolve esse grafo com o laço de ferramentas. Tudo isso é feito na criação do
+CommandExecutor e reaproveitado em todos os comandos.
+
+O estado de cada comando (agent_scratchpad, passos intermediários) vive só dentro
+de uma chamada a invoke(); o que fica guardado entre chamadas (os passos do último
+comando) é limpo explicitamente por reset() no início de cada comando.
+Os comandos são serializados por um lock: as ferramentas atuam sobre um único robô
+(cômodo atual, pessoas conhecidas) e não devem intercalar ações de dois pedidos.
+
+stream() executa o mesmo comando repassando os tokens da "Final Answer" à medida
+que a LLM os gera (os passos intermediários não são exibidos).
+"""
+
+import queue
+import threading
+import time
+from typing import Dict, Iterator, List
+
+from langchain.agents import AgentExecutor, create_react_agent
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+DEFAULT_MAX_ITERATIONS = 15
+FINAL_ANSWER_MARKER = "Final Answer:"
+
+
+class FinalAnswerStreamHandler(BaseCallbackHandler):
+    """
+    Callback que acompanha os tokens de cada geração da LLM e, a partir do
+    marcador "Final Answer:", coloca os tokens seguintes na fila.
+    """
+
+    def __init__(self, tokens: queue.Queue):
+        self.tokens = tokens
+        self.streamed = False     # algum token da resposta final foi repassado
+        self._buffer = ""
+        self._in_answer = False
+
+    def _start_generation(self):
+        self._buffer = ""
+        self._in_answer = False
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self._start_generation()
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self._start_generation()
+
+    def on_llm_new_token(self, token: str, **kwargs):
+        if self._in_answer:
+            self.tokens.put(token)
+            self.streamed = True
+            return
+        self._buffer += token
+        position = self._buffer.find(FINAL_ANSWER_MARKER)
+        if position >= 0:
+            self._in_answer = True
+            answer = self._buffer[position + len(FINAL_ANSWER_MARKER):].lstrip()
+            if answer:
+                self.tokens.put(answer)
+                self.streamed = True
+
+
+class CommandExecutor:
+    """AgentExecutor ReAct reutilizável e thread-safe."""
+
+    def __init__(self, llm, tools, prompt, max_iterations: int = DEFAULT_MAX_ITERATIONS):
+        start_time = time.perf_counter()
+        agent = create_react_agent(llm, tools, prompt)
+        self._executor = AgentExecutor(
+            agent=agent,
+            tools=tools,
+            verbose=False,
+            handle_parsing_errors=True,
+            max_iterations=max_iterations,
+            return_intermediate_steps=True
+        )
+        self._lock = threading.Lock()
+        self.last_steps: List = []
+        self.commands = 0
+        self.build_seconds = time.perf_counter() - start_time
+
+    def reset(self):
+        """Descarta o estado do comando anterior (passos intermediários)."""
+        self.last_steps = []
+
+    def invoke(self, user_input: str) -> Dict:
+        """Executa um comando com o scratchpad limpo. Retorna a resposta do AgentExecutor."""
+        with self._lock:
+            self.reset()
+            response = self._executor.invoke({"input": user_input})
+            self.last_steps = response.get("intermediate_steps", [])
+            self.commands += 1
+            return response
+
+    def stream(self, user_input: str) -> Iterator[str]:
+        """
+        Executa um comando (como invoke) gerando os pedaços da resposta final
+        assim que são produzidos. Se a resposta não veio de uma "Final Answer"
+        (ex.: limite de iterações), ela é gerada inteira no final.
+        Exceções do agente são repassadas ao consumidor.
+        """
+        tokens = queue.Queue()
+        handler = FinalAnswerStreamHandler(tokens)
+        done = object()
+        result = {}
+
+        def run():
+            try:
+                with self._lock:
+                    self.reset()
+                    response = self._executor.invoke({"input": user_input}, config={"callbacks": [handler]})
+                    self.last_steps = response.get("intermediate_steps", [])
+                    self.commands += 1
+                    result["response"] = response
+            except Exception as e:
+                result["error"] = e
+            finally:
+                tokens.put(done)
+
+        worker = threading.Thread(target=run, name="command-stream", daemon=True)
+        worker.start()
+        while True:
+            token = tokens.get()
+            if token is done:
+                break
+            yield token
+        worker.join()
+
+        if "error" in result:
+            raise result["error"]
+        if not handler.streamed:
+            yield result["response"]["output"]
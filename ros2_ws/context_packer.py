@@ -0,0 +1,170 @@
+"""
+Context Packer - Monta o contexto enviado à LLM a partir dos chunks recuperados.
+Junta chunks sobrepostos ou adjacentes da mesma página (ou seção), remove trechos
+repetidos (cabeçalhos, rodapés, sobreposição do splitter) e encaixa o resultado
+num orçamento de tokens.
+"""
+
+import re
+from typing import List, Optional, Tuple
+
+
+# Aproximação de tokens por caractere para texto em inglês (~4 chars/token)
+CHARS_PER_TOKEN = 4
+# Sobreposição máxima procurada entre chunks consecutivos (chunk_overlap do splitter = 150)
+MAX_TEXT_OVERLAP = 400
+MIN_TEXT_OVERLAP = 20
+# Linhas mais curtas que isso não são consideradas repetições (ex.: "1.", "Score")
+MIN_DUPLICATE_LINE_CHARS = 25
+# Não vale a pena incluir um trecho truncado menor que isso
+MIN_SEGMENT_TOKENS = 40
+# Separador entre trechos no contexto (também conta no orçamento)
+SEGMENT_SEPARATOR = "\n\n"
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa barata do número de tokens de um texto."""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+class _Segment:
+    """Trecho contínuo de uma página, formado por um ou mais chunks."""
+
+    def __init__(self, doc, rank):
+        self.text = doc.page_content
+        self.documents = [doc]
+        self.rank = rank
+        # Chunks de seção (section_chunker) têm start_index relativo à seção, não à página
+        section_id = doc.metadata.get("section_id")
+        self.key = (doc.metadata.get("source"), section_id) if section_id else \
+            (doc.metadata.get("source"), doc.metadata.get("page"))
+        self.start = doc.metadata.get("start_index")
+
+    @property
+    def end(self):
+        return None if self.start is None else self.start + len(self.text)
+
+
+def _text_overlap(left: str, right: str) -> int:
+    """Tamanho do maior sufixo de `left` que é prefixo de `right`."""
+    longest = min(len(left), len(right), MAX_TEXT_OVERLAP)
+    for size in range(longest, MIN_TEXT_OVERLAP - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def _try_merge(first: _Segment, second: _Segment) -> Optional[Tuple[str, Optional[int]]]:
+    """
+    Funde dois trechos se forem sobrepostos ou adjacentes na mesma página.
+    Usa start_index quando disponível; senão procura a sobreposição no texto.
+    Retorna (texto fundido, start_index) ou None.
+    """
+    if first.key != second.key:
+        return None
+
+    if first.start is not None and second.start is not None:
+        if second.start < first.start:
+            first, second = second, first
+        if second.start > first.end:
+            return None
+        return first.text + second.text[first.end - second.start:], first.start
+
+    overlap = _text_overlap(first.text, second.text)
+    if overlap:
+        return first.text + second.text[overlap:], None
+    overlap = _text_overlap(second.text, first.text)
+    if overlap:
+        return second.text + first.text[overlap:], None
+    return None
+
+
+def merge_segments(documents) -> List[_Segment]:
+    """Agrupa os documentos em trechos contínuos, mantendo a ordem de relevância."""
+    segments = []
+    for rank, doc in enumerate(documents):
+        segment = _Segment(doc, rank)
+        merged = True
+        # Um novo chunk pode ligar dois trechos já existentes; repetir até estabilizar
+        while merged:
+            merged = False
+            for existing in segments:
+                result = _try_merge(existing, segment)
+                if result:
+                    existing.text, existing.start = result
+                    existing.documents.extend(segment.documents)
+                    existing.rank = min(existing.rank, segment.rank)
+                    segments.remove(existing)
+                    segment = existing
+                    merged = True
+                    break
+        segments.append(segment)
+    return sorted(segments, key=lambda s: s.rank)
+
+
+def _normalize_line(line: str) -> str:
+    return re.sub(r"\s+", " ", line).strip().lower()
+
+
+def _strip_duplicate_lines(text: str, seen_lines: set) -> str:
+    """Remove linhas já vistas em trechos anteriores (cabeçalhos, rodapés, repetições)."""
+    kept = []
+    for line in text.split("\n"):
+        normalized = _normalize_line(line)
+        if len(normalized) >= MIN_DUPLICATE_LINE_CHARS:
+            if normalized in seen_lines:
+                continue
+            seen_lines.add(normalized)
+        kept.append(line)
+    return "\n".join(kept).strip()
+
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Corta o texto no orçamento, de preferência no fim de uma frase."""
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    sentence_end = max(cut.rfind(". "), cut.rfind(".\n"), cut.rfind("\n"))
+    if sentence_end > limit // 2:
+        cut = cut[:sentence_end + 1]
+    return cut.rstrip()
+
+
+def pack_context(documents, max_tokens: Optional[int] = None) -> Tuple[str, list]:
+    """
+    Monta o contexto: funde trechos sobrepostos/adjacentes, remove linhas repetidas
+    e inclui os trechos por ordem de relevância até esgotar `max_tokens`.
+    Retorna (contexto, documentos que contribuíram para ele).
+    """
+    seen_lines = set()
+    seen_headings = set()
+    parts = []
+    used_documents = []
+    remaining = max_tokens
+
+    for segment in merge_segments(documents):
+        text = _strip_duplicate_lines(segment.text, seen_lines)
+        if not text:
+            continue
+        # Chunks de seção: o caminho de títulos identifica o trecho para a LLM
+        heading = segment.documents[0].metadata.get("heading_path")
+        if heading and heading not in seen_headings:
+            seen_headings.add(heading)
+            text = f"[{heading}]\n{text}"
+        if remaining is not None:
+            if parts:
+                remaining -= estimate_tokens(SEGMENT_SEPARATOR)
+            tokens = estimate_tokens(text)
+            if tokens > remaining:
+                if remaining < MIN_SEGMENT_TOKENS:
+                    break
+                text = _truncate_to_tokens(text, remaining)
+                tokens = estimate_tokens(text)
+            remaining -= tokens
+        parts.append(text)
+        used_documents.extend(segment.documents)
+        if remaining is not None and remaining <= 0:
+            break
+
+    return SEGMENT_SEPARATOR.join(parts), used_documents
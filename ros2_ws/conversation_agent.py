@@ -1,5 +1,7 @@
 from langchain_ollama import ChatOllama
 from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
+import itertools
+import re
 import yaml
 
 # Import do RAG pipeline
@@ -17,50 +19,81 @@ with open('Prompts/conversation_prompt.yaml', 'r') as file:
 conversation_prompt_template = PromptTemplate.from_template(conversation_prompt)
 
 
+# Mensagens fixas e frases que a LLM usava antes do prefixo de veredito
+COMMAND_PHRASE = "I understand you want me to perform a command"
+OUT_OF_DOMAIN_PHRASE = "I apologize, but I am a household assistant robot and cannot provide information about topics outside my domain"
+OUT_OF_DOMAIN_RESPONSE = "I apologize, but I am a household assistant robot and cannot provide information about topics outside my domain. I am designed to help with household tasks like picking up objects, navigating rooms, and delivering items."
+
+# Veredito no início da resposta: [COMMAND], [OUT_OF_DOMAIN] ou [CHAT]
+VERDICT_PATTERN = re.compile(r"^\s*\[?\s*(COMMAND|OUT_OF_DOMAIN|CHAT)\b\s*\]?\s*:?\s*", re.IGNORECASE)
+# Restos do veredito que podem chegar em tokens separados ("]", ":", quebras de linha)
+TAG_RESIDUE_PATTERN = re.compile(r"^[\s\]:]*")
+
+
+def parse_verdict(content: str):
+    """
+    Separate the verdict tag from the reply.
+    Returns (verdict, reply) with verdict in "command", "out_of_domain" or "chat".
+    If the model ignores the format, the verdict comes from the legacy phrases.
+    """
+    match = VERDICT_PATTERN.match(content)
+    if match:
+        return match.group(1).lower(), content[match.end():].strip()
+    if COMMAND_PHRASE in content:
+        return "command", content.strip()
+    if OUT_OF_DOMAIN_PHRASE in content:
+        return "out_of_domain", content.strip()
+    return "chat", content.strip()
+
+
+def format_turn_prompt(user_input: str, rag_context: str = "") -> str:
+    if rag_context:
+        enhanced_input = f"Based on this context from my knowledge base:\n\n{rag_context}\n\nUser question: {user_input}"
+    else:
+        enhanced_input = user_input
+    return conversation_prompt_template.format(input=enhanced_input)
+
+
+def generate_turn(user_input: str, rag_context: str = ""):
+    """
+    One LLM call per conversational turn: the reply starts with the verdict
+    (command / out of domain / chat), followed by the answer itself.
+    Returns (verdict, reply).
+    """
+    response = conversation_llm.invoke(format_turn_prompt(user_input, rag_context))
+    return parse_verdict(response.content)
+
+
+def _verdict_pending(buffer: str) -> bool:
+    """True while the start of the streamed reply can still turn into (or extend) a verdict tag or legacy phrase."""
+    text = buffer.lstrip()
+    match = VERDICT_PATTERN.match(text)
+    if match:
+        # The tag is over after a closing "]" or ":", a newline or any other character after the label
+        tail = text[match.end(1):match.end()]
+        return match.end() == len(text) and not any(char in tail for char in "]:\n")
+    if "\n" in text:
+        return False
+    upper = text.upper()
+    tags = ("[COMMAND]", "[OUT_OF_DOMAIN]", "[CHAT]", "COMMAND", "OUT_OF_DOMAIN", "CHAT")
+    if any(tag.startswith(upper) for tag in tags):
+        return True
+    # Legacy phrases only count at the start of the reply when streaming
+    return any(phrase.startswith(text) for phrase in (COMMAND_PHRASE, OUT_OF_DOMAIN_PHRASE))
+
+
 def is_within_domain(user_input: str) -> bool:
     """
-    Check if the user input is within the robot's domain.
-    Use your natural language processing capabilities to interpret the user input
-    Returns True if the input is related to household tasks or robot capabilities.
-    If the input is not related to household tasks or robot capabilities, return False.
-    If the input is ambiguous, use your natural language processing capabilities to interpret the user input, and if the user ask you to do something that you can do, return True.
-    For example for ambiguous topics:
-    User: Help me with my homework
-    You: I'm a household assistant robot. I can help you with household tasks like picking up objects, navigating rooms, and delivering items. Do you need help with something like that?
-    User: Pick up the pencil
-    You: I understand you want me to perform a command. Let me switch to command mode.
+    Check if the user input is within the robot's domain (household tasks or robot capabilities).
+    Commands and ambiguous inputs count as within the domain.
+    process_conversation gets this verdict from the same call that generates the reply.
     """
     try:
-        # Use the LLM to analyze if the input is within domain
-        response = conversation_llm.invoke(
-            conversation_prompt_template.format(input=user_input)
-        )
-        
-        # Check if the response indicates it's a command
-        if "I understand you want me to perform a command" in response.content:
-            return True
-            
-        # Check if the response indicates it's outside domain
-        if "I apologize, but I am a household assistant robot and cannot provide information about topics outside my domain" in response.content:
-            return False
-            
-        # For ambiguous cases, check if the response suggests household-related tasks
-        if any(phrase in response.content.lower() for phrase in [
-            "household tasks",
-            "picking up objects",
-            "navigating rooms",
-            "delivering items",
-            "help you with"
-        ]):
-            return True
-            
-        # Default to True for other cases, as the LLM will handle the response appropriately
-        return True
-        
+        return generate_turn(user_input)[0] != "out_of_domain"
     except Exception as e:
         # In case of any error, default to True to allow the conversation to continue
         return True
-    return True
+
 
 def get_rag_context(user_input: str) -> str:
     """
@@ -92,27 +125,59 @@ def process_conversation(user_input: str) -> str:
     Uses RAG context for robotics-related questions.
     """
     try:
-        # First check if the topic is within domain
-        if not is_within_domain(user_input):
-            return "I apologize, but I am a household assistant robot and cannot provide information about topics outside my domain. I am designed to help with household tasks like picking up objects, navigating rooms, and delivering items."
-        
-        # Get RAG context if relevant
+        # Get RAG context if relevant (no LLM call)
         rag_context = get_rag_context(user_input)
-        
-        # Modify the prompt to include RAG context if available
-        if rag_context:
-            enhanced_input = f"Based on this context from my knowledge base:\n\n{rag_context}\n\nUser question: {user_input}"
-        else:
-            enhanced_input = user_input
-            
-        response = conversation_llm.invoke(
-            conversation_prompt_template.format(input=enhanced_input)
-        )
-        
-        # Verifica se a resposta indica que é um comando
-        if "I understand you want me to perform a command" in response.content:
+
+        # Single generation: domain/command verdict + reply
+        verdict, reply = generate_turn(user_input, rag_context)
+
+        if verdict == "command":
             return "__COMMAND_MODE__"
-            
-        return response.content
+        if verdict == "out_of_domain":
+            return OUT_OF_DOMAIN_RESPONSE
+        return reply
     except Exception as e:
         return f"Sorry, I had a problem processing your message: {e}"
+
+
+def process_conversation_stream(user_input: str):
+    """
+    Streaming version of process_conversation: yields the reply in chunks as the
+    LLM produces them. The verdict is read from the first tokens; for a command
+    the only chunk is "__COMMAND_MODE__", and out-of-domain inputs get the fixed
+    message without waiting for the rest of the generation.
+    """
+    try:
+        rag_context = get_rag_context(user_input)
+        chunks = conversation_llm.stream(format_turn_prompt(user_input, rag_context))
+
+        # Retém o início da resposta até o veredito ficar claro
+        buffer = ""
+        for chunk in chunks:
+            buffer += chunk.content
+            if not _verdict_pending(buffer):
+                break
+
+        verdict, _ = parse_verdict(buffer)
+        match = VERDICT_PATTERN.match(buffer)
+        reply = buffer[match.end():] if match else buffer
+        if verdict == "command":
+            chunks.close()
+            yield "__COMMAND_MODE__"
+            return
+        if verdict == "out_of_domain":
+            chunks.close()
+            yield OUT_OF_DOMAIN_RESPONSE
+            return
+
+        # Até o primeiro pedaço não vazio, descarta restos do veredito; depois disso
+        # nada é removido (o espaço entre um pedaço e o próximo é preservado)
+        started = False
+        for text in itertools.chain([reply], (chunk.content for chunk in chunks)):
+            if not started:
+                text = TAG_RESIDUE_PATTERN.sub("", text) if match else text.lstrip()
+                started = bool(text)
+            if text:
+                yield text
+    except Exception as e:
+        yield f"Sorry, I had a problem processing your message: {e}"
@@ -0,0 +1,278 @@
+"""
+Embedding Cache - Cache persistente de embeddings endereçado por conteúdo.
+Cada vetor é indexado por (nome do modelo de embeddings, hash SHA-256 do texto),
+de modo que reconstruir o vector store só paga pelos chunks realmente novos.
+Também mantém um cache LRU em memória para embeddings de consultas.
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+
+DEFAULT_CACHE_PATH = "../Classifier_XML/embedding_cache/embeddings.sqlite3"
+DEFAULT_QUERY_CACHE_SIZE = 512
+
+
+def text_hash(text: str) -> str:
+    """Hash estável do conteúdo de um chunk."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def embedding_model_name(embeddings) -> str:
+    """Identifica o modelo de embeddings (faz parte da chave do cache)."""
+    for attr in ("model", "model_name"):
+        name = getattr(embeddings, attr, None)
+        if name:
+            return f"{type(embeddings).__name__}:{name}"
+    return type(embeddings).__name__
+
+
+class PersistentEmbeddingCache:
+    """
+    Armazena vetores em SQLite, chave (modelo, hash do texto).
+    Os vetores são gravados como float32 contíguo.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL,"
+            " text_hash TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " PRIMARY KEY (model, text_hash))"
+        )
+        self._conn.commit()
+
+    def get_many(self, model: str, hashes: Iterable[str]) -> Dict[str, List[float]]:
+        """Retorna {hash: vetor} para os hashes já presentes no cache."""
+        hashes = list(dict.fromkeys(hashes))
+        found = {}
+        with self._lock:
+            # SQLite limita o número de parâmetros por consulta
+            for i in range(0, len(hashes), 500):
+                batch = hashes[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch],
+                ).fetchall()
+                for h, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[h] = vector.tolist()
+        return found
+
+    def put_many(self, model: str, items: Iterable[Tuple[str, List[float]]]):
+        """Grava (hash, vetor) no cache numa única transação."""
+        rows = [(model, h, array("f", vector).tobytes()) for h, vector in items]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    def count(self, model: Optional[str] = None) -> int:
+        with self._lock:
+            if model is None:
+                return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM embeddings WHERE model = ?", (model,)
+            ).fetchone()[0]
+
+
+def query_cache_key(text: str) -> str:
+    """
+    Chave para consultas quase repetidas: ignora caixa, espaços extras
+    e pontuação final ("What is the arena?" == "what is the  arena").
+    """
+    key = re.sub(r"\s+", " ", text.lower()).strip()
+    return key.rstrip("?!.;: ")
+
+
+class QueryEmbeddingCache:
+    """
+    Cache LRU limitado e thread-safe de embeddings de consultas, chave
+    (modelo, query_cache_key): trocar de embedder no mesmo processo não
+    reaproveita vetores de outro modelo.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_QUERY_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, model: str, key: str) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._entries.get((model, key))
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((model, key))
+            self.hits += 1
+            return vector
+
+    def put(self, model: str, key: str, vector: List[float]):
+        with self._lock:
+            self._entries[(model, key)] = vector
+            self._entries.move_to_end((model, key))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wrapper de Embeddings que consulta o cache persistente antes de chamar o modelo.
+    embed_documents (ingestão) usa o cache em disco; embed_query/embed_queries
+    (consultas) usam o cache LRU em memória, sem gravar consultas no disco.
+    """
+
+    def __init__(self, embeddings, cache: PersistentEmbeddingCache, model_name: Optional[str] = None,
+                 query_cache: Optional[QueryEmbeddingCache] = None):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = model_name or embedding_model_name(embeddings)
+        self.query_cache = query_cache if query_cache is not None else get_query_cache()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup_documents(self, texts: List[str]):
+        """Hashes, vetores já em cache e textos ainda não vistos (sem duplicatas)."""
+        hashes = [text_hash(t) for t in texts]
+        cached = self.cache.get_many(self.model_name, hashes)
+        missing = {}
+        for h, t in zip(hashes, texts):
+            if h not in cached and h not in missing:
+                missing[h] = t
+        return hashes, cached, missing
+
+    def _store_documents(self, texts, hashes, cached, missing, new_vectors) -> List[List[float]]:
+        if missing:
+            new_items = list(zip(missing.keys(), new_vectors))
+            self.cache.put_many(self.model_name, new_items)
+            cached.update(new_items)
+        self.misses += len(missing)
+        self.hits += len(texts) - len(missing)
+        return [list(cached[h]) for h in hashes]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes, cached, missing = self._lookup_documents(texts)
+        new_vectors = self.embeddings.embed_documents(list(missing.values())) if missing else []
+        return self._store_documents(texts, hashes, cached, missing, new_vectors)
+
+    def _lookup_queries(self, texts: List[str]):
+        """Chaves das consultas, vetores já no cache LRU e consultas que faltam."""
+        keys = [query_cache_key(t) for t in texts]
+        vectors = {}
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key in vectors or key in missing:
+                continue
+            vector = self.query_cache.get(self.model_name, key)
+            if vector is None:
+                missing[key] = text
+            else:
+                vectors[key] = vector
+        return keys, vectors, missing
+
+    def _store_queries(self, keys, vectors, missing, new_vectors) -> List[List[float]]:
+        for key, vector in zip(missing.keys(), new_vectors):
+            self.query_cache.put(self.model_name, key, vector)
+            vectors[key] = vector
+        return [vectors[key] for key in keys]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embeddings de várias consultas: respostas do cache LRU quando possível,
+        e as que faltam (sem repetições) pelo embed_query do modelo, que pode
+        tratar consultas de forma diferente dos documentos (prefixos, instruções).
+        """
+        keys, vectors, missing = self._lookup_queries(texts)
+        new_vectors = [self.embeddings.embed_query(text) for text in missing.values()]
+        return self._store_queries(keys, vectors, missing, new_vectors)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_queries([text])[0]
+
+    # ==================== ASYNC ====================
+
+    async def _aembed_model(self, texts: List[str]) -> List[List[float]]:
+        """Chamada assíncrona ao modelo (cliente async nativo, ou thread se não houver)."""
+        if hasattr(self.embeddings, "aembed_documents"):
+            return await self.embeddings.aembed_documents(texts)
+        return await asyncio.to_thread(self.embeddings.embed_documents, texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes, cached, missing = self._lookup_documents(texts)
+        new_vectors = await self._aembed_model(list(missing.values())) if missing else []
+        return self._store_documents(texts, hashes, cached, missing, new_vectors)
+
+    async def _aembed_model_query(self, text: str) -> List[float]:
+        if hasattr(self.embeddings, "aembed_query"):
+            return await self.embeddings.aembed_query(text)
+        return await asyncio.to_thread(self.embeddings.embed_query, text)
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Versão assíncrona de embed_queries: não bloqueia o event loop na chamada
+        HTTP, e as consultas que faltam são embutidas em paralelo.
+        """
+        keys, vectors, missing = self._lookup_queries(texts)
+        new_vectors = await asyncio.gather(*[self._aembed_model_query(text) for text in missing.values()])
+        return self._store_queries(keys, vectors, missing, list(new_vectors))
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_queries([text]))[0]
+
+
+_cache_instance = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache(path: str = DEFAULT_CACHE_PATH) -> PersistentEmbeddingCache:
+    """Retorna a instância global do cache (singleton por processo)."""
+    global _cache_instance
+    with _cache_lock:
+        if _cache_instance is None:
+            _cache_instance = PersistentEmbeddingCache(path)
+        return _cache_instance
+
+
+_query_cache_instance = None
+
+
+def get_query_cache(maxsize: int = DEFAULT_QUERY_CACHE_SIZE) -> QueryEmbeddingCache:
+    """Retorna o cache LRU de consultas compartilhado pelo processo."""
+    global _query_cache_instance
+    with _cache_lock:
+        if _query_cache_instance is None:
+            _query_cache_instance = QueryEmbeddingCache(maxsize)
+        return _query_cache_instance
@@ -0,0 +1,77 @@
+"""
+Hashing Embeddings - Embeddings locais sem download de modelo nem servidor.
+Cada texto vira um vetor esparso de n-gramas (palavras, bigramas de palavras e
+n-gramas de caracteres) projetado por feature hashing numa dimensão fixa, com
+peso sublinear (log 1 + tf) e norma L2 unitária. Só depende de NumPy.
+
+Não substitui um modelo semântico em qualidade, mas permite construir, testar e
+medir o pipeline de recuperação e o roteamento em milissegundos, offline.
+"""
+
+import re
+import zlib
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from lexical_index import tokenize
+
+
+DEFAULT_DIMENSIONS = 1024
+CHAR_NGRAM_SIZES = (3, 4, 5)
+# Peso relativo de cada família de features
+WORD_WEIGHT = 1.0
+BIGRAM_WEIGHT = 0.7
+CHAR_WEIGHT = 0.35
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def _hash(feature: str) -> int:
+    """Hash determinístico entre processos (o hash() do Python é aleatorizado)."""
+    return zlib.crc32(feature.encode("utf-8"))
+
+
+class HashingEmbeddings(Embeddings):
+    """Embeddings por feature hashing (sinal pelo bit alto do hash, para reduzir colisões)."""
+
+    def __init__(self, dimensions: int = DEFAULT_DIMENSIONS):
+        self.dimensions = dimensions
+        # Identifica o modelo no cache de embeddings (mudar a dimensão muda os vetores)
+        self.model = f"hashing-{dimensions}"
+
+    def _features(self, text: str):
+        words = tokenize(text)
+        for word in words:
+            yield "w:" + word, WORD_WEIGHT
+        for first, second in zip(words, words[1:]):
+            yield f"b:{first} {second}", BIGRAM_WEIGHT
+        for word in WORD_PATTERN.findall(text.lower()):
+            padded = f"<{word}>"
+            for size in CHAR_NGRAM_SIZES:
+                for start in range(len(padded) - size + 1):
+                    yield "c:" + padded[start:start + size], CHAR_WEIGHT
+
+    def _vectorize(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts = {}
+            for feature, weight in self._features(text):
+                h = _hash(feature)
+                index = h % self.dimensions
+                sign = 1.0 if h & 0x80000000 else -1.0
+                counts[index] = counts.get(index, 0.0) + sign * weight
+            if counts:
+                indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+                values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+                matrix[row, indices] = np.sign(values) * np.log1p(np.abs(values))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._vectorize(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._vectorize([text])[0].tolist()
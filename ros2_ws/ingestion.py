@@ -0,0 +1,353 @@
+"""
+Ingestion - Extração, chunking e embedding de documentos para a base de conhecimento.
+A extração de PDFs roda em paralelo num pool de processos, e tanto o texto das
+páginas quanto os chunks resultantes ficam em cache em disco, chaveados pelo
+hash do arquivo e pelos parâmetros do splitter. Reconstruções posteriores não
+precisam reprocessar o PDF.
+
+A ingestão é um pipeline de geradores ligados por filas limitadas: cada estágio
+só produz quando o seguinte consome, e a memória fica limitada pela maior fonte,
+não pelo tamanho da base de conhecimento.
+
+Este módulo não importa o rag_pipeline: os workers do pool podem importá-lo
+sem disparar a inicialização do vector store.
+"""
+
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from langchain_core.documents import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+
+INGEST_CACHE_DIR = "../Classifier_XML/ingest_cache"
+
+# Parâmetros padrão do splitter (fazem parte da chave do cache de chunks)
+SPLITTER_PARAMS = {
+    "chunk_size": 1000,
+    "chunk_overlap": 150,
+    "separators": ["\n\n", "\n", ".", "!", "?", ";", ":", " ", ""],
+}
+
+# Mínimo de páginas por worker (abaixo disso o overhead do processo não compensa)
+PAGES_PER_WORKER = 8
+
+
+def file_hash(path: str) -> str:
+    """SHA-256 do conteúdo do arquivo."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _params_hash(params: Dict) -> str:
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def _read_cache(name: str):
+    path = os.path.join(INGEST_CACHE_DIR, name)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"[Ingestion] Cache inválido ignorado ({name}): {e}")
+        return None
+
+
+def _write_cache(name: str, data):
+    os.makedirs(INGEST_CACHE_DIR, exist_ok=True)
+    path = os.path.join(INGEST_CACHE_DIR, name)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
+
+# ==================== EXTRAÇÃO DE PDF ====================
+
+def _extract_page_range(path: str, start: int, end: int) -> List[str]:
+    """Worker: extrai o texto das páginas [start, end) de um PDF."""
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+def extract_pdf_pages(path: str, max_workers: Optional[int] = None) -> List[str]:
+    """
+    Retorna o texto de cada página do PDF.
+    Usa o cache (chave: hash do arquivo) ou extrai em paralelo num pool de processos.
+    """
+    from pypdf import PdfReader
+
+    cache_name = f"pages_{file_hash(path)}.json"
+    cached = _read_cache(cache_name)
+    if cached is not None:
+        print(f"[Ingestion] {len(cached)} páginas de {os.path.basename(path)} lidas do cache")
+        return cached
+
+    n_pages = len(PdfReader(path).pages)
+    workers = max_workers or os.cpu_count() or 1
+    workers = max(1, min(workers, n_pages // PAGES_PER_WORKER))
+    step = -(-n_pages // workers)
+    ranges = [(start, min(start + step, n_pages)) for start in range(0, n_pages, step)]
+
+    if workers == 1:
+        pages = _extract_page_range(path, 0, n_pages)
+    else:
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                parts = pool.map(_extract_page_range, [path] * len(ranges),
+                                 [start for start, _ in ranges], [end for _, end in ranges])
+                pages = [text for part in parts for text in part]
+        except Exception as e:
+            print(f"[Ingestion] Extração paralela falhou ({e}), extraindo em série")
+            pages = _extract_page_range(path, 0, n_pages)
+
+    _write_cache(cache_name, pages)
+    print(f"[Ingestion] {n_pages} páginas de {os.path.basename(path)} extraídas com {workers} processo(s)")
+    return pages
+
+
+def load_pdf_documents(path: str, metadata: Optional[Dict] = None,
+                       max_workers: Optional[int] = None) -> List[Document]:
+    """Carrega um PDF como uma lista de Documents (uma por página, como o PyPDFLoader)."""
+    pages = extract_pdf_pages(path, max_workers=max_workers)
+    documents = []
+    for page_number, text in enumerate(pages):
+        page_metadata = {"source": path, "page": page_number}
+        page_metadata.update(metadata or {})
+        documents.append(Document(page_content=text, metadata=page_metadata))
+    return documents
+
+
+# ==================== CHUNKING ====================
+
+def _documents_hash(documents: List[Document]) -> str:
+    digest = hashlib.sha256()
+    for doc in documents:
+        digest.update(hashlib.sha256(doc.page_content.encode("utf-8")).digest())
+        digest.update(json.dumps(doc.metadata, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+# Metadados estruturais que fazem parte do id do chunk (mudou a seção, muda o id)
+STRUCTURAL_METADATA = ("section_id", "chunk_index", "section_chunks")
+
+
+def assign_chunk_ids(chunks: List[Document]) -> List[Document]:
+    """
+    Atribui um id estável a cada chunk (metadata["chunk_id"]):
+    fonte, página, posição na página e hash do texto (e da posição na seção, se houver).
+    """
+    positions = {}
+    for chunk in chunks:
+        key = (chunk.metadata.get("source"), chunk.metadata.get("page"))
+        index = positions.get(key, 0)
+        positions[key] = index + 1
+        structure = [chunk.metadata.get(name) for name in STRUCTURAL_METADATA if name in chunk.metadata]
+        digest_input = chunk.page_content + (json.dumps(structure) if structure else "")
+        digest = hashlib.sha256(digest_input.encode("utf-8")).hexdigest()[:12]
+        chunk.metadata["chunk_id"] = f"{key[0]}:{key[1]}:{index}:{digest}"
+    return chunks
+
+
+def split_documents(documents: List[Document], **splitter_overrides) -> List[Document]:
+    """
+    Divide documentos em chunks com o RecursiveCharacterTextSplitter.
+    O resultado (texto + metadados, incluindo start_index) fica em cache,
+    chaveado pelo conteúdo dos documentos e pelos parâmetros do splitter.
+    Cada chunk recebe um id estável em metadata["chunk_id"].
+    """
+    params = dict(SPLITTER_PARAMS, **splitter_overrides)
+    cache_name = f"chunks_{_documents_hash(documents)[:32]}_{_params_hash(params)}.json"
+
+    cached = _read_cache(cache_name)
+    if cached is not None:
+        return assign_chunk_ids([Document(page_content=c["text"], metadata=c["metadata"]) for c in cached])
+
+    splitter = RecursiveCharacterTextSplitter(add_start_index=True, **params)
+    chunks = assign_chunk_ids(splitter.split_documents(documents))
+    _write_cache(cache_name, [{"text": c.page_content, "metadata": c.metadata} for c in chunks])
+    return chunks
+
+
+def split_sections(documents: List[Document], **splitter_overrides) -> List[Document]:
+    """
+    Divide as páginas de um documento em chunks alinhados às seções (ver section_chunker).
+    Mesmo cache em disco de split_documents, com chave própria.
+    """
+    from section_chunker import SECTION_SPLITTER_PARAMS, chunk_sections
+
+    params = dict(SECTION_SPLITTER_PARAMS, **splitter_overrides)
+    cache_name = f"sections_{_documents_hash(documents)[:32]}_{_params_hash(params)}.json"
+
+    cached = _read_cache(cache_name)
+    if cached is not None:
+        return assign_chunk_ids([Document(page_content=c["text"], metadata=c["metadata"]) for c in cached])
+
+    chunks = assign_chunk_ids(chunk_sections(documents, **splitter_overrides))
+    _write_cache(cache_name, [{"text": c.page_content, "metadata": c.metadata} for c in chunks])
+    return chunks
+
+
+# ==================== EMBEDDING + ESCRITA ====================
+
+class ThroughputReporter:
+    """Reporta progresso e vazão (chunks/s) da ingestão."""
+
+    def __init__(self, total: Optional[int] = None, label: str = "Ingestão"):
+        self.total = total      # None quando os chunks chegam de um gerador
+        self.label = label
+        self.done = 0
+        self.start_time = time.perf_counter()
+
+    def update(self, count: int):
+        self.done += count
+        elapsed = time.perf_counter() - self.start_time
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        progress = f"{self.done}/{self.total}" if self.total is not None else str(self.done)
+        print(f"[{self.label}] {progress} chunks ({rate:.1f} chunks/s)")
+
+    def summary(self) -> Dict:
+        elapsed = time.perf_counter() - self.start_time
+        return {
+            "chunks": self.done,
+            "seconds": elapsed,
+            "chunks_per_second": self.done / elapsed if elapsed > 0 else 0.0,
+        }
+
+
+def prefetch(iterable: Iterable, maxsize: int) -> Iterator:
+    """
+    Consome `iterable` numa thread produtora, com no máximo `maxsize` itens
+    prontos à frente do consumidor (backpressure: o produtor bloqueia na fila cheia).
+    Exceções do produtor são repassadas ao consumidor; se o consumidor parar
+    antes do fim, o produtor é encerrado.
+    """
+    items = queue.Queue(maxsize=max(1, maxsize))
+    stop = threading.Event()
+    done = object()
+    errors = []
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def producer():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except Exception as e:
+            errors.append(e)
+        put(done)
+
+    thread = threading.Thread(target=producer, name="ingest-prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is done:
+                break
+            yield item
+        if errors:
+            raise errors[0]
+    finally:
+        stop.set()
+        thread.join()
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[list]:
+    """Agrupa um iterável em listas de até `size` itens, sem materializá-lo."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def pipelined_ingest(chunks: Iterable[Document], embeddings, write_fn, batch_size: int = 5,
+                     max_in_flight: int = 4, write_batch_size: int = 256) -> Dict:
+    """
+    Ingestão em pipeline: até `max_in_flight` requisições de embedding (batches de
+    `batch_size` chunks) ficam em voo ao mesmo tempo, enquanto uma thread escritora
+    separada grava os vetores no store em transações de `write_batch_size` chunks.
+
+    `chunks` pode ser uma lista ou um gerador: os chunks são consumidos à medida
+    que há espaço no pipeline, nunca todos de uma vez.
+    write_fn(documentos, vetores) é chamado apenas pela thread escritora.
+    Se um batch de embedding falhar, a exceção é repassada e os vetores
+    pendentes não são gravados.
+    Retorna um resumo com total de chunks, tempo e vazão.
+    """
+    progress = ThroughputReporter(len(chunks) if hasattr(chunks, "__len__") else None)
+    # Fila limitada: se a escrita atrasar, o envio de novos embeddings espera
+    results = queue.Queue(maxsize=max(2, max_in_flight * 2))
+    writer_errors = []
+    aborted = threading.Event()
+
+    def writer():
+        pending_docs, pending_vectors = [], []
+        while True:
+            item = results.get()
+            if item is not None:
+                docs, vectors = item
+                pending_docs.extend(docs)
+                pending_vectors.extend(vectors)
+            if pending_docs and (item is None or len(pending_docs) >= write_batch_size):
+                if not writer_errors and not aborted.is_set():
+                    try:
+                        write_fn(pending_docs, pending_vectors)
+                        progress.update(len(pending_docs))
+                    except Exception as e:
+                        writer_errors.append(e)
+                pending_docs, pending_vectors = [], []
+            if item is None:
+                return
+
+    writer_thread = threading.Thread(target=writer, name="ingest-writer", daemon=True)
+    writer_thread.start()
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, max_in_flight)) as pool:
+            in_flight = deque()
+            for batch in batched(chunks, batch_size):
+                if writer_errors:
+                    break
+                future = pool.submit(embeddings.embed_documents, [doc.page_content for doc in batch])
+                in_flight.append((batch, future))
+                # Entrega os resultados em ordem, mantendo no máximo max_in_flight em voo
+                if len(in_flight) >= max_in_flight:
+                    done_batch, done_future = in_flight.popleft()
+                    results.put((done_batch, done_future.result()))
+            while in_flight:
+                done_batch, done_future = in_flight.popleft()
+                results.put((done_batch, done_future.result()))
+    except BaseException:
+        aborted.set()
+        raise
+    finally:
+        results.put(None)
+        writer_thread.join()
+
+    if writer_errors:
+        raise writer_errors[0]
+    return progress.summary()
@@ -0,0 +1,130 @@
+"""
+Intent Classifier - Classificador de intenção (command / conversation / rulebook)
+por regressão logística sobre embeddings de sentenças.
+O modelo é treinado por train_intent_classifier.py (comandos do HuRIC + exemplos
+de conversação e de perguntas sobre o rulebook) e salvo como um artefato .npz
+pequeno: pesos, vieses, rótulos e a configuração do embedder.
+Com o embedder local (hashing) uma predição leva bem menos de 10 ms em CPU.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from vector_utils import normalize_rows
+
+
+INTENT_MODEL_PATH = "../Classifier_XML/intent_classifier.npz"
+LABELS = ("command", "conversation", "rulebook")
+# Probabilidade mínima para o router confiar na predição. train_intent_classifier.py
+# ajusta o limiar no conjunto de teste e o salva no artefato; este valor só vale
+# para artefatos antigos, sem limiar
+DEFAULT_CONFIDENCE_THRESHOLD = 0.84
+DEFAULT_EMBEDDER = {"type": "hashing", "dimensions": 1024}
+
+
+def make_embedder(config: Dict):
+    """Embedder descrito no artefato: "hashing" (local) ou "ollama" (servidor de embeddings)."""
+    if config.get("type") == "ollama":
+        from langchain_ollama import OllamaEmbeddings
+        return OllamaEmbeddings(model=config.get("model", "nomic-embed-text"))
+    from hashing_embeddings import HashingEmbeddings
+    return HashingEmbeddings(dimensions=config.get("dimensions", DEFAULT_EMBEDDER["dimensions"]))
+
+
+def embed_texts(embedder, texts: List[str]) -> np.ndarray:
+    """Embeddings normalizados (L2) das sentenças, em minúsculas."""
+    return normalize_rows(embedder.embed_documents([text.lower().strip() for text in texts]))
+
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    logits = logits - logits.max(axis=-1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+class IntentPrediction:
+    def __init__(self, label: str, confidence: float, seconds: float):
+        self.label = label
+        self.confidence = confidence
+        self.seconds = seconds
+
+    def __repr__(self):
+        return f"IntentPrediction({self.label!r}, confidence={self.confidence:.2f}, {self.seconds * 1000:.2f} ms)"
+
+
+class IntentClassifier:
+    """Regressão logística multinomial sobre embeddings, com contadores de uso no router."""
+
+    def __init__(self, weights: np.ndarray, bias: np.ndarray, labels=LABELS,
+                 embedder_config: Optional[Dict] = None, threshold: float = DEFAULT_CONFIDENCE_THRESHOLD):
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.bias = np.asarray(bias, dtype=np.float32)
+        self.labels = list(labels)
+        self.embedder_config = dict(embedder_config or DEFAULT_EMBEDDER)
+        self.embedder = make_embedder(self.embedder_config)
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self.confident = 0
+        self.uncertain = 0
+
+    @classmethod
+    def load(cls, path: str = INTENT_MODEL_PATH, threshold: Optional[float] = None):
+        """
+        Carrega o artefato salvo por train_intent_classifier.py; None se não existir.
+        Sem `threshold`, usa o limiar ajustado salvo no artefato.
+        """
+        if not os.path.exists(path):
+            print(f"Classificador de intenção não encontrado em {path} (rode train_intent_classifier.py)")
+            return None
+        try:
+            with np.load(path) as data:
+                if threshold is None:
+                    threshold = (float(data["threshold"]) if "threshold" in data.files
+                                 else DEFAULT_CONFIDENCE_THRESHOLD)
+                return cls(data["weights"], data["bias"], [str(label) for label in data["labels"]],
+                           json.loads(str(data["embedder"])), threshold=threshold)
+        except Exception as e:
+            print(f"Erro ao carregar classificador de intenção: {e}")
+            return None
+
+    def save(self, path: str = INTENT_MODEL_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.savez_compressed(path, weights=self.weights, bias=self.bias, labels=np.array(self.labels),
+                            embedder=np.array(json.dumps(self.embedder_config)),
+                            threshold=np.array(self.threshold))
+
+    def predict_proba_vectors(self, vectors: np.ndarray) -> np.ndarray:
+        return softmax(vectors @ self.weights + self.bias)
+
+    def predict_proba(self, texts: List[str]) -> np.ndarray:
+        return self.predict_proba_vectors(embed_texts(self.embedder, texts))
+
+    def predict(self, text: str) -> IntentPrediction:
+        start_time = time.perf_counter()
+        probabilities = self.predict_proba([text])[0]
+        best = int(np.argmax(probabilities))
+        return IntentPrediction(self.labels[best], float(probabilities[best]), time.perf_counter() - start_time)
+
+    def route(self, text: str) -> Optional[IntentPrediction]:
+        """Predição se a confiança atingir o limiar, senão None (o router usa o caminho antigo)."""
+        prediction = self.predict(text)
+        with self._lock:
+            if prediction.confidence >= self.threshold:
+                self.confident += 1
+                return prediction
+            self.uncertain += 1
+            return None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.confident + self.uncertain
+            return {
+                "confident": self.confident,
+                "uncertain": self.uncertain,
+                "hit_rate": self.confident / total if total else 0.0,
+            }
@@ -0,0 +1,243 @@
+"""
+Intent Matcher - Roteamento rápido de entradas óbvias, sem chamar a LLM.
+Os léxicos do router (comandos, conversação, perguntas sobre pessoas, cômodos e
+objetos da casa) são compilados num único autômato de Aho-Corasick: uma passada
+pelo texto encontra todas as expressões, qualquer que seja o tamanho dos léxicos.
+As ocorrências são pontuadas por intenção e a decisão vem com uma confiança;
+abaixo do limiar o router continua consultando a LLM.
+"""
+
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import yaml
+
+
+# Confiança mínima para decidir sem a LLM
+FAST_PATH_THRESHOLD = 0.75
+# Suavização da confiança: poucas evidências nunca dão confiança alta
+CONFIDENCE_PRIOR = 1.0
+# Expressões no início da frase (imperativo, saudação) pesam mais
+LEADING_BONUS = 1.5
+LEADING_FILLERS = ("please ", "robot ", "hey robot ", "ok ", "okay ", "now ")
+
+HOUSE_STRUCTURE_PATH = "house_structure.yaml"
+
+# Verbos de ação física -> peso para "command"
+COMMAND_LEXICON = {
+    "go to": 2.0, "move to": 2.0, "navigate to": 2.0, "drive to": 2.0, "come to": 1.5,
+    "pick up": 2.0, "grab": 2.0, "fetch": 2.0, "bring": 2.0, "deliver": 2.0,
+    "take": 1.5, "carry": 1.5, "put": 1.0, "place": 1.0, "get": 1.0, "give me": 1.5,
+    "follow me": 2.0, "look for": 1.5, "search for": 1.5, "find": 1.5, "locate": 1.5,
+}
+
+# Perguntas sobre onde está alguém (comandos disfarçados de busca por pessoa)
+PERSON_QUERY_LEXICON = {
+    "where is": 2.0, "where's": 2.0, "do you know where": 2.0, "have you seen": 2.0,
+}
+
+# Interação social e perguntas -> peso para "conversation"
+CONVERSATION_LEXICON = {
+    "hello": 2.0, "hi": 2.0, "hey": 1.5, "good morning": 2.0, "good afternoon": 2.0,
+    "good evening": 2.0, "how are you": 2.0, "nice to meet you": 2.0, "who are you": 2.0,
+    "what is your name": 2.0, "what's your name": 2.0, "what can you do": 2.0,
+    "what are your capabilities": 2.0, "thank you": 2.0, "thanks": 2.0, "bye": 2.0,
+    "goodbye": 2.0, "tell me about": 1.5, "tell me a": 1.5,
+    "what": 1.0, "why": 1.0, "how": 1.0, "when": 1.0, "who": 1.0,
+    "can you": 0.5, "could you": 0.5, "would you": 0.5,
+}
+
+# Pedidos de explicação: nunca são comandos físicos (mesma regra do router)
+META_LEXICON = {"help me": 2.0, "explain": 2.0, "understand": 2.0, "learn": 2.0, "teach": 2.0}
+
+# Palavras que fazem de "where is ..." uma pergunta sobre a casa ou as regras, não sobre uma pessoa
+NON_PERSON_WORDS = ["object", "room", "rule", "regulation"]
+
+DEFAULT_ROOMS = ["bedroom", "dining room", "living room", "kitchen", "laundry room", "hall", "garage", "bathroom"]
+
+_WORD_CHARS = set("abcdefghijklmnopqrstuvwxyz0123456789'")
+
+
+class AhoCorasick:
+    """Autômato de Aho-Corasick: todas as ocorrências de um conjunto de padrões numa passada."""
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns = list(patterns)
+        self._goto = [{}]       # estado -> {caractere: estado}
+        self._fail = [0]
+        self._output = [[]]     # estado -> índices dos padrões que terminam nele
+        for index, pattern in enumerate(self.patterns):
+            state = 0
+            for char in pattern:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._output[state].append(index)
+
+        # Links de falha em largura; cada estado herda as saídas do seu link de falha
+        pending = deque(self._goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for char, child in self._goto[state].items():
+                pending.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def iter_matches(self, text: str):
+        """Gera (início, fim, índice do padrão) de cada ocorrência, inclusive sobrepostas."""
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for index in self._output[state]:
+                yield position + 1 - len(self.patterns[index]), position + 1, index
+
+
+class PhraseMatcher:
+    """Aho-Corasick sobre expressões com payload, opcionalmente só em palavras inteiras."""
+
+    def __init__(self, phrases: Dict[str, object], whole_words: bool = True):
+        self._phrases = list(phrases.items())
+        self._automaton = AhoCorasick(phrase for phrase, _ in self._phrases)
+        self.whole_words = whole_words
+
+    def find(self, text: str) -> List[Tuple[str, int, object]]:
+        """[(expressão, posição inicial, payload)] das ocorrências em `text` (já em minúsculas)."""
+        matches = []
+        for start, end, index in self._automaton.iter_matches(text):
+            if self.whole_words and ((start > 0 and text[start - 1] in _WORD_CHARS)
+                                     or (end < len(text) and text[end] in _WORD_CHARS)):
+                continue
+            phrase, payload = self._phrases[index]
+            matches.append((phrase, start, payload))
+        return matches
+
+    def contains_any(self, text: str) -> bool:
+        return bool(self.find(text))
+
+
+class IntentDecision:
+    def __init__(self, intent: str, confidence: float, scores: Dict[str, float], matches: List[str]):
+        self.intent = intent
+        self.confidence = confidence
+        self.scores = scores
+        self.matches = matches
+
+    def __repr__(self):
+        return f"IntentDecision({self.intent!r}, confidence={self.confidence:.2f}, matches={self.matches})"
+
+
+def _house_entities(path: str = HOUSE_STRUCTURE_PATH) -> List[str]:
+    """Cômodos e objetos típicos de house_structure.yaml (ou os cômodos padrão)."""
+    try:
+        with open(path, "r") as file:
+            house = yaml.safe_load(file)["house"]
+    except (OSError, KeyError, TypeError, yaml.YAMLError):
+        return list(DEFAULT_ROOMS)
+    entities = list(house.get("rooms", []))
+    for objects in house.get("typical_objects_by_room", {}).values():
+        entities.extend(objects or [])
+    return entities
+
+
+class IntentMatcher:
+    """
+    Classificador command/conversation por léxicos, com confiança em [0, 1]
+    e contadores de quantas decisões dispensaram a LLM.
+    """
+
+    def __init__(self, threshold: float = FAST_PATH_THRESHOLD, entities: Optional[Iterable[str]] = None):
+        self.threshold = threshold
+        entities = _house_entities() if entities is None else entities
+        lexicon = {}
+        for category, phrases in (("entity", {name: 0.5 for name in entities}),
+                                  ("person_query", PERSON_QUERY_LEXICON),
+                                  ("conversation", CONVERSATION_LEXICON),
+                                  ("meta", META_LEXICON),
+                                  ("command", COMMAND_LEXICON)):
+            for phrase, weight in phrases.items():
+                lexicon[phrase.lower()] = (category, weight)
+        self._matcher = PhraseMatcher(lexicon)
+        self._non_person = PhraseMatcher({word: True for word in NON_PERSON_WORDS}, whole_words=False)
+        self._lock = threading.Lock()
+        self.fast_path = 0
+        self.llm_fallbacks = 0
+
+    @staticmethod
+    def _normalize(text: str) -> Tuple[str, int]:
+        """Texto em minúsculas e a posição onde começa a frase (após "please", "robot", ...)."""
+        text = " ".join(text.lower().replace(",", " ").split())
+        lead = 0
+        stripped = True
+        while stripped:
+            stripped = False
+            for filler in LEADING_FILLERS:
+                if text.startswith(filler, lead):
+                    lead += len(filler)
+                    stripped = True
+        return text, lead
+
+    def classify(self, text: str) -> IntentDecision:
+        """Decide entre "command" e "conversation" e estima a confiança da decisão."""
+        normalized, lead = self._normalize(text)
+        scores = {"command": 0.0, "conversation": 0.0}
+        found = {"entity": 0, "person_query": 0.0, "meta": 0.0}
+        matches = []
+        for phrase, start, (category, weight) in self._matcher.find(normalized):
+            matches.append(phrase)
+            weight *= LEADING_BONUS if start == lead else 1.0
+            if category in scores:
+                scores[category] += weight
+            elif category == "entity":
+                found["entity"] += 1
+            else:
+                found[category] += weight
+
+        if scores["command"]:
+            # Cômodos e objetos reforçam um verbo de ação (sozinhos não decidem nada)
+            scores["command"] += 0.5 * min(found["entity"], 2)
+        if found["person_query"]:
+            if found["entity"] or self._non_person.contains_any(normalized):
+                scores["conversation"] += 1.0
+            else:
+                scores["command"] += found["person_query"]
+        if found["meta"]:
+            scores["conversation"] += found["meta"]
+            scores["command"] *= 0.5
+
+        intent = "command" if scores["command"] > scores["conversation"] else "conversation"
+        winner = scores[intent]
+        loser = scores["conversation" if intent == "command" else "command"]
+        confidence = winner / (winner + loser + CONFIDENCE_PRIOR) if winner else 0.0
+        return IntentDecision(intent, confidence, scores, matches)
+
+    def route(self, text: str) -> Optional[IntentDecision]:
+        """
+        Decisão do caminho rápido, ou None se a confiança ficar abaixo do limiar
+        (o chamador deve consultar a LLM). Atualiza os contadores.
+        """
+        decision = self.classify(text)
+        with self._lock:
+            if decision.confidence >= self.threshold:
+                self.fast_path += 1
+                return decision
+            self.llm_fallbacks += 1
+            return None
+
+    def stats(self) -> Dict:
+        """Decisões pelo caminho rápido (chamadas à LLM economizadas) e pela LLM."""
+        with self._lock:
+            total = self.fast_path + self.llm_fallbacks
+            return {
+                "fast_path": self.fast_path,
+                "llm_fallbacks": self.llm_fallbacks,
+                "hit_rate": self.fast_path / total if total else 0.0,
+            }
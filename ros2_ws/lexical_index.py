@@ -0,0 +1,113 @@
+"""
+Lexical Index - Índice invertido BM25 em memória sobre os chunks do rulebook.
+Atende consultas por palavra-chave (penalty, referee, arena, números de regra,
+siglas) sem nenhuma chamada de embeddings.
+"""
+
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+
+# Mantém números de regra/seção ("3.2.1") e siglas como um único termo
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.\-][a-z0-9]+)*")
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for",
+    "from", "how", "i", "if", "in", "is", "it", "of", "on", "or", "that", "the",
+    "this", "to", "was", "what", "when", "where", "which", "who", "why", "with",
+    "you", "your", "me", "my", "about", "there", "their", "they",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Tokeniza em minúsculas, descartando stopwords."""
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Índice invertido com ranqueamento Okapi BM25.
+    Documentos são identificados por um id estável (o id do chunk).
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._postings = defaultdict(dict)   # termo -> {posição do doc: frequência}
+        self._doc_ids = []
+        self._documents = []
+        self._doc_lengths = []
+        self._positions = {}                 # id -> posição
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self._positions)
+
+    def add_documents(self, documents, ids: List[str]):
+        """Indexa documentos (objetos com page_content/metadata); ids repetidos são ignorados."""
+        with self._lock:
+            for doc_id, doc in zip(ids, documents):
+                if doc_id in self._positions:
+                    continue
+                terms = Counter(tokenize(doc.page_content))
+                position = len(self._doc_ids)
+                self._positions[doc_id] = position
+                self._doc_ids.append(doc_id)
+                self._documents.append(doc)
+                length = sum(terms.values())
+                self._doc_lengths.append(length)
+                self._total_length += length
+                for term, freq in terms.items():
+                    self._postings[term][position] = freq
+
+    def search(self, query: str, k: int = 4,
+               metadata_filter: Optional[Dict[str, str]] = None) -> List[Tuple[str, object, float]]:
+        """Retorna até k tuplas (id, documento, score) ordenadas por score BM25."""
+        terms = set(tokenize(query))
+        with self._lock:
+            n_docs = len(self._doc_ids)
+            if not terms or n_docs == 0:
+                return []
+            avg_length = self._total_length / n_docs
+            scores = defaultdict(float)
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for position, freq in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[position] / avg_length)
+                    scores[position] += idf * freq * (self.k1 + 1) / (freq + norm)
+
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+            results = []
+            for position, score in ranked:
+                doc = self._documents[position]
+                if metadata_filter and any(
+                    doc.metadata.get(key) != value for key, value in metadata_filter.items()
+                ):
+                    continue
+                results.append((self._doc_ids[position], doc, score))
+                if len(results) >= k:
+                    break
+            return results
+
+
+def reciprocal_rank_fusion(ranked_lists: List[List[Tuple[str, object]]], k: int = 4,
+                           rrf_k: int = 60) -> List[object]:
+    """
+    Funde rankings (listas de (id, documento)) por Reciprocal Rank Fusion:
+    score(d) = soma de 1 / (rrf_k + posição de d em cada lista).
+    """
+    scores = defaultdict(float)
+    documents = {}
+    for ranked in ranked_lists:
+        for rank, (doc_id, doc) in enumerate(ranked, 1):
+            scores[doc_id] += 1.0 / (rrf_k + rank)
+            documents.setdefault(doc_id, doc)
+    ranked_ids = sorted(scores, key=lambda doc_id: scores[doc_id], reverse=True)
+    return [documents[doc_id] for doc_id in ranked_ids[:k]]
@@ -0,0 +1,89 @@
+"""
+LLM Output - Limpeza do texto gerado pelas LLMs antes de exibi-lo, para respostas
+completas (clean_llm_output) e para respostas em streaming (StreamCleaner).
+"""
+
+import re
+
+
+# Função para limpar output do LLM
+def clean_llm_output(text: str) -> str:
+    """Remove caracteres unicode inválidos e texto em outros idiomas"""
+    # Remove caracteres unicode não-ASCII exceto pontuação comum
+    cleaned = re.sub(r'[^\x00-\x7F]+', '', text)
+    # Remove tags <unused...>
+    cleaned = re.sub(r'<unused\d+>', '', cleaned)
+    return cleaned.strip()
+
+
+class StreamCleaner:
+    """
+    Versão incremental de clean_llm_output, para texto que chega em pedaços (streaming).
+    Cada pedaço passa por feed(), que devolve o texto já seguro para exibir; um
+    possível início de tag <unused...> e o espaço em branco final ficam retidos
+    até o próximo pedaço (ou até flush()). O texto concatenado é igual ao de
+    clean_llm_output aplicado à resposta completa.
+    """
+
+    TAG_PREFIX = "<unused"
+
+    def __init__(self):
+        self._pending = ""       # possível tag <unused\d+> incompleta
+        self._whitespace = ""    # espaço em branco retido (strip no final)
+        self._started = False    # strip no início: nada foi emitido ainda
+
+    def _emit(self, text: str) -> str:
+        out = []
+        for char in text:
+            if char.isspace():
+                if self._started:
+                    self._whitespace += char
+                continue
+            self._started = True
+            out.append(self._whitespace + char)
+            self._whitespace = ""
+        return "".join(out)
+
+    def _push(self, char: str) -> str:
+        if not self._pending:
+            if char == "<":
+                self._pending = char
+                return ""
+            return self._emit(char)
+
+        candidate = self._pending + char
+        if len(candidate) <= len(self.TAG_PREFIX):
+            if self.TAG_PREFIX.startswith(candidate):
+                self._pending = candidate
+                return ""
+        elif char.isdigit():
+            self._pending = candidate
+            return ""
+        elif char == ">" and len(self._pending) > len(self.TAG_PREFIX):
+            # Tag completa: descartada
+            self._pending = ""
+            return ""
+        # Não era uma tag: libera o que estava retido e reprocessa o caractere
+        released, self._pending = self._pending, ""
+        return self._emit(released) + self._push(char)
+
+    def feed(self, chunk: str) -> str:
+        # Remove caracteres unicode não-ASCII antes de procurar as tags (mesma ordem de clean_llm_output)
+        return "".join(self._push(char) for char in re.sub(r'[^\x00-\x7F]+', '', chunk))
+
+    def flush(self) -> str:
+        """Libera o texto retido no fim do stream (o espaço em branco final é descartado)."""
+        released, self._pending = self._pending, ""
+        return self._emit(released)
+
+
+def stream_clean_llm_output(chunks):
+    """Aplica clean_llm_output incrementalmente a um iterável de pedaços de texto."""
+    cleaner = StreamCleaner()
+    for chunk in chunks:
+        cleaned = cleaner.feed(chunk)
+        if cleaned:
+            yield cleaned
+    tail = cleaner.flush()
+    if tail:
+        yield tail
@@ -1,20 +1,17 @@
+import os
+import time
+
+# Marca o início do carregamento para reportar o tempo de startup
+_startup_begin = time.perf_counter()
+
 from langchain_ollama import ChatOllama
-from langchain.agents import AgentExecutor, create_react_agent
 from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
 from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
 from src.robot_agent.robot_tools import robot_tools
+from command_executor import CommandExecutor
+from llm_output import clean_llm_output, stream_clean_llm_output
 import json
 import yaml
-import re
-
-# Função para limpar output do LLM
-def clean_llm_output(text: str) -> str:
-    """Remove caracteres unicode inválidos e texto em outros idiomas"""
-    # Remove caracteres unicode não-ASCII exceto pontuação comum
-    cleaned = re.sub(r'[^\x00-\x7F]+', '', text)
-    # Remove tags <unused...>
-    cleaned = re.sub(r'<unused\d+>', '', cleaned)
-    return cleaned.strip()
 
 # 1. Configurar a LLM Principal (Gemma3B via Ollama)
 main_llm = ChatOllama(model="gemma3:4b", temperature=0.1)
@@ -28,8 +25,15 @@ with open('Prompts/main_prompt.yaml', 'r') as file:
 # Ele DEVE explicar claramente as ferramentas e o processo de pensamento esperado.
 agent_prompt = PromptTemplate.from_template(agent_prompt)
 
+# 3. Construir o agente ReAct uma única vez (prompt, ferramentas e executor)
+command_executor = CommandExecutor(main_llm, robot_tools, agent_prompt)
+
+# 4. Streaming da Final Answer no loop de interação (ROBOT_STREAMING=0 desativa)
+STREAMING = os.environ.get("ROBOT_STREAMING", "1") != "0"
+
 # 5. Loop de Interação
 if __name__ == "__main__":
+    print(f"[Startup] Agent ready in {time.perf_counter() - _startup_begin:.2f}s")
     print("Robot: Hello! How can I help you today? (Type 'exit' to quit)")
     while True:
         user_input = input("You: ")
@@ -38,24 +42,23 @@ if __name__ == "__main__":
             break
       
         try:
-            # IMPORTANTE: Criar nova instância do executor para cada comando
-            # Isso limpa o agent_scratchpad e evita contaminação de contexto
-            fresh_agent = create_react_agent(main_llm, robot_tools, agent_prompt)
-            fresh_executor = AgentExecutor(
-                agent=fresh_agent,
-                tools=robot_tools,
-                verbose=False,
-                handle_parsing_errors=True,
-                max_iterations=15,
-                return_intermediate_steps=True
-            )
-            
-            # Invocar com executor limpo
-            response = fresh_executor.invoke({"input": user_input})
-            # Limpar o output antes de exibir
-            cleaned_output = clean_llm_output(response['output'])
-            print(f"Robot: {cleaned_output}")
+            # IMPORTANTE: o executor é reutilizado, mas cada comando começa com
+            # o agent_scratchpad limpo (reset explícito dentro de invoke/stream)
+            if STREAMING:
+                # Tokens da Final Answer exibidos (já limpos) assim que são gerados
+                print("Robot: ", end="", flush=True)
+                for chunk in stream_clean_llm_output(command_executor.stream(user_input)):
+                    print(chunk, end="", flush=True)
+                print()
+            else:
+                response = command_executor.invoke(user_input)
+                # Limpar o output antes de exibir
+                cleaned_output = clean_llm_output(response['output'])
+                print(f"Robot: {cleaned_output}")
         except Exception as e:
+            if STREAMING:
+                # Termina a linha de uma resposta interrompida
+                print()
             error_message = str(e)
             # Limpar a mensagem de erro também
             cleaned_error = clean_llm_output(error_message)
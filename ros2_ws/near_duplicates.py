@@ -0,0 +1,101 @@
+"""
+Near Duplicates - Detecção de chunks quase idênticos antes do embedding.
+Cada chunk é reduzido a uma assinatura MinHash dos seus shingles (n-gramas de
+palavras); assinaturas são agrupadas por LSH em bandas, e só os pares que caem
+no mesmo balde são comparados. Chunks com similaridade de Jaccard estimada acima
+do limiar são descartados em favor do primeiro visto.
+"""
+
+import re
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+DEFAULT_THRESHOLD = 0.85
+NUM_PERMUTATIONS = 64
+BANDS = 16                      # 16 bandas x 4 linhas
+SHINGLE_SIZE = 5
+_PRIME = (1 << 31) - 1
+_WORD_PATTERN = re.compile(r"\w+")
+
+_rng = np.random.default_rng(20240601)
+_A = _rng.integers(1, _PRIME, size=NUM_PERMUTATIONS, dtype=np.int64)
+_B = _rng.integers(0, _PRIME, size=NUM_PERMUTATIONS, dtype=np.int64)
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> set:
+    """n-gramas de palavras (texto normalizado); textos curtos viram um único shingle."""
+    words = _WORD_PATTERN.findall(text.lower())
+    if len(words) < size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def minhash_signature(text: str) -> np.ndarray:
+    """Assinatura MinHash (NUM_PERMUTATIONS valores) calculada de forma vetorizada."""
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles(text)), dtype=np.int64)
+    # (a * x + b) mod p para todas as permutações e shingles de uma vez (cabe em int64)
+    return ((_A[:, None] * hashes[None, :] + _B[:, None]) % _PRIME).min(axis=1)
+
+
+class NearDuplicateIndex:
+    """Índice LSH de assinaturas MinHash dos chunks já aceitos."""
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self._rows = NUM_PERMUTATIONS // BANDS
+        self._buckets = [dict() for _ in range(BANDS)]   # banda -> {chave: [ids]}
+        self._signatures = {}
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def _band_keys(self, signature: np.ndarray):
+        for band in range(BANDS):
+            yield band, signature[band * self._rows:(band + 1) * self._rows].tobytes()
+
+    def find(self, signature: np.ndarray) -> Optional[str]:
+        """Id de um chunk já indexado quase idêntico a esta assinatura, ou None."""
+        checked = set()
+        for band, key in self._band_keys(signature):
+            for doc_id in self._buckets[band].get(key, ()):
+                if doc_id in checked:
+                    continue
+                checked.add(doc_id)
+                if np.mean(self._signatures[doc_id] == signature) >= self.threshold:
+                    return doc_id
+        return None
+
+    def add(self, doc_id: str, signature: np.ndarray):
+        if doc_id in self._signatures:
+            return
+        self._signatures[doc_id] = signature
+        for band, key in self._band_keys(signature):
+            self._buckets[band].setdefault(key, []).append(doc_id)
+
+    def add_texts(self, ids: List[str], texts: List[str]):
+        for doc_id, text in zip(ids, texts):
+            self.add(doc_id, minhash_signature(text))
+
+    def filter(self, documents, ids: List[str]) -> Tuple[list, Dict[str, str]]:
+        """
+        Separa os documentos novos dos quase duplicados (de chunks já indexados
+        ou de outros documentos do mesmo lote). Os aceitos entram no índice.
+        Retorna (documentos aceitos, {id descartado: id mantido}).
+        """
+        kept = []
+        dropped = {}
+        for doc, doc_id in zip(documents, ids):
+            if doc_id in self._signatures:
+                kept.append(doc)
+                continue
+            signature = minhash_signature(doc.page_content)
+            original = self.find(signature)
+            if original is not None:
+                dropped[doc_id] = original
+                continue
+            self.add(doc_id, signature)
+            kept.append(doc)
+        return kept, dropped
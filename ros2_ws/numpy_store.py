@@ -0,0 +1,438 @@
+"""
+NumPy Store - Backend de busca exata para a base de conhecimento.
+Os embeddings dos chunks ficam numa matriz float32 contígua (.npy) aberta com
+memory-map, e os textos/metadados num arquivo JSON ao lado. Uma consulta é um
+único produto matriz-vetor seguido de argpartition para o top-k.
+Vários processos do agente compartilham as páginas da matriz pelo cache do SO.
+
+Opcionalmente (quantization="int8" ou "binary") a busca percorre uma cópia
+quantizada da matriz (4x ou 32x menor) e só os melhores candidatos são
+reavaliados com os vetores float32: a matriz float32 não é carregada nem
+mapeada, só as linhas reavaliadas são lidas do disco.
+"""
+
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+from partitioned_index import PARTITION_KEY
+from vector_utils import normalize_rows
+
+
+EMBEDDINGS_FILE = "embeddings.npy"
+METADATA_FILE = "metadata.json"
+
+QUANTIZATION_MODES = ("int8", "binary")
+# Candidatos da busca quantizada reavaliados em float32: k * RESCORE_MULTIPLIERS[modo].
+# Um bit por dimensão ordena os candidatos bem pior que int8, então o binário
+# reavalia um conjunto maior.
+RESCORE_MULTIPLIERS = {"int8": 4, "binary": 16}
+# Fração de coordenadas nulas acima da qual o embedder é considerado esparso
+# (ex.: hashing): o sinal de uma coordenada nula não carrega informação
+SPARSE_ZERO_FRACTION = 0.1
+# Linhas por bloco ao calcular scores quantizados (limita a memória temporária)
+SCORE_BLOCK_ROWS = 1024
+
+
+def _quantized_files(quantization: str) -> List[str]:
+    if quantization == "int8":
+        return ["embeddings_int8.npy", "scales_int8.npy"]
+    return ["embeddings_binary.npy"]
+
+
+def quantize(matrix: np.ndarray, quantization: str) -> List[np.ndarray]:
+    """
+    int8: cada linha escalada para [-127, 127] (escala por linha).
+    binary: um bit por dimensão (sinal), empacotado em bytes. Na busca, cada bit
+    vale +1 ou -1 e é multiplicado pela consulta em float32 (score assimétrico).
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if quantization == "int8":
+        scales = np.abs(matrix).max(axis=1) / 127.0 if len(matrix) else np.zeros(0, dtype=np.float32)
+        scales[scales == 0] = 1.0
+        codes = np.round(matrix / scales[:, None]).astype(np.int8)
+        return [codes, scales.astype(np.float32)]
+    return [np.packbits(matrix > 0, axis=1)]
+
+
+class _FullPrecisionRows:
+    """
+    Matriz float32 de um .npy lida sob demanda (modos quantizados): indexar lê
+    do arquivo só as linhas pedidas, agrupando linhas consecutivas numa leitura.
+    Tem a parte da interface de ndarray usada pelo store (shape, ndim, nbytes, []).
+    O arquivo fica aberto: uma gravação que o substitui não afeta este snapshot.
+    """
+
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        version = np.lib.format.read_magic(self._file)
+        if version == (1, 0):
+            shape, _, dtype = np.lib.format.read_array_header_1_0(self._file)
+        else:
+            shape, _, dtype = np.lib.format.read_array_header_2_0(self._file)
+        self._offset = self._file.tell()
+        self.shape = shape
+        self.ndim = len(shape)
+        self.dtype = dtype
+        self.nbytes = int(np.prod(shape)) * dtype.itemsize
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, index) -> np.ndarray:
+        rows = np.arange(self.shape[0])[index]
+        single = rows.ndim == 0
+        rows = np.atleast_1d(rows)
+        out = np.empty((len(rows),) + tuple(self.shape[1:]), dtype=self.dtype)
+        row_bytes = out[0].nbytes if len(rows) else 0
+        start = 0
+        while start < len(rows):
+            end = start + 1
+            while end < len(rows) and rows[end] == rows[end - 1] + 1:
+                end += 1
+            # pread não usa a posição do arquivo: buscas concorrentes não interferem
+            data = os.pread(self._file.fileno(), (end - start) * row_bytes,
+                            self._offset + int(rows[start]) * row_bytes)
+            out[start:end] = np.frombuffer(data, dtype=self.dtype).reshape(out[start:end].shape)
+            start = end
+        return out[0] if single else out
+
+
+def _matches(metadata: Dict, metadata_filter: Optional[Dict]) -> bool:
+    if not metadata_filter:
+        return True
+    return all(metadata.get(key) == value for key, value in metadata_filter.items())
+
+
+class _Snapshot:
+    """
+    Estado publicado do store (matriz, cópia quantizada, ids, textos, metadados).
+    Cada gravação publica um snapshot novo numa única atribuição; uma busca lê
+    um só snapshot do começo ao fim, sem lock, e nunca mistura linhas de dois.
+    """
+
+    __slots__ = ("matrix", "quantized", "ids", "documents", "metadatas", "partition_rows")
+
+    def __init__(self, matrix: np.ndarray, ids: List[str], documents: List[str],
+                 metadatas: List[Dict], quantized: Optional[List[np.ndarray]] = None):
+        self.matrix = matrix
+        self.quantized = quantized or []
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        self.partition_rows = None  # calculado na primeira busca filtrada por tipo
+
+
+class NumpyVectorStore:
+    """
+    Vector store de busca exata com a mesma interface usada pelo rag_pipeline
+    (similarity_search*, add_documents, delete, get, embeddings).
+    Gravações são serializadas por um lock; buscas leem o snapshot atual sem lock.
+    """
+
+    def __init__(self, persist_directory: str, embedding_function, matrix: np.ndarray,
+                 ids: List[str], documents: List[str], metadatas: List[Dict],
+                 quantization: Optional[str] = None):
+        if quantization not in (None, "none") + QUANTIZATION_MODES:
+            raise ValueError(f"Quantização desconhecida: {quantization}")
+        self.persist_directory = persist_directory
+        self.quantization = None if quantization == "none" else quantization
+        self._embedding_function = embedding_function
+        self._state = _Snapshot(matrix, ids, documents, metadatas)
+        self._lock = threading.Lock()
+
+    @property
+    def embeddings(self):
+        return self._embedding_function
+
+    def __len__(self):
+        return len(self._state.ids)
+
+    def index_nbytes(self) -> Dict[str, int]:
+        """
+        "search": bytes percorridos em toda busca; "resident": bytes que o índice
+        mantém em memória; "full_precision": tamanho da matriz float32 (nos modos
+        quantizados ela fica no disco e só as linhas reavaliadas são lidas).
+        """
+        state = self._state
+        full = int(state.matrix.nbytes)
+        if not self.quantization:
+            return {"search": full, "resident": full, "full_precision": full}
+        quantized = int(sum(array.nbytes for array in state.quantized))
+        return {"search": quantized, "resident": quantized, "full_precision": full}
+
+    # ==================== PERSISTÊNCIA ====================
+
+    @staticmethod
+    def exists(persist_directory: str) -> bool:
+        return (os.path.exists(os.path.join(persist_directory, EMBEDDINGS_FILE))
+                and os.path.exists(os.path.join(persist_directory, METADATA_FILE)))
+
+    @classmethod
+    def load(cls, persist_directory: str, embedding_function,
+             quantization: Optional[str] = None) -> "NumpyVectorStore":
+        """
+        Abre a matriz com memory-map (somente leitura) e o sidecar de metadados.
+        Com quantização, abre só a matriz quantizada (criada na primeira vez);
+        a float32 não é mapeada, suas linhas são lidas no rescoring.
+        """
+        matrix_path = os.path.join(persist_directory, EMBEDDINGS_FILE)
+        if quantization in QUANTIZATION_MODES:
+            matrix = _FullPrecisionRows(matrix_path)
+        else:
+            matrix = np.load(matrix_path, mmap_mode="r")
+        with open(os.path.join(persist_directory, METADATA_FILE), "r", encoding="utf-8") as f:
+            sidecar = json.load(f)
+        store = cls(persist_directory, embedding_function, matrix,
+                    sidecar["ids"], sidecar["documents"], sidecar["metadatas"], quantization)
+        if store.quantization:
+            state = store._state
+            store._state = _Snapshot(state.matrix, state.ids, state.documents, state.metadatas,
+                                     store._load_quantized(state))
+        return store
+
+    @classmethod
+    def create(cls, persist_directory: str, embedding_function,
+               quantization: Optional[str] = None) -> "NumpyVectorStore":
+        """Store vazio; os arquivos são (re)escritos na primeira inserção."""
+        return cls(persist_directory, embedding_function, np.zeros((0, 0), dtype=np.float32), [], [], [],
+                   quantization)
+
+    @classmethod
+    def from_embeddings(cls, persist_directory: str, embedding_function, vectors,
+                        ids: List[str], documents: List[str], metadatas: List[Dict],
+                        quantization: Optional[str] = None) -> "NumpyVectorStore":
+        """Cria o store a partir de vetores já calculados e grava em disco."""
+        store = cls.create(persist_directory, embedding_function, quantization)
+        store._write(normalize_rows(vectors), list(ids), list(documents),
+                     [metadata or {} for metadata in metadatas])
+        return store
+
+    @classmethod
+    def from_documents(cls, documents: List[Document], embedding_function, persist_directory: str,
+                       ids: Optional[List[str]] = None,
+                       quantization: Optional[str] = None) -> "NumpyVectorStore":
+        texts = [doc.page_content for doc in documents]
+        vectors = embedding_function.embed_documents(texts)
+        ids = ids or [str(i) for i in range(len(documents))]
+        return cls.from_embeddings(persist_directory, embedding_function, vectors, ids, texts,
+                                   [doc.metadata for doc in documents], quantization)
+
+    @classmethod
+    def from_chroma(cls, chroma_store, persist_directory: str,
+                    quantization: Optional[str] = None) -> "NumpyVectorStore":
+        """Exporta um Chroma existente reaproveitando os embeddings já calculados."""
+        stored = chroma_store.get(include=["embeddings", "documents", "metadatas"])
+        return cls.from_embeddings(persist_directory, chroma_store.embeddings,
+                                   np.asarray(stored["embeddings"], dtype=np.float32),
+                                   stored["ids"], stored["documents"], stored["metadatas"],
+                                   quantization)
+
+    def _load_quantized(self, state: _Snapshot) -> List[np.ndarray]:
+        """Abre a matriz quantizada; (re)cria a partir da float32 se faltar ou estiver desatualizada."""
+        paths = [os.path.join(self.persist_directory, name) for name in _quantized_files(self.quantization)]
+        if self.quantization == "binary":
+            self._warn_if_sparse(state.matrix)
+        if all(os.path.exists(path) for path in paths):
+            arrays = [np.load(path, mmap_mode="r") for path in paths]
+            if all(len(array) == len(state.ids) for array in arrays):
+                return arrays
+        return self._write_quantized(state.matrix[:])
+
+    @staticmethod
+    def _warn_if_sparse(matrix: np.ndarray):
+        """A quantização binária guarda só o sinal: com vetores esparsos a ordenação aproximada piora muito."""
+        sample = np.asarray(matrix[:256])
+        if sample.size and (sample == 0).mean() > SPARSE_ZERO_FRACTION:
+            print(f"Aviso: {(sample == 0).mean():.0%} das coordenadas dos embeddings são nulas; "
+                  f"a quantização binária perde recall com esse embedder (prefira int8)")
+
+    def _write_quantized(self, matrix: np.ndarray) -> List[np.ndarray]:
+        paths = [os.path.join(self.persist_directory, name) for name in _quantized_files(self.quantization)]
+        arrays = quantize(matrix, self.quantization)
+        for path, array in zip(paths, arrays):
+            with open(path + ".tmp", "wb") as f:
+                np.save(f, np.ascontiguousarray(array))
+            os.replace(path + ".tmp", path)
+        return [np.load(path, mmap_mode="r") for path in paths]
+
+    def _write(self, matrix: np.ndarray, ids, documents, metadatas):
+        """
+        Grava matriz e sidecar de forma atômica, reabre a matriz (memory-map, ou
+        leitura sob demanda com quantização) e publica o novo snapshot.
+        """
+        os.makedirs(self.persist_directory, exist_ok=True)
+        matrix_path = os.path.join(self.persist_directory, EMBEDDINGS_FILE)
+        metadata_path = os.path.join(self.persist_directory, METADATA_FILE)
+
+        with open(matrix_path + ".tmp", "wb") as f:
+            np.save(f, np.ascontiguousarray(matrix, dtype=np.float32))
+        with open(metadata_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"ids": ids, "documents": documents, "metadatas": metadatas}, f, ensure_ascii=False)
+        os.replace(matrix_path + ".tmp", matrix_path)
+        os.replace(metadata_path + ".tmp", metadata_path)
+
+        quantized = self._write_quantized(matrix) if self.quantization else None
+        if self.quantization:
+            matrix = _FullPrecisionRows(matrix_path)
+        else:
+            matrix = np.load(matrix_path, mmap_mode="r")
+        self._state = _Snapshot(matrix, ids, documents, metadatas, quantized)
+
+    def add_documents(self, documents: List[Document], ids: Optional[List[str]] = None) -> List[str]:
+        texts = [doc.page_content for doc in documents]
+        vectors = normalize_rows(self._embedding_function.embed_documents(texts))
+        return self.add_embeddings(vectors, texts, [doc.metadata for doc in documents], ids)
+
+    def add_embeddings(self, vectors, texts: List[str], metadatas: List[Dict],
+                       ids: Optional[List[str]] = None) -> List[str]:
+        """
+        Anexa vetores já calculados (uma única regravação dos arquivos).
+        Ids já existentes são substituídos (upsert), como no Chroma.
+        """
+        with self._lock:
+            state = self._state
+            ids = list(ids or [str(len(state.ids) + i) for i in range(len(texts))])
+            vectors = normalize_rows(vectors)
+            replaced = set(ids)
+            keep = [i for i, doc_id in enumerate(state.ids) if doc_id not in replaced]
+            if keep:
+                matrix = np.vstack([state.matrix[keep], vectors])
+            else:
+                matrix = vectors
+            self._write(matrix,
+                        [state.ids[i] for i in keep] + ids,
+                        [state.documents[i] for i in keep] + list(texts),
+                        [state.metadatas[i] for i in keep] + [metadata or {} for metadata in metadatas])
+            return ids
+
+    def delete(self, ids: Optional[List[str]] = None):
+        """Remove os chunks com os ids informados."""
+        if not ids:
+            return
+        with self._lock:
+            state = self._state
+            removed = set(ids)
+            keep = [i for i, doc_id in enumerate(state.ids) if doc_id not in removed]
+            if len(keep) == len(state.ids):
+                return
+            dim = state.matrix.shape[1] if state.matrix.ndim == 2 else 0
+            matrix = state.matrix[keep] if keep else np.zeros((0, dim), dtype=np.float32)
+            self._write(matrix, [state.ids[i] for i in keep], [state.documents[i] for i in keep],
+                        [state.metadatas[i] for i in keep])
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None,
+            include: Optional[List[str]] = None) -> Dict:
+        """Mesmo formato de retorno do Chroma.get()."""
+        include = include or ["documents", "metadatas"]
+        state = self._state
+        wanted = set(ids) if ids else None
+        rows = [
+            i for i, (doc_id, metadata) in enumerate(zip(state.ids, state.metadatas))
+            if (wanted is None or doc_id in wanted) and _matches(metadata, where)
+        ]
+        result = {"ids": [state.ids[i] for i in rows]}
+        if "documents" in include:
+            result["documents"] = [state.documents[i] for i in rows]
+        if "metadatas" in include:
+            result["metadatas"] = [state.metadatas[i] for i in rows]
+        if "embeddings" in include:
+            result["embeddings"] = np.asarray(state.matrix[rows]) if rows else []
+        return result
+
+    # ==================== BUSCA ====================
+
+    @staticmethod
+    def _partitions(state: _Snapshot) -> Dict:
+        """Linhas de cada valor de PARTITION_KEY (calculadas uma vez por snapshot)."""
+        partition_rows = state.partition_rows
+        if partition_rows is None:
+            groups = {}
+            for i, metadata in enumerate(state.metadatas):
+                groups.setdefault(metadata.get(PARTITION_KEY), []).append(i)
+            partition_rows = {value: np.array(rows, dtype=np.int64) for value, rows in groups.items()}
+            state.partition_rows = partition_rows
+        return partition_rows
+
+    def _candidate_rows(self, state: _Snapshot, metadata_filter: Optional[Dict]) -> Optional[np.ndarray]:
+        """Linhas que satisfazem o filtro; filtros por tipo partem só da partição."""
+        if not metadata_filter:
+            return None
+        if PARTITION_KEY in metadata_filter:
+            rows = self._partitions(state).get(metadata_filter[PARTITION_KEY])
+            if rows is None:
+                return np.zeros(0, dtype=np.int64)
+            rest = {key: value for key, value in metadata_filter.items() if key != PARTITION_KEY}
+            if not rest:
+                return rows
+            return np.array([i for i in rows if _matches(state.metadatas[i], rest)], dtype=np.int64)
+        return np.array([i for i, metadata in enumerate(state.metadatas)
+                         if _matches(metadata, metadata_filter)], dtype=np.int64)
+
+    def _coarse_scores(self, state: _Snapshot, query: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        """Scores aproximados na matriz quantizada, calculados em blocos de linhas."""
+        total = len(state.ids) if rows is None else len(rows)
+        scores = np.empty(total, dtype=np.float32)
+        if self.quantization == "int8":
+            codes, scales = state.quantized
+        else:
+            # bit 1 -> +1 e bit 0 -> -1: score = 2 * (bits . consulta) - soma(consulta)
+            query_sum = float(query.sum())
+        for start in range(0, total, SCORE_BLOCK_ROWS):
+            end = min(start + SCORE_BLOCK_ROWS, total)
+            index = slice(start, end) if rows is None else rows[start:end]
+            if self.quantization == "int8":
+                scores[start:end] = (codes[index].astype(np.float32) @ query) * scales[index]
+            else:
+                bits = np.unpackbits(state.quantized[0][index], axis=1, count=len(query))
+                scores[start:end] = 2.0 * (bits.astype(np.float32) @ query) - query_sum
+        return scores
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k: int = 4,
+                                                          filter: Optional[Dict] = None):
+        """
+        Top-k por similaridade de cosseno: (documento, score) em ordem decrescente.
+        Com quantização, os k * RESCORE_MULTIPLIERS[modo] melhores candidatos da matriz
+        quantizada são reavaliados com os vetores float32.
+        """
+        state = self._state
+        if len(state.ids) == 0:
+            return []
+        query = normalize_rows(embedding)[0]
+        rows = self._candidate_rows(state, filter)
+        if rows is not None and len(rows) == 0:
+            return []
+
+        if self.quantization:
+            coarse = self._coarse_scores(state, query, rows)
+            n_candidates = min(len(coarse), k * RESCORE_MULTIPLIERS[self.quantization])
+            candidates = np.argpartition(-coarse, n_candidates - 1)[:n_candidates]
+            positions = candidates if rows is None else rows[candidates]
+            # Ordem crescente: leitura sequencial das páginas da matriz float32
+            positions = np.sort(positions)
+            scores = state.matrix[positions] @ query
+        elif rows is None:
+            positions = None
+            scores = state.matrix @ query
+        else:
+            positions = rows
+            scores = state.matrix[rows] @ query
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        top_positions = top if positions is None else positions[top]
+        return [
+            (Document(page_content=state.documents[p], metadata=dict(state.metadatas[p])), float(scores[t]))
+            for p, t in zip(top_positions, top)
+        ]
+
+    def similarity_search_by_vector(self, embedding, k: int = 4, filter: Optional[Dict] = None):
+        return [doc for doc, _ in self.similarity_search_by_vector_with_relevance_scores(embedding, k, filter)]
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Dict] = None):
+        return self.similarity_search_by_vector(self._embedding_function.embed_query(query), k, filter)
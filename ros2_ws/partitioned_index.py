@@ -0,0 +1,102 @@
+"""
+Partitioned Index - Sub-índices vetoriais por tipo de documento.
+Cada valor de metadata["tipo"] tem sua própria matriz de embeddings normalizados.
+Uma busca filtrada por tipo percorre apenas a sua partição: o custo não cresce
+com documentos de outros tipos e não depende do pós-filtro do vector store.
+"""
+
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from vector_utils import normalize_rows
+
+
+# Chave de metadata usada para particionar o índice
+PARTITION_KEY = "tipo"
+
+
+class _Partition:
+    """Matriz de embeddings + documentos de um único valor de PARTITION_KEY."""
+
+    def __init__(self):
+        self.matrix = None
+        self.ids = []
+        self.documents = []
+
+    def add(self, vectors: np.ndarray, documents, ids: List[str]):
+        self.matrix = vectors if self.matrix is None else np.vstack([self.matrix, vectors])
+        self.documents.extend(documents)
+        self.ids.extend(ids)
+
+    def search(self, query: np.ndarray, k: int, extra_filter: Dict):
+        """Top-k da partição: lista de (score, documento)."""
+        if self.matrix is None or not self.ids:
+            return []
+        scores = self.matrix @ query
+        if extra_filter:
+            mask = np.array([
+                all(doc.metadata.get(key) == value for key, value in extra_filter.items())
+                for doc in self.documents
+            ], dtype=bool)
+            scores = np.where(mask, scores, -np.inf)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        return [(float(scores[i]), self.documents[i]) for i in top if np.isfinite(scores[i])]
+
+
+class PartitionedIndex:
+    """
+    Índice exato particionado por metadata["tipo"], com a mesma semântica
+    de filtro por igualdade usada em search_with_filter.
+    """
+
+    def __init__(self):
+        self._partitions = {}   # valor do tipo -> _Partition
+        self._ids = set()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def partitions(self) -> Dict[str, int]:
+        """Tamanho de cada partição."""
+        return {value: len(partition.ids) for value, partition in self._partitions.items()}
+
+    def add(self, vectors, documents, ids: List[str]):
+        """Adiciona chunks (ids já presentes são ignorados)."""
+        with self._lock:
+            new_rows = [i for i, doc_id in enumerate(ids) if doc_id not in self._ids]
+            if not new_rows:
+                return
+            vectors = normalize_rows(vectors)
+            groups = {}
+            for i in new_rows:
+                value = documents[i].metadata.get(PARTITION_KEY)
+                groups.setdefault(value, []).append(i)
+            for value, rows in groups.items():
+                partition = self._partitions.setdefault(value, _Partition())
+                partition.add(vectors[rows], [documents[i] for i in rows], [ids[i] for i in rows])
+                self._ids.update(ids[i] for i in rows)
+
+    def search(self, embedding, k: int = 4, metadata_filter: Optional[Dict] = None):
+        """
+        Busca os k documentos mais similares que satisfazem o filtro.
+        Com PARTITION_KEY no filtro, só a partição correspondente é percorrida.
+        Retorna [(documento, score)] em ordem decrescente de score.
+        """
+        metadata_filter = metadata_filter or {}
+        extra_filter = {key: value for key, value in metadata_filter.items() if key != PARTITION_KEY}
+        if PARTITION_KEY in metadata_filter:
+            partition = self._partitions.get(metadata_filter[PARTITION_KEY])
+            partitions = [partition] if partition else []
+        else:
+            partitions = list(self._partitions.values())
+
+        query = normalize_rows(embedding)[0]
+        results = []
+        for partition in partitions:
+            results.extend(partition.search(query, k, extra_filter))
+        results.sort(key=lambda item: item[0], reverse=True)
+        return [(doc, score) for score, doc in results[:k]]
@@ -0,0 +1,241 @@
+"""
+RAG Benchmark - Mede latência e qualidade de recuperação do rag_pipeline.
+
+Usa um conjunto rotulado de consultas sobre o rulebook (pergunta -> páginas esperadas)
+e reporta, para get_context e search_with_filter:
+  - latência p50/p95 por estágio (embedding, search, assembly) e total
+  - recall@k e MRR
+  - tamanho médio do contexto gerado
+  - memória e tempo de carga do índice (backend NumPy, com ou sem quantização)
+Os resultados são gravados em JSON para acompanhar regressões entre commits.
+
+Uso:
+    python rag_benchmark.py [--k 4] [--mode vector|lexical|hybrid|section|adaptive|summary] [--repeats 3]
+                            [--quantization none|int8|binary]   (requer RAG_VECTOR_BACKEND=numpy)
+
+    RAG_EMBEDDINGS=hashing mede o pipeline offline, sem Ollama nem download de modelo.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import time
+from datetime import datetime
+
+import rag_pipeline
+from context_packer import estimate_tokens
+from embedding_cache import get_query_cache
+
+
+DEFAULT_QUERIES_PATH = "../RAG_Docs/benchmark_queries.json"
+DEFAULT_OUTPUT_DIR = "bench_results"
+STAGES = ["embedding", "search", "assembly"]
+
+
+def percentile(values, pct):
+    """Percentil com interpolação linear (pct entre 0 e 100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def load_query_set(path=DEFAULT_QUERIES_PATH):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def score_retrieval(documents, expected_pages, k):
+    """
+    recall@k: fração das páginas esperadas presentes nos k primeiros documentos.
+    reciprocal rank: 1 / posição do primeiro documento relevante (0 se nenhum).
+    """
+    expected = set(expected_pages)
+    found = set()
+    reciprocal_rank = 0.0
+    for rank, doc in enumerate(documents[:k], 1):
+        page = doc.metadata.get("page")
+        if page in expected:
+            found.add(page)
+            if reciprocal_rank == 0.0:
+                reciprocal_rank = 1.0 / rank
+    recall = len(found) / len(expected) if expected else 0.0
+    return recall, reciprocal_rank
+
+
+def run_method(retrieve, queries, k, repeats):
+    """
+    Executa `retrieve(pergunta) -> (contexto, documentos)` para cada consulta.
+    A primeira repetição de cada consulta parte do cache de consultas vazio.
+    """
+    get_query_cache().clear()
+    latencies = {stage: [] for stage in STAGES + ["total"]}
+    recalls, reciprocal_ranks, context_chars, context_tokens, document_counts = [], [], [], [], []
+    per_query = []
+
+    for query in queries:
+        for repeat in range(repeats):
+            with rag_pipeline.collect_stage_timings() as timings:
+                start_time = time.perf_counter()
+                context, documents = retrieve(query["question"])
+                total = time.perf_counter() - start_time
+
+            latencies["total"].append(total)
+            for stage in STAGES:
+                latencies[stage].append(timings.get(stage, 0.0))
+
+            if repeat == 0:
+                recall, reciprocal_rank = score_retrieval(documents, query["expected_pages"], k)
+                recalls.append(recall)
+                reciprocal_ranks.append(reciprocal_rank)
+                context_chars.append(len(context))
+                context_tokens.append(estimate_tokens(context))
+                document_counts.append(len(documents))
+                per_query.append({
+                    "id": query["id"],
+                    "recall": recall,
+                    "reciprocal_rank": reciprocal_rank,
+                    "retrieved_pages": [doc.metadata.get("page") for doc in documents],
+                    "latency_ms": total * 1000,
+                })
+
+    return {
+        "latency_ms": {
+            stage: {
+                "p50": percentile(values, 50) * 1000,
+                "p95": percentile(values, 95) * 1000,
+                "mean": statistics.mean(values) * 1000 if values else 0.0,
+            }
+            for stage, values in latencies.items()
+        },
+        f"recall@{k}": statistics.mean(recalls) if recalls else 0.0,
+        "mrr": statistics.mean(reciprocal_ranks) if reciprocal_ranks else 0.0,
+        "mean_context_chars": statistics.mean(context_chars) if context_chars else 0.0,
+        "mean_context_tokens": statistics.mean(context_tokens) if context_tokens else 0.0,
+        "mean_documents": statistics.mean(document_counts) if document_counts else 0.0,
+        "queries": per_query,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return "unknown"
+
+
+def load_quantized_store(quantization):
+    """
+    Recarrega o backend NumPy com a quantização pedida e o instala no rag_pipeline.
+    A primeira carga cria a matriz quantizada; o tempo medido é o de uma carga já com ela em disco.
+    """
+    if rag_pipeline.VECTOR_BACKEND != "numpy":
+        raise RuntimeError("--quantization requer RAG_VECTOR_BACKEND=numpy")
+    embeddings = rag_pipeline.get_vectorstore().embeddings
+    rag_pipeline.load_numpy_vectorstore(embeddings, quantization=quantization)
+    start_time = time.perf_counter()
+    vectorstore = rag_pipeline.load_numpy_vectorstore(embeddings, quantization=quantization)
+    load_seconds = time.perf_counter() - start_time
+    rag_pipeline.vectorstore_handle.set(vectorstore)
+    return vectorstore, load_seconds
+
+
+def print_report(results, k):
+    print(f"\n=== RAG Benchmark ({results['config']['mode']}, k={k}, commit {results['commit']}) ===")
+    index = results.get("index")
+    if index:
+        load = f"  carga={index['load_seconds'] * 1000:.1f} ms" if "load_seconds" in index else ""
+        print(f"Índice ({results['config']['quantization']}): busca={index['search'] / 1024:.0f} KiB  "
+              f"residente={index['resident'] / 1024:.0f} KiB  "
+              f"float32={index['full_precision'] / 1024:.0f} KiB{load}")
+    for method, metrics in results["methods"].items():
+        print(f"\n{method}: recall@{k}={metrics[f'recall@{k}']:.3f}  MRR={metrics['mrr']:.3f}  "
+              f"contexto médio={metrics['mean_context_tokens']:.0f} tokens "
+              f"({metrics['mean_documents']:.1f} chunks)")
+        for stage, values in metrics["latency_ms"].items():
+            print(f"  {stage:<10} p50={values['p50']:8.2f} ms  p95={values['p95']:8.2f} ms")
+    stats = results["search_stats"]
+    print(f"\nBuscas filtradas: {stats['filtered_searches']}  fallbacks: {stats['filter_fallbacks']}")
+
+
+def run_benchmark(k=4, mode=None, repeats=3, queries_path=DEFAULT_QUERIES_PATH,
+                  max_tokens=rag_pipeline.DEFAULT_CONTEXT_TOKENS, quantization=None):
+    query_set = load_query_set(queries_path)
+    queries = query_set["queries"]
+    metadata_filter = query_set.get("metadata_filter")
+    mode = mode or rag_pipeline.DEFAULT_RETRIEVAL_MODE
+
+    # A inicialização do vector store não entra nas latências medidas
+    start_time = time.perf_counter()
+    if not rag_pipeline.get_vectorstore():
+        raise RuntimeError("Vector store não inicializado.")
+    startup = time.perf_counter() - start_time
+
+    index = None
+    if quantization:
+        vectorstore, load_seconds = load_quantized_store(quantization)
+        index = dict(vectorstore.index_nbytes(), load_seconds=load_seconds)
+    elif hasattr(rag_pipeline.get_vectorstore(), "index_nbytes"):
+        index = rag_pipeline.get_vectorstore().index_nbytes()
+
+    methods = {
+        "get_context": lambda q: rag_pipeline.get_context_with_sources(
+            q, k=k, mode=mode, max_tokens=max_tokens),
+        "search_with_filter": lambda q: rag_pipeline.search_with_filter_with_sources(
+            q, metadata_filter, k=k, max_tokens=max_tokens),
+    }
+
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "config": {
+            "k": k,
+            "mode": mode,
+            "repeats": repeats,
+            "max_tokens": max_tokens,
+            "backend": rag_pipeline.VECTOR_BACKEND,
+            "embeddings": rag_pipeline.EMBEDDING_BACKEND,
+            "quantization": quantization or rag_pipeline.QUANTIZATION,
+            "queries": len(queries),
+            "query_set": os.path.basename(queries_path),
+        },
+        "startup_wait_seconds": startup,
+        "index": index,
+        "methods": {name: run_method(fn, queries, k, repeats) for name, fn in methods.items()},
+        "search_stats": rag_pipeline.search_stats(),
+    }
+
+
+def save_results(results, output_dir=DEFAULT_OUTPUT_DIR):
+    os.makedirs(output_dir, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(output_dir, f"rag_{stamp}_{results['commit']}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de recuperação do rag_pipeline")
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--mode", choices=["vector", "lexical", "hybrid", "section", "adaptive", "summary"], default=None)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--max-tokens", type=int, default=rag_pipeline.DEFAULT_CONTEXT_TOKENS,
+                        help="orçamento de tokens do contexto (0 = sem limite)")
+    parser.add_argument("--quantization", choices=["none", "int8", "binary"], default=None,
+                        help="recarrega o backend NumPy com esta quantização antes de medir")
+    parser.add_argument("--queries", default=DEFAULT_QUERIES_PATH)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_DIR)
+    args = parser.parse_args()
+
+    results = run_benchmark(k=args.k, mode=args.mode, repeats=args.repeats, queries_path=args.queries,
+                            max_tokens=args.max_tokens or None, quantization=args.quantization)
+    print_report(results, args.k)
+    print(f"\nResultados gravados em: {save_results(results, args.output)}")
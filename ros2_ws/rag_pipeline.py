@@ -1,38 +1,140 @@
 from langchain_community.document_loaders import WebBaseLoader
 from langchain_community.document_loaders import TextLoader
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_ollama import OllamaEmbeddings
 from langchain_community.vectorstores import Chroma
+import asyncio
 import json
 import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
 
+import numpy as np
 
-def load_documents():
+from context_packer import estimate_tokens, pack_context
+from embedding_cache import CachedEmbeddings, get_embedding_cache, query_cache_key, text_hash
+from ingestion import file_hash, load_pdf_documents, pipelined_ingest, prefetch, split_documents, split_sections
+from lexical_index import BM25Index, reciprocal_rank_fusion
+from near_duplicates import NearDuplicateIndex
+from partitioned_index import PartitionedIndex
+from reranking import adaptive_k, is_redundant, mmr
+from store_handle import VectorStoreHandle
+from summary_index import SUMMARY_NODE_TYPE, is_broad_query
+from vector_utils import normalize_rows
+
+
+# Modo de recuperação padrão: "vector" (denso), "lexical" (BM25), "hybrid" (fusão)
+# ou "section" (um chunk preciso expandido para os vizinhos da mesma seção)
+# ou "adaptive" (quantidade de chunks guiada pelos scores, com MMR contra duplicatas)
+# ou "summary" (um nó de resumo de seção/capítulo, gerado por summary_index.py).
+# Sem modo explícito, perguntas amplas usam "summary" quando há resumos indexados.
+DEFAULT_RETRIEVAL_MODE = "vector"
+# Modo "adaptive": candidatos buscados = k * ADAPTIVE_FETCH_MULTIPLIER
+ADAPTIVE_FETCH_MULTIPLIER = 3
+
+# Modelo de embeddings: "auto" (Ollama, senão HuggingFace), "ollama", "huggingface"
+# ou "hashing" (local, sem download nem servidor; para testes e benchmarks offline)
+EMBEDDING_BACKEND = os.environ.get("RAG_EMBEDDINGS", "auto")
+
+# Modelo de embeddings do Ollama
+OLLAMA_EMBEDDING_MODEL = "nomic-embed-text"
+
+# Backend do vector store: "chroma" (SQLite + HNSW) ou "numpy" (busca exata, memory-mapped)
+VECTOR_BACKEND = os.environ.get("RAG_VECTOR_BACKEND", "chroma")
+# Vetores de modelos diferentes têm dimensões diferentes: o embedder local usa stores próprios
+_STORE_SUFFIX = "_hashing" if EMBEDDING_BACKEND == "hashing" else ""
+CHROMA_DB_PATH = "../Classifier_XML/vector_db" + _STORE_SUFFIX
+NUMPY_STORE_PATH = "../Classifier_XML/vector_db_numpy" + _STORE_SUFFIX
+# Backend NumPy: "none", "int8" (4x menor) ou "binary" (32x menor), com rescoring em float32
+QUANTIZATION = os.environ.get("RAG_QUANTIZATION", "none")
+
+# Orçamento de tokens do contexto enviado à LLM (None = sem limite)
+DEFAULT_CONTEXT_TOKENS = 700
+
+# Fontes da base de conhecimento. O nome em metadata["source"] identifica a fonte no manifest.
+# chunker: "recursive" (RecursiveCharacterTextSplitter) ou "sections" (section_chunker)
+# section_chunks: também indexa chunks por seção (node_type "section"), usados só
+# pelo modo "section"; os demais modos continuam nos chunks do chunker da fonte
+KNOWLEDGE_SOURCES = [
+    {
+        "path": "../RAG_Docs/rulebook.pdf",
+        "metadata": {"source": "rulebook.pdf", "tipo": "rulebook", "file_type": "pdf"},
+        "chunker": "recursive",
+        "section_chunks": True,
+    },
+]
+
+# Tipo dos chunks de seção indexados ao lado dos chunks comuns (section_chunks)
+SECTION_NODE_TYPE = "section"
+
+# Chunks prontos aguardando embedding na ingestão em streaming (backpressure do chunking)
+CHUNK_QUEUE_SIZE = 256
+
+# Manifest da ingestão (hash de cada fonte e de cada página + ids dos chunks), gravado ao lado do store
+MANIFEST_FILE = "ingest_manifest.json"
+
+
+def load_source_documents(source):
+    """Carrega as páginas de uma fonte de KNOWLEDGE_SOURCES."""
+    # Extração paralela, com cache em disco chaveado pelo hash do arquivo
+    return load_pdf_documents(source["path"], metadata=source["metadata"])
+
+
+def split_source_documents(source, page_docs):
     """
-    Carrega documentos de diferentes fontes.
-    Atualmente carrega apenas PDF, mas preparado para expansão futura.
+    Divide as páginas de uma fonte com o chunker configurado para ela e, com
+    section_chunks, acrescenta os chunks de seção (node_type "section").
     """
-    all_docs = []
-    
-    # 1. Carregar arquivo PDF (rulebook)
-    pdf_path = "../RAG_Docs/rulebook.pdf"
-    if os.path.exists(pdf_path):
-        pdf_loader = PyPDFLoader(pdf_path)
-        pdf_docs = pdf_loader.load()
-        
-        # Adicionar metadados aos documentos PDF
-        for doc in pdf_docs:
-            doc.metadata.update({
-                "source": "rulebook.pdf",
-                "tipo": "rulebook",
-                "file_type": "pdf"
-            })
-        
-        all_docs.extend(pdf_docs)
-        print(f"Carregados {len(pdf_docs)} páginas do PDF")
+    if source.get("chunker") == "sections":
+        chunks = split_sections(page_docs)
     else:
-        print(f"Arquivo PDF não encontrado em: {pdf_path}")
+        chunks = split_documents(page_docs)
+    if source.get("section_chunks"):
+        section_nodes = split_sections(page_docs)
+        for node in section_nodes:
+            node.metadata["node_type"] = SECTION_NODE_TYPE
+            node.metadata["chunk_id"] = f"{SECTION_NODE_TYPE}:{node.metadata['chunk_id']}"
+        chunks = chunks + section_nodes
+    return chunks
+
+
+def source_chunker(source):
+    """Chunker(s) de uma fonte, como registrado no manifest (mudá-lo reindexa a fonte)."""
+    chunker = source.get("chunker", "recursive")
+    return chunker + "+sections" if source.get("section_chunks") else chunker
+
+
+def group_source_documents(documents):
+    """
+    Agrupa documentos já carregados por fonte: gera (fonte, páginas), com fonte
+    None para documentos que não pertencem a KNOWLEDGE_SOURCES.
+    """
+    remaining = list(documents)
+    for source in KNOWLEDGE_SOURCES:
+        name = source["metadata"]["source"]
+        page_docs = [doc for doc in remaining if doc.metadata.get("source") == name]
+        if page_docs:
+            yield source, page_docs
+            remaining = [doc for doc in remaining if doc.metadata.get("source") != name]
+    if remaining:
+        yield None, remaining
+
+
+def iter_source_documents():
+    """
+    Carrega as fontes da base de conhecimento uma a uma: gera (fonte, páginas).
+    Só as páginas da fonte atual ficam em memória.
+    """
+    # 1. Carregar arquivos PDF (rulebook)
+    for source in KNOWLEDGE_SOURCES:
+        pdf_path = source["path"]
+        if os.path.exists(pdf_path):
+            pdf_docs = load_source_documents(source)
+            print(f"Carregados {len(pdf_docs)} páginas do PDF")
+            yield source, pdf_docs
+        else:
+            print(f"Arquivo PDF não encontrado em: {pdf_path}")
     
     # TODO: Futuras expansões para outros tipos de arquivo
     # 
@@ -47,7 +149,7 @@ def load_documents():
     #             "tipo": "text_document",
     #             "file_type": "txt"
     #         })
-    #     all_docs.extend(text_docs)
+    #     yield None, text_docs
     #
     # 3. Carregar páginas web (quando necessário)
     # urls = ["https://example.com"]
@@ -59,23 +161,57 @@ def load_documents():
     #         "tipo": "web_content",
     #         "file_type": "html"
     #     })
-    # all_docs.extend(web_docs)
-    
-    return all_docs
+    # yield None, web_docs
+
+
+def load_documents():
+    """
+    Carrega documentos de diferentes fontes numa única lista.
+    A criação do vector store usa iter_source_documents, sem materializar tudo.
+    """
+    return [doc for _, page_docs in iter_source_documents() for doc in page_docs]
+
+
+def stream_chunks(source_documents, manifest_sources, duplicate_indexes=None):
+    """
+    Estágios chunk -> dedupe da ingestão: para cada (fonte, páginas), divide com o
+    chunker da fonte, descarta quase duplicados e gera os chunks restantes.
+    A entrada do manifest de cada fonte é registrada em `manifest_sources`.
+    """
+    duplicate_indexes = {} if duplicate_indexes is None else duplicate_indexes
+    for source, page_docs in source_documents:
+        chunks = split_source_documents(source, page_docs) if source else split_documents(page_docs)
+        # Chunks quase idênticos (cabeçalhos, rodapés, texto repetido) não são embutidos
+        kept, dropped = filter_by_node_type(duplicate_indexes, chunks)
+        name = source["metadata"]["source"] if source else "outros documentos"
+        print(f"{name}: {len(chunks)} chunks"
+              + (f" ({len(dropped)} quase duplicados descartados)" if dropped else ""))
+        if source:
+            manifest_sources[name] = source_manifest_entry(source, page_docs, kept)
+        yield from kept
 
 
 def get_embeddings():
     """
-    Configura e retorna o modelo de embeddings
+    Configura e retorna o modelo de embeddings (ver EMBEDDING_BACKEND)
     """
+    if EMBEDDING_BACKEND == "hashing":
+        from hashing_embeddings import HashingEmbeddings
+        print("Usando hashing embeddings (local)")
+        return HashingEmbeddings()
+
     try:
-        # Tentar Ollama primeiro
-        embeddings = OllamaEmbeddings(model="nomic-embed-text")
-        test_embedding = embeddings.embed_query("test")
+        if EMBEDDING_BACKEND == "huggingface":
+            raise RuntimeError("RAG_EMBEDDINGS=huggingface")
+        # Tentar Ollama primeiro: só confere se o servidor tem o modelo (sem gerar um embedding)
+        from ollama import Client
+        Client().show(OLLAMA_EMBEDDING_MODEL)
         print("Usando Ollama embeddings")
-        return embeddings
+        return OllamaEmbeddings(model=OLLAMA_EMBEDDING_MODEL)
     except Exception as e:
         print(f"Ollama não disponível: {e}")
+        if EMBEDDING_BACKEND == "ollama":
+            return None
         try:
             # Fallback para HuggingFace
             from langchain_community.embeddings import HuggingFaceEmbeddings
@@ -90,15 +226,77 @@ def get_embeddings():
             return None
 
 
+_cached_embeddings = None
+_embeddings_lock = threading.Lock()
+
+
+def get_cached_embeddings():
+    """
+    Retorna o modelo de embeddings envolvido pelo cache persistente em disco.
+    Chunks já embutidos (mesmo modelo, mesmo texto) não voltam ao Ollama.
+    O modelo é configurado uma única vez por processo (carregar e criar o
+    store reaproveitam a mesma instância).
+    """
+    global _cached_embeddings
+    with _embeddings_lock:
+        if _cached_embeddings is None:
+            embeddings = get_embeddings()
+            if not embeddings:
+                return None
+            _cached_embeddings = CachedEmbeddings(embeddings, get_embedding_cache())
+        return _cached_embeddings
+
+
+def load_numpy_vectorstore(embeddings, quantization=None):
+    """
+    Carrega o backend NumPy; se ainda não existir, exporta os embeddings
+    já armazenados no Chroma (sem reembutir nada).
+    """
+    from numpy_store import NumpyVectorStore
+
+    quantization = quantization or QUANTIZATION
+    if NumpyVectorStore.exists(NUMPY_STORE_PATH):
+        vectorstore = NumpyVectorStore.load(NUMPY_STORE_PATH, embeddings, quantization=quantization)
+        print(f"Vector store NumPy carregado de: {NUMPY_STORE_PATH} ({len(vectorstore)} chunks, "
+              f"quantização: {quantization})")
+        return vectorstore
+
+    if os.path.exists(CHROMA_DB_PATH):
+        chroma_store = Chroma(
+            persist_directory=CHROMA_DB_PATH,
+            embedding_function=embeddings,
+            collection_name="robot_agent_docs"
+        )
+        if chroma_store.get(limit=1)["ids"]:
+            vectorstore = NumpyVectorStore.from_chroma(chroma_store, NUMPY_STORE_PATH, quantization=quantization)
+            # Os ids dos chunks são preservados, então o manifest do Chroma continua válido
+            chroma_manifest = os.path.join(CHROMA_DB_PATH, MANIFEST_FILE)
+            if os.path.exists(chroma_manifest):
+                shutil.copyfile(chroma_manifest, os.path.join(NUMPY_STORE_PATH, MANIFEST_FILE))
+            print(f"Vector store NumPy exportado do Chroma para: {NUMPY_STORE_PATH}")
+            return vectorstore
+
+    return None
+
+
 def load_existing_vectorstore():
     """
     Carrega um vector store existente se disponível
     """
-    chroma_db_path = "../Classifier_XML/vector_db"
+    chroma_db_path = CHROMA_DB_PATH
+
+    if VECTOR_BACKEND == "numpy":
+        try:
+            embeddings = get_cached_embeddings()
+            if embeddings:
+                return load_numpy_vectorstore(embeddings)
+        except Exception as e:
+            print(f"Erro ao carregar vector store NumPy: {e}")
+        return None
     
     if os.path.exists(chroma_db_path):
         try:
-            embeddings = get_embeddings()
+            embeddings = get_cached_embeddings()
             if embeddings:
                 vectorstore = Chroma(
                     persist_directory=chroma_db_path,
@@ -113,74 +311,555 @@ def load_existing_vectorstore():
     return None
 
 
-def create_vector_store(documents, batch_size=10):
+def create_vector_store(documents=None, batch_size=10, max_in_flight=1, write_batch_size=256,
+                        chunk_queue_size=CHUNK_QUEUE_SIZE):
     """
-    Cria o vector store com ChromaDB a partir dos documentos carregados.
-    Processa em batches para melhor performance.
+    Cria o vector store a partir das fontes da base de conhecimento (ou de
+    `documents`, se fornecidos), num pipeline de estágios encadeados:
+    carga -> chunking -> dedupe -> embedding -> escrita.
+    Cada estágio roda à frente do seguinte no máximo até a sua fila encher
+    (uma fonte carregada, `chunk_queue_size` chunks, `max_in_flight` batches
+    de embedding de `batch_size` chunks, um lote de escrita de
+    `write_batch_size` chunks), então a memória não cresce com a base.
+    Se a ingestão falhar, o store incompleto é apagado (ver discard_partial_store).
     """
-    if not documents:
-        print("Nenhum documento encontrado para processar.")
-        return None
-    
-    # Dividir documentos em chunks
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=150,
-        separators=["\n\n", "\n", ".", "!", "?", ";", ":", " ", ""]
-    )
-    chunks = splitter.split_documents(documents)
-    print(f"Documentos divididos em {len(chunks)} chunks")
-    
-    # Caminho para o ChromaDB
-    chroma_db_path = "../Classifier_XML/vector_db"
-    
-    embeddings = get_embeddings()
+    embeddings = get_cached_embeddings()
     if not embeddings:
         print("Não foi possível configurar embeddings.")
         return None
-    
+
+    source_documents = iter_source_documents() if documents is None else group_source_documents(documents)
+    manifest_sources = {}
+    chunks = prefetch(
+        stream_chunks(prefetch(source_documents, maxsize=1), manifest_sources),
+        maxsize=chunk_queue_size
+    )
+
+    persist_path = NUMPY_STORE_PATH if VECTOR_BACKEND == "numpy" else CHROMA_DB_PATH
+    # Só um store criado por esta chamada é apagado em caso de falha
+    created = not os.path.exists(persist_path)
+    vectorstore = None
     try:
-        # Processar em batches menores
-        vectorstore = None
-        
-        for i in range(0, len(chunks), batch_size):
-            batch = chunks[i:i+batch_size]
-            print(f"Processando batch {i//batch_size + 1}/{(len(chunks) + batch_size - 1)//batch_size}")
-            
-            if vectorstore is None:
-                # Criar novo vector store com o primeiro batch
-                vectorstore = Chroma.from_documents(
-                    batch,
-                    embeddings,
-                    persist_directory=chroma_db_path,
-                    collection_name="robot_agent_docs"
-                )
-            else:
-                # Adicionar ao vector store existente
-                vectorstore.add_documents(batch)
+        if VECTOR_BACKEND == "numpy":
+            # Busca exata: os vetores calculados vão direto para a matriz
+            from numpy_store import NumpyVectorStore
+            vectorstore = NumpyVectorStore.create(persist_path, embeddings, quantization=QUANTIZATION)
+
+            def write_batch(docs, vectors):
+                vectorstore.add_embeddings(vectors, [doc.page_content for doc in docs],
+                                           [doc.metadata for doc in docs],
+                                           ids=[chunk_id(doc) for doc in docs])
+        else:
+            vectorstore = Chroma(
+                persist_directory=persist_path,
+                embedding_function=embeddings,
+                collection_name="robot_agent_docs"
+            )
+
+            def write_batch(docs, vectors):
+                # Os vetores já estão no cache de embeddings: a inserção no
+                # Chroma só os relê do cache, sem nova chamada ao modelo
+                vectorstore.add_documents(docs, ids=[chunk_id(doc) for doc in docs])
+
+        summary = pipelined_ingest(
+            chunks, embeddings, write_batch,
+            batch_size=batch_size,
+            max_in_flight=max_in_flight,
+            write_batch_size=write_batch_size
+        )
         
-        print(f"Vector store criado/atualizado em: {chroma_db_path}")
+        if summary["chunks"] == 0:
+            print("Nenhum documento encontrado para processar.")
+            if created:
+                discard_partial_store(vectorstore, persist_path)
+            return None
+
+        print(f"Vector store criado/atualizado em: {persist_path}")
+        print(f"Ingestão: {summary['chunks']} chunks em {summary['seconds']:.1f}s "
+              f"({summary['chunks_per_second']:.1f} chunks/s)")
+        print(f"Cache de embeddings: {embeddings.hits} reaproveitados, {embeddings.misses} novos")
+        save_manifest({"sources": manifest_sources})
         return vectorstore
         
     except Exception as e:
         print(f"Erro ao criar vector store: {e}")
+        if created:
+            discard_partial_store(vectorstore, persist_path)
         return None
+    finally:
+        # Encerra as threads de carga/chunking se a ingestão parou antes do fim
+        chunks.close()
 
 
-# Configuração inicial - tenta carregar existente primeiro
-print("Inicializando RAG Pipeline...")
-vectorstore = load_existing_vectorstore()
+def discard_partial_store(vectorstore, persist_path):
+    """
+    Apaga um store criado pela metade (ex.: um batch de embedding falhou).
+    Sem isso, a próxima inicialização carregaria o store incompleto.
+    """
+    if vectorstore is not None and hasattr(vectorstore, "delete_collection"):
+        try:
+            vectorstore.delete_collection()
+        except Exception as e:
+            print(f"Erro ao apagar a coleção incompleta: {e}")
+    if persist_path and os.path.exists(persist_path):
+        shutil.rmtree(persist_path, ignore_errors=True)
+        print(f"Store incompleto removido: {persist_path}")
+
+
+def build_vectorstore():
+    """
+    Configuração inicial - tenta carregar existente primeiro, senão cria um novo
+    """
+    print("Inicializando RAG Pipeline...")
+    vectorstore = load_existing_vectorstore()
 
-if not vectorstore:
-    print("Vector store não encontrado. Criando novo...")
-    all_docs = load_documents()
-    if all_docs:
-        vectorstore = create_vector_store(all_docs, batch_size=5)  # Batches menores
+    if vectorstore is None:
+        print("Vector store não encontrado. Criando novo...")
+        # Batches menores, com várias requisições de embedding em paralelo
+        vectorstore = create_vector_store(batch_size=5, max_in_flight=4)
     else:
-        print("Nenhum documento carregado.")
-        vectorstore = None
-else:
-    print("Vector store existente carregado com sucesso!")
+        print("Vector store existente carregado com sucesso!")
+        if index_is_stale():
+            # O handle ainda não está pronto: o store é passado explicitamente
+            print("Fontes alteradas desde a última indexação. Atualizando índice...")
+            update_index(vectorstore)
+            return vectorstore
+
+    if vectorstore is not None:
+        rebuild_search_indexes(vectorstore)
+
+    return vectorstore
+
+
+# ==================== MANIFEST / ATUALIZAÇÃO INCREMENTAL ====================
+
+_update_lock = threading.Lock()
+
+
+def manifest_path():
+    store_path = NUMPY_STORE_PATH if VECTOR_BACKEND == "numpy" else CHROMA_DB_PATH
+    return os.path.join(store_path, MANIFEST_FILE)
+
+
+def load_manifest():
+    """Retorna o manifest da ingestão, ou None se não existir (store antigo ou inexistente)."""
+    path = manifest_path()
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Manifest inválido ignorado ({path}): {e}")
+        return None
+
+
+def save_manifest(manifest):
+    path = manifest_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
+
+def source_manifest_entry(source, page_docs, chunks):
+    """
+    Entrada do manifest para uma fonte: hash do arquivo, número de páginas e,
+    por página, o hash do texto e os ids dos chunks gerados a partir dela.
+    """
+    pages = {
+        str(doc.metadata.get("page")): {"hash": text_hash(doc.page_content), "chunk_ids": []}
+        for doc in page_docs
+    }
+    for chunk in chunks:
+        page = pages.get(str(chunk.metadata.get("page")))
+        if page is not None:
+            page["chunk_ids"].append(chunk_id(chunk))
+    return {
+        "path": source["path"],
+        "hash": file_hash(source["path"]),
+        "chunker": source_chunker(source),
+        "page_count": len(page_docs),
+        "pages": pages,
+    }
+
+
+def _source_unchanged(source, entry):
+    return (entry["hash"] == file_hash(source["path"])
+            and entry.get("chunker", "recursive") == source_chunker(source))
+
+
+def index_is_stale():
+    """True se alguma fonte foi adicionada, removida ou alterada desde a última indexação."""
+    manifest = load_manifest()
+    if manifest is None:
+        return True
+    indexed = manifest.get("sources", {})
+    current = {
+        source["metadata"]["source"]: source
+        for source in KNOWLEDGE_SOURCES if os.path.exists(source["path"])
+    }
+    if set(current) != set(indexed):
+        return True
+    return any(not _source_unchanged(source, indexed[name]) for name, source in current.items())
+
+
+def _seed_embedding_cache(vectorstore, stored):
+    """
+    Store sem manifest (chunks com ids aleatórios): copia os vetores já armazenados
+    para o cache de embeddings, para que a reindexação não volte ao modelo.
+    """
+    embeddings = vectorstore.embeddings
+    if VECTOR_BACKEND == "numpy" or not isinstance(embeddings, CachedEmbeddings):
+        # O backend NumPy guarda vetores normalizados, diferentes dos originais do modelo
+        return
+    vectors = stored.get("embeddings")
+    if vectors is None or len(vectors) == 0:
+        return
+    embeddings.cache.put_many(embeddings.model_name, [
+        (text_hash(text), list(map(float, vector)))
+        for text, vector in zip(stored["documents"], vectors)
+    ])
+
+
+def update_index(vectorstore=None):
+    """
+    Atualiza o vector store de forma incremental a partir do manifest:
+    fontes com hash diferente são divididas de novo e os ids dos chunks são
+    comparados com os do manifest. Chunks que deixaram de existir (páginas
+    alteradas ou removidas) são apagados e só os chunks novos são embutidos,
+    exceto os quase duplicados de chunks já armazenados.
+    O manifest registra apenas os chunks que estão no store.
+    Retorna um resumo com o número de chunks adicionados e removidos.
+    """
+    if vectorstore is None:
+        vectorstore = vectorstore_handle.get()
+    if vectorstore is None:
+        print("Vector store não inicializado.")
+        return None
+
+    with _update_lock:
+        start_time = time.perf_counter()
+        manifest = load_manifest()
+        removed_ids = []
+
+        if manifest is None:
+            # Store antigo, sem manifest: reindexa tudo com ids estáveis
+            stored = vectorstore.get(include=["embeddings", "documents"])
+            _seed_embedding_cache(vectorstore, stored)
+            removed_ids.extend(stored["ids"])
+            manifest = {"sources": {}}
+
+        indexed = manifest.get("sources", {})
+        sources = {}
+        changed = []        # (fonte, páginas, chunks) das fontes alteradas
+        new_chunks = []
+
+        for source in KNOWLEDGE_SOURCES:
+            name = source["metadata"]["source"]
+            if not os.path.exists(source["path"]):
+                continue
+            previous = indexed.get(name)
+            if previous and _source_unchanged(source, previous):
+                sources[name] = previous
+                continue
+
+            # Redividir a fonte inteira é barato (páginas e chunks vêm do cache em disco);
+            # só os chunks com id novo vão para o modelo de embeddings
+            page_docs = load_source_documents(source)
+            chunks = split_source_documents(source, page_docs)
+            old_pages = previous["pages"] if previous else {}
+            old_ids = {chunk for page in old_pages.values() for chunk in page["chunk_ids"]}
+            new_ids = {chunk_id(chunk) for chunk in chunks}
+            removed_ids.extend(old_ids - new_ids)
+            new_chunks.extend(chunk for chunk in chunks if chunk_id(chunk) not in old_ids)
+            changed.append((source, page_docs, chunks))
+            sources[name] = None    # entrada gravada depois da deduplicação
+
+            page_hashes = {str(doc.metadata.get("page")): text_hash(doc.page_content) for doc in page_docs}
+            changed_pages = sum(1 for page, page_hash in page_hashes.items()
+                                if old_pages.get(page, {}).get("hash") != page_hash)
+            print(f"[Index] {name}: {changed_pages} de {len(page_docs)} páginas alteradas, "
+                  f"{len(new_ids - old_ids)} chunks novos")
+
+        # Fontes removidas da configuração ou do disco
+        for name, entry in indexed.items():
+            if name not in sources:
+                for page in entry["pages"].values():
+                    removed_ids.extend(page["chunk_ids"])
+                print(f"[Index] {name}: fonte removida")
+
+        # Resumos (summary_index.py) de fontes alteradas ou removidas ficam desatualizados
+        summaries = dict(manifest.get("summaries", {}))
+        for name in [name for name in summaries if sources.get(name) is None]:
+            removed_ids.extend(summaries.pop(name))
+            print(f"[Index] {name}: resumos removidos (rode summary_index.py para gerá-los de novo)")
+
+        # Chunks que não mudaram numa página alterada mantêm o mesmo id (upsert)
+        stale_ids = sorted(set(removed_ids) - {chunk_id(doc) for doc in new_chunks})
+        if stale_ids:
+            vectorstore.delete(ids=stale_ids)
+            reset_duplicate_index()
+        new_chunks, dropped = filter_near_duplicates(new_chunks, vectorstore)
+        added_ids = [chunk_id(doc) for doc in new_chunks]
+        if new_chunks:
+            vectorstore.add_documents(new_chunks, ids=added_ids)
+
+        for source, page_docs, chunks in changed:
+            stored_chunks = [chunk for chunk in chunks if chunk_id(chunk) not in dropped]
+            sources[source["metadata"]["source"]] = source_manifest_entry(source, page_docs, stored_chunks)
+        save_manifest({"sources": sources, "summaries": summaries})
+        if stale_ids or new_chunks:
+            rebuild_search_indexes(vectorstore)
+            notify_index_changed(added_ids=added_ids, removed_ids=stale_ids)
+        elif len(lexical_index) == 0:
+            rebuild_search_indexes(vectorstore)
+
+        summary = {
+            "added": len(added_ids),
+            "removed": len(stale_ids),
+            "seconds": time.perf_counter() - start_time,
+        }
+        print(f"[Index] Atualização incremental: {summary['added']} chunks embutidos, "
+              f"{summary['removed']} removidos em {summary['seconds']:.2f}s")
+        return summary
+
+
+def replace_summary_nodes(nodes, vectorstore=None):
+    """
+    Substitui os nós de resumo do store pelos `nodes` (gerados por summary_index.py).
+    Os ids ficam no manifest, por fonte, para que update_index remova os resumos
+    de uma fonte quando ela mudar.
+    """
+    if vectorstore is None:
+        vectorstore = vectorstore_handle.get()
+    if vectorstore is None:
+        print("Vector store não inicializado.")
+        return None
+
+    with _update_lock:
+        manifest = load_manifest() or {"sources": {}}
+        old_ids = sorted({node for ids in manifest.get("summaries", {}).values() for node in ids})
+        if old_ids:
+            vectorstore.delete(ids=old_ids)
+        new_ids = [chunk_id(node) for node in nodes]
+        if nodes:
+            vectorstore.add_documents(nodes, ids=new_ids)
+
+        summaries = {}
+        for node in nodes:
+            summaries.setdefault(node.metadata.get("source"), []).append(chunk_id(node))
+        manifest["summaries"] = summaries
+        save_manifest(manifest)
+
+        rebuild_search_indexes(vectorstore)
+        notify_index_changed(added_ids=new_ids, removed_ids=old_ids)
+        print(f"[Index] {len(new_ids)} resumos indexados ({len(old_ids)} substituídos)")
+        return {"added": len(new_ids), "removed": len(old_ids)}
+
+
+vectorstore_handle = VectorStoreHandle(build_vectorstore)
+
+# Índice BM25 sobre os mesmos chunks do vector store (reconstruído na inicialização)
+lexical_index = BM25Index()
+
+# Sub-índices vetoriais por "tipo", usados pelas buscas filtradas
+partition_index = PartitionedIndex()
+
+# Chunks de cada seção (section_chunker): section_id -> {chunk_index: documento}
+section_chunks = {}
+
+# Nós de resumo (summary_index) e chunks de seção (section_chunks) presentes no store
+summary_count = 0
+section_node_count = 0
+
+# Contadores das buscas filtradas (ex.: quantas vezes caíram na busca sem filtro)
+_search_counters = {"filtered_searches": 0, "filter_fallbacks": 0}
+_search_counters_lock = threading.Lock()
+
+
+def _count(counter):
+    with _search_counters_lock:
+        _search_counters[counter] += 1
+
+
+def search_stats():
+    """Contadores das buscas filtradas."""
+    with _search_counters_lock:
+        return dict(_search_counters)
+
+
+# Callbacks notificados quando os chunks do índice mudam: fn(added_ids, removed_ids)
+_index_listeners = []
+
+
+def register_index_listener(listener):
+    """Registra um callback para mudanças no índice (ex.: invalidar caches de respostas)."""
+    _index_listeners.append(listener)
+
+
+def notify_index_changed(added_ids=None, removed_ids=None):
+    for listener in list(_index_listeners):
+        try:
+            listener(added_ids=added_ids, removed_ids=removed_ids)
+        except Exception as e:
+            print(f"Erro ao notificar mudança no índice: {e}")
+
+
+def chunk_id(doc):
+    """Id estável de um chunk: o do metadata, ou derivado do conteúdo."""
+    return doc.metadata.get("chunk_id") or text_hash(doc.page_content)[:24]
+
+
+def is_auxiliary_node(doc):
+    """Nós de resumo e de seção: só os modos "summary" e "section" os usam."""
+    return doc.metadata.get("node_type") in (SUMMARY_NODE_TYPE, SECTION_NODE_TYPE)
+
+
+def rebuild_search_indexes(vectorstore):
+    """
+    Reconstrói o índice BM25 e as partições por tipo a partir dos chunks
+    armazenados no vector store (uma única leitura do store).
+    O backend NumPy já particiona por tipo internamente e não precisa das partições.
+    Os nós de resumo e de seção ficam fora desses índices (ver is_auxiliary_node).
+    """
+    global lexical_index, partition_index, section_chunks, summary_count, section_node_count
+    from langchain_core.documents import Document
+
+    start_time = time.perf_counter()
+    use_partitions = VECTOR_BACKEND != "numpy"
+    include = ["embeddings", "documents", "metadatas"] if use_partitions else ["documents", "metadatas"]
+    stored = vectorstore.get(include=include)
+    documents = []
+    vectors = []
+    section_nodes = []
+    summaries = 0
+    for row, (text, metadata) in enumerate(zip(stored["documents"], stored["metadatas"])):
+        doc = Document(page_content=text, metadata=metadata or {})
+        if doc.metadata.get("node_type") == SECTION_NODE_TYPE:
+            section_nodes.append(doc)
+            continue
+        if is_auxiliary_node(doc):
+            summaries += 1
+            continue
+        documents.append(doc)
+        if use_partitions:
+            vectors.append(stored["embeddings"][row])
+    ids = [chunk_id(doc) for doc in documents]
+
+    index = BM25Index()
+    index.add_documents(documents, ids)
+    lexical_index = index
+    print(f"Índice lexical (BM25) com {len(index)} chunks criado em "
+          f"{time.perf_counter() - start_time:.2f}s")
+
+    partitions = PartitionedIndex()
+    if use_partitions and documents:
+        partitions.add(vectors, documents, ids)
+        print(f"Partições por tipo: {partitions.partitions()}")
+    partition_index = partitions
+
+    sections = {}
+    index_sections(section_nodes or documents, sections)
+    section_chunks = sections
+    summary_count = summaries
+    section_node_count = len(section_nodes)
+    reset_duplicate_index()
+
+
+# Assinaturas MinHash dos chunks armazenados, por node_type (construído sob demanda)
+_duplicate_indexes = None
+_duplicate_index_lock = threading.Lock()
+
+
+def reset_duplicate_index():
+    global _duplicate_indexes
+    with _duplicate_index_lock:
+        _duplicate_indexes = None
+
+
+def filter_by_node_type(indexes, chunks):
+    """
+    Filtra quase duplicados separadamente por node_type (um índice por tipo em
+    `indexes`): um chunk de seção repete o texto de chunks comuns sem competir com eles.
+    Retorna (chunks mantidos, {id descartado: id mantido}).
+    """
+    groups = {}
+    for chunk in chunks:
+        groups.setdefault(chunk.metadata.get("node_type"), []).append(chunk)
+    dropped = {}
+    for node_type, group in groups.items():
+        index = indexes.setdefault(node_type, NearDuplicateIndex())
+        dropped.update(index.filter(group, [chunk_id(doc) for doc in group])[1])
+    return [chunk for chunk in chunks if chunk_id(chunk) not in dropped], dropped
+
+
+def filter_near_duplicates(chunks, vectorstore=None):
+    """
+    Descarta chunks quase idênticos a chunks já armazenados ou a outros do mesmo lote.
+    Retorna (chunks mantidos, {id descartado: id mantido}).
+    """
+    global _duplicate_indexes
+    from langchain_core.documents import Document
+
+    if not chunks:
+        return chunks, {}
+    if vectorstore is None:
+        vectorstore = vectorstore_handle.get()
+    with _duplicate_index_lock:
+        if _duplicate_indexes is None:
+            stored = vectorstore.get(include=["documents", "metadatas"])
+            groups = {}
+            for text, metadata in zip(stored["documents"], stored["metadatas"]):
+                doc = Document(page_content=text, metadata=metadata or {})
+                groups.setdefault(doc.metadata.get("node_type"), []).append(doc)
+            indexes = {}
+            for node_type, docs in groups.items():
+                index = indexes[node_type] = NearDuplicateIndex()
+                index.add_texts([chunk_id(doc) for doc in docs], [doc.page_content for doc in docs])
+            _duplicate_indexes = indexes
+        kept, dropped = filter_by_node_type(_duplicate_indexes, chunks)
+    if dropped:
+        print(f"[Dedup] {len(dropped)} chunks quase duplicados descartados")
+    return kept, dropped
+
+
+def index_sections(documents, sections=None):
+    """Registra os chunks com metadados de seção para a expansão por vizinhos."""
+    sections = section_chunks if sections is None else sections
+    for doc in documents:
+        section_id = doc.metadata.get("section_id")
+        if section_id is not None:
+            sections.setdefault(section_id, {})[doc.metadata.get("chunk_index", 0)] = doc
+
+
+def expand_section(doc, max_tokens=DEFAULT_CONTEXT_TOKENS):
+    """
+    Expande um chunk para os vizinhos da mesma seção, alternando o seguinte e o
+    anterior, enquanto couberem em `max_tokens`. Retorna os chunks na ordem da seção.
+    """
+    neighbors = section_chunks.get(doc.metadata.get("section_id"))
+    if not neighbors:
+        return [doc]
+    position = doc.metadata.get("chunk_index", 0)
+    # O packer acrescenta o caminho de títulos antes do trecho
+    heading_tokens = estimate_tokens(doc.metadata.get("heading_path", "")) + 1
+    budget = (max_tokens or DEFAULT_CONTEXT_TOKENS) - heading_tokens - estimate_tokens(doc.page_content)
+    selected = {position: doc}
+    first = last = position
+    open_directions = {1, -1}
+    while open_directions:
+        for direction in sorted(open_directions, reverse=True):
+            index = last + 1 if direction == 1 else first - 1
+            neighbor = neighbors.get(index)
+            if neighbor is None or estimate_tokens(neighbor.page_content) > budget:
+                open_directions.discard(direction)
+                continue
+            budget -= estimate_tokens(neighbor.page_content)
+            selected[index] = neighbor
+            first, last = min(first, index), max(last, index)
+    return [selected[index] for index in sorted(selected)]
+
 
 def normalize_query(query):
     """
@@ -221,64 +900,287 @@ def normalize_query(query):
     
     return [query_lower, query]  # Retorna versão normalizada e original
 
-def get_context(query, k=4):
+# Tempos por estágio (embedding, search, assembly) da consulta em andamento nesta thread
+_stage_timings = threading.local()
+
+
+@contextmanager
+def collect_stage_timings():
     """
-    Busca contexto relevante no vector store
+    Coleta os tempos (em segundos) de cada estágio das buscas feitas dentro do bloco.
+    Uso: with collect_stage_timings() as timings: get_context(...)
     """
-    if not vectorstore:
-        return "Vector store não inicializado."
-    
-    # Obter variações da consulta normalizada
-    query_variations = normalize_query(query)
+    timings = {}
+    _stage_timings.current = timings
+    try:
+        yield timings
+    finally:
+        _stage_timings.current = None
+
+
+@contextmanager
+def record_stage(stage):
+    """Soma o tempo do bloco ao estágio, se houver uma coleta ativa."""
+    timings = getattr(_stage_timings, "current", None)
+    if timings is None:
+        yield
+        return
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start_time
+
+
+def embed_queries(queries, vectorstore=None):
+    """
+    Retorna os embeddings das consultas, usando o cache LRU compartilhado
+    (por modelo) e o embed_query do modelo só para as consultas ainda não vistas.
+    """
+    if vectorstore is None:
+        vectorstore = vectorstore_handle.get()
+    embeddings = vectorstore.embeddings
+    with record_stage("embedding"):
+        if hasattr(embeddings, "embed_queries"):
+            return embeddings.embed_queries(list(queries))
+        return [embeddings.embed_query(q) for q in queries]
+
+
+def unique_query_variations(query):
+    """
+    Variações da consulta sem repetições (a versão normalizada e a original
+    costumam ser iguais a menos de caixa/espaços).
+    """
+    unique = {}
+    for variation in normalize_query(query):
+        unique.setdefault(query_cache_key(variation), variation)
+    return list(unique.values())
+
+
+def vector_search(query, k=4, vectorstore=None):
+    """
+    Busca densa com todas as variações da consulta, sem resultados repetidos.
+    """
+    if vectorstore is None:
+        vectorstore = vectorstore_handle.get()
+
+    # Obter variações únicas da consulta normalizada e embuti-las de uma vez
+    query_variations = unique_query_variations(query)
+    query_vectors = embed_queries(query_variations, vectorstore)
     
-    # Combinar todos os resultados únicos
+    # Fazer busca com cada variação da consulta (a original já está entre elas)
+    with record_stage("search"):
+        result_lists = [dense_search(vector, k, vectorstore) for vector in query_vectors]
+
+    return unique_documents(result_lists)
+
+
+def dense_search(query_vector, k, vectorstore, metadata_filter=None):
+    """
+    Busca densa só nos chunks comuns, sem os nós de resumo e de seção (reservados
+    aos modos "summary" e "section"). Não há filtro de desigualdade comum aos dois
+    backends, então busca k + (nós auxiliares) candidatos e descarta esses nós.
+    """
+    kwargs = {"filter": metadata_filter} if metadata_filter else {}
+    fetch = k + summary_count + section_node_count
+    results = vectorstore.similarity_search_by_vector(query_vector, k=fetch, **kwargs)
+    return [doc for doc in results if not is_auxiliary_node(doc)][:k]
+
+
+def unique_documents(result_lists):
+    """Combina os resultados de várias buscas, sem documentos repetidos."""
     all_results = []
     seen_content = set()
-    
-    # Fazer busca com cada variação da consulta
-    for variation in query_variations:
-        results = vectorstore.similarity_search(variation, k=k)
+    for results in result_lists:
         for doc in results:
             if doc.page_content not in seen_content:
                 all_results.append(doc)
                 seen_content.add(doc.page_content)
-    
-    # Se não encontrou resultados com variações, tentar busca original
-    if not all_results:
-        results = vectorstore.similarity_search(query, k=k)
-        all_results = results
-    
-    # Priorizar documentos por tipo se necessário
-    rulebook_results = []
-    other_results = []
-    
-    for doc in all_results:
-        doc_tipo = doc.metadata.get('tipo', '')
-        if 'rulebook' in doc_tipo:
-            rulebook_results.append(doc)
+    return all_results
+
+
+def adaptive_search(query, k=4, vectorstore=None):
+    """
+    Recuperação sensível aos scores: busca mais candidatos, decide quantos usar
+    pela curva de similaridade (um resultado dominante basta) e, se houver chunks
+    quase idênticos competindo, escolhe com MMR. Retorna no máximo k documentos.
+    """
+    if vectorstore is None:
+        vectorstore = vectorstore_handle.get()
+    candidates = vector_search(query, k=k * ADAPTIVE_FETCH_MULTIPLIER, vectorstore=vectorstore)
+    if len(candidates) <= 1:
+        return candidates
+
+    # Ambos já estão em cache: a consulta no LRU, os chunks no cache em disco
+    query_vector = embed_queries([query], vectorstore)[0]
+    with record_stage("search"):
+        vectors = normalize_rows(vectorstore.embeddings.embed_documents(
+            [doc.page_content for doc in candidates]))
+        scores = vectors @ normalize_rows(query_vector)[0]
+        order = np.argsort(-scores)
+        n = adaptive_k(scores[order], k)
+        if n > 1 and is_redundant(vectors[order[:k]]):
+            picks = [order[i] for i in mmr(query_vector, vectors[order], n)]
         else:
-            other_results.append(doc)
-    
-    # Priorizar rulebook para consultas sobre regras/competição
-    if any(termo in query.lower() for termo in ['rule', 'regra', 'competition', 'competição', 'task', 'tarefa', 'score', 'pontuação']):
-        final_results = (rulebook_results + other_results)[:k]
+            picks = order[:n]
+    return [candidates[i] for i in picks]
+
+
+def lexical_search(query, k=4, metadata_filter=None):
+    """
+    Busca BM25 no índice invertido (sem chamada de embeddings).
+    Usa a versão normalizada da consulta (termos traduzidos para inglês).
+    """
+    normalized = normalize_query(query)[0]
+    with record_stage("search"):
+        results = lexical_index.search(normalized, k=k, metadata_filter=metadata_filter)
+    return [doc for _, doc, _ in results]
+
+
+def resolve_retrieval_mode(query, mode=None, default=DEFAULT_RETRIEVAL_MODE):
+    """Modo explícito, ou "summary" para perguntas amplas (se houver resumos), ou `default`."""
+    if mode:
+        return mode
+    if summary_count and is_broad_query(query):
+        return "summary"
+    return default
+
+
+def section_search(query, max_tokens=DEFAULT_CONTEXT_TOKENS, vectorstore=None):
+    """
+    O chunk de seção mais similar à consulta, expandido para os vizinhos da seção.
+    Sem chunks de seção indexados, parte do melhor chunk comum.
+    """
+    if vectorstore is None:
+        vectorstore = vectorstore_handle.get()
+    if section_node_count:
+        query_vector = embed_queries([query], vectorstore)[0]
+        with record_stage("search"):
+            hits = vectorstore.similarity_search_by_vector(
+                query_vector, k=1, filter={"node_type": SECTION_NODE_TYPE})
     else:
-        final_results = all_results[:k]
+        hits = vector_search(query, k=1, vectorstore=vectorstore)
+    return expand_section(hits[0], max_tokens) if hits else []
+
+
+def summary_search(query, k=4, vectorstore=None):
+    """
+    O nó de resumo mais similar à consulta (seção ou capítulo).
+    Sem resumos indexados, cai na busca vetorial comum.
+    """
+    if vectorstore is None:
+        vectorstore = vectorstore_handle.get()
+    if summary_count:
+        query_vector = embed_queries([query], vectorstore)[0]
+        with record_stage("search"):
+            # As partições por tipo não têm resumos: o filtro vai direto ao store
+            hits = vectorstore.similarity_search_by_vector(
+                query_vector, k=1, filter={"node_type": SUMMARY_NODE_TYPE})
+        if hits:
+            return hits
+    return vector_search(query, k=k, vectorstore=vectorstore)
+
+
+def retrieve_documents(query, k=4, mode=None, max_tokens=DEFAULT_CONTEXT_TOKENS):
+    """
+    Recupera os documentos mais relevantes no modo escolhido:
+    "vector", "lexical", "hybrid" (fusão por Reciprocal Rank Fusion),
+    "section" (o melhor chunk e seus vizinhos de seção, dentro de `max_tokens`),
+    "adaptive" (até k chunks, conforme os scores) ou "summary" (um nó de resumo).
+    """
+    mode = resolve_retrieval_mode(query, mode)
+    vectorstore = vectorstore_handle.get()
+    if vectorstore is None:
+        return []
+
+    if mode == "summary":
+        return summary_search(query, k=k, vectorstore=vectorstore)
+
+    if mode == "lexical":
+        return lexical_search(query, k=k)
+
+    if mode == "adaptive":
+        return adaptive_search(query, k=k, vectorstore=vectorstore)
+
+    if mode == "section":
+        return section_search(query, max_tokens, vectorstore)
+
+    if mode == "hybrid":
+        dense = [(chunk_id(doc), doc) for doc in vector_search(query, k=k, vectorstore=vectorstore)]
+        sparse = [(chunk_id(doc), doc) for doc in lexical_search(query, k=k)]
+        with record_stage("search"):
+            return reciprocal_rank_fusion([dense, sparse], k=max(k, len(dense)))
+
+    return vector_search(query, k=k, vectorstore=vectorstore)
+
+
+def get_context_with_sources(query, k=4, mode=None, max_tokens=DEFAULT_CONTEXT_TOKENS):
+    """
+    Busca contexto relevante no vector store.
+    Chunks sobrepostos são fundidos, trechos repetidos removidos e o resultado
+    cabe em `max_tokens` tokens.
+    Retorna (contexto, documentos usados no contexto).
+    """
+    vectorstore = vectorstore_handle.get()
+    if vectorstore is None:
+        return "Vector store não inicializado.", []
     
-    # Retornar contexto concatenado
-    context = "\n\n".join([doc.page_content for doc in final_results])
-    return context if context.strip() else "Nenhum contexto relevante encontrado."
+    mode = resolve_retrieval_mode(query, mode)
+    all_results = retrieve_documents(query, k=k, mode=mode, max_tokens=max_tokens)
+    # No modo "section" todos os vizinhos selecionados já cabem no orçamento
+    limit = len(all_results) if mode == "section" else k
+    return assemble_context(query, all_results, k=limit, max_tokens=max_tokens)
+
+
+def assemble_context(query, all_results, k=4, max_tokens=DEFAULT_CONTEXT_TOKENS):
+    """
+    Prioriza os documentos recuperados e monta o contexto no orçamento de tokens.
+    Retorna (contexto, documentos usados no contexto).
+    """
+    with record_stage("assembly"):
+        # Priorizar documentos por tipo se necessário
+        rulebook_results = []
+        other_results = []
+        
+        for doc in all_results:
+            doc_tipo = doc.metadata.get('tipo', '')
+            if 'rulebook' in doc_tipo:
+                rulebook_results.append(doc)
+            else:
+                other_results.append(doc)
+        
+        # Priorizar rulebook para consultas sobre regras/competição
+        if any(termo in query.lower() for termo in ['rule', 'regra', 'competition', 'competição', 'task', 'tarefa', 'score', 'pontuação']):
+            final_results = (rulebook_results + other_results)[:k]
+        else:
+            final_results = all_results[:k]
+        
+        # Montar o contexto dentro do orçamento de tokens
+        context, used_documents = pack_context(final_results, max_tokens=max_tokens)
+
+    if not context.strip():
+        return "Nenhum contexto relevante encontrado.", []
+    return context, used_documents
+
+
+def get_context(query, k=4, mode=None, max_tokens=DEFAULT_CONTEXT_TOKENS):
+    """
+    Busca contexto relevante no vector store
+    """
+    return get_context_with_sources(query, k=k, mode=mode, max_tokens=max_tokens)[0]
 
 def debug_search(query, k=3):
     """
     Função de debug para verificar resultados de busca
     """
-    if not vectorstore:
+    vectorstore = vectorstore_handle.get()
+    if vectorstore is None:
         print("Vector store não disponível.")
         return
     
     print(f"Debug: Buscando por '{query}'")
-    results = vectorstore.similarity_search(query, k=k)
+    query_vector = embed_queries([query], vectorstore)[0]
+    results = vectorstore.similarity_search_by_vector(query_vector, k=k)
     print(f"Encontrados {len(results)} resultados:")
     
     for i, doc in enumerate(results, 1):
@@ -290,9 +1192,9 @@ def debug_search(query, k=3):
 
 def get_vectorstore():
     """
-    Retorna o vectorstore para uso externo
+    Retorna o vectorstore para uso externo (bloqueia até a inicialização terminar)
     """
-    return vectorstore
+    return vectorstore_handle.get()
 
 
 def add_documents_to_vectorstore(new_documents):
@@ -300,24 +1202,30 @@ def add_documents_to_vectorstore(new_documents):
     Adiciona novos documentos ao vector store existente
     Útil para expansões futuras
     """
-    global vectorstore
-    
     if not new_documents:
         print("Nenhum documento fornecido para adicionar.")
         return False
     
     try:
         # Dividir novos documentos em chunks
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=150,
-            separators=["\n\n", "\n", ".", "!", "?", ";", ":", " ", ""]
-        )
-        new_chunks = splitter.split_documents(new_documents)
+        new_chunks = split_documents(new_documents)
         
         # Adicionar ao vector store existente
-        if vectorstore:
-            vectorstore.add_documents(new_chunks)
+        vectorstore = vectorstore_handle.get()
+        if vectorstore is not None:
+            new_chunks, _ = filter_near_duplicates(new_chunks, vectorstore)
+            if not new_chunks:
+                print("Nenhum chunk novo: todos são quase duplicados de chunks existentes.")
+                return True
+            new_ids = [chunk_id(doc) for doc in new_chunks]
+            vectorstore.add_documents(new_chunks, ids=new_ids)
+            lexical_index.add_documents(new_chunks, new_ids)
+            index_sections(new_chunks)
+            if len(partition_index):
+                # Os vetores já estão no cache de embeddings após a inserção
+                new_vectors = vectorstore.embeddings.embed_documents([doc.page_content for doc in new_chunks])
+                partition_index.add(new_vectors, new_chunks, new_ids)
+            notify_index_changed(added_ids=new_ids)
             print(f"Adicionados {len(new_chunks)} chunks ao vector store.")
             return True
         else:
@@ -329,32 +1237,176 @@ def add_documents_to_vectorstore(new_documents):
         return False
 
 
-def search_with_filter(query, metadata_filter=None, k=4):
+def search_with_filter_with_sources(query, metadata_filter=None, k=4, max_tokens=DEFAULT_CONTEXT_TOKENS):
     """
-    Busca com filtros de metadata
-    Exemplo: search_with_filter("navigation", {"tipo": "rulebook"})
+    Busca com filtros de metadata.
+    Filtros por "tipo" percorrem só a partição correspondente do índice.
+    Retorna (contexto, documentos usados no contexto).
     """
-    if not vectorstore:
-        return "Vector store não disponível."
+    vectorstore = vectorstore_handle.get()
+    if vectorstore is None:
+        return "Vector store não disponível.", []
     
     try:
-        if metadata_filter:
-            results = vectorstore.similarity_search(query, k=k, filter=metadata_filter)
-        else:
-            results = vectorstore.similarity_search(query, k=k)
+        query_vector = embed_queries([query], vectorstore)[0]
+        with record_stage("search"):
+            results = filtered_search(query_vector, metadata_filter, k, vectorstore)
         
-        return "\n\n".join([doc.page_content for doc in results])
+        with record_stage("assembly"):
+            return pack_context(results, max_tokens=max_tokens)
         
     except Exception as e:
-        print(f"Erro na busca com filtro: {e}")
-        return get_context(query, k)  # Fallback para busca normal
+        _count("filter_fallbacks")
+        print(f"Erro na busca com filtro (fallback nº {search_stats()['filter_fallbacks']}): {e}")
+        return get_context_with_sources(query, k, max_tokens=max_tokens)  # Fallback para busca normal
+
+
+def filtered_search(query_vector, metadata_filter, k, vectorstore):
+    """Busca vetorial com filtro: partição por tipo quando disponível, senão o filtro do store."""
+    if metadata_filter and len(partition_index):
+        _count("filtered_searches")
+        return [doc for doc, _ in partition_index.search(query_vector, k=k, metadata_filter=metadata_filter)]
+    if metadata_filter:
+        _count("filtered_searches")
+    return dense_search(query_vector, k, vectorstore, metadata_filter)
+
+
+def search_with_filter(query, metadata_filter=None, k=4, max_tokens=DEFAULT_CONTEXT_TOKENS):
+    """
+    Busca com filtros de metadata
+    Exemplo: search_with_filter("navigation", {"tipo": "rulebook"})
+    """
+    return search_with_filter_with_sources(query, metadata_filter=metadata_filter, k=k,
+                                           max_tokens=max_tokens)[0]
+
+
+# ==================== API ASSÍNCRONA ====================
+# Mesma semântica das funções síncronas, para front ends com asyncio: as chamadas
+# de embedding usam o cliente async e as buscas rodam em threads, então várias
+# consultas (ou variações de uma consulta) podem ser sobrepostas às chamadas à LLM.
+# Obs.: os tempos por estágio (collect_stage_timings) só são confiáveis com uma
+# consulta por vez no event loop.
+
+async def aget_vectorstore():
+    """Versão assíncrona de get_vectorstore: espera a inicialização sem bloquear o event loop."""
+    if vectorstore_handle.is_ready():
+        return vectorstore_handle.get()
+    return await asyncio.to_thread(vectorstore_handle.get)
+
+
+async def aembed_queries(queries, vectorstore=None):
+    if vectorstore is None:
+        vectorstore = await aget_vectorstore()
+    embeddings = vectorstore.embeddings
+    with record_stage("embedding"):
+        if hasattr(embeddings, "aembed_queries"):
+            return await embeddings.aembed_queries(list(queries))
+        return list(await asyncio.gather(*[embeddings.aembed_query(q) for q in queries]))
+
+
+async def avector_search(query, k=4, vectorstore=None):
+    """Versão assíncrona de vector_search: as variações da consulta são buscadas em paralelo."""
+    if vectorstore is None:
+        vectorstore = await aget_vectorstore()
+    query_vectors = await aembed_queries(unique_query_variations(query), vectorstore)
+    with record_stage("search"):
+        result_lists = await asyncio.gather(*[
+            asyncio.to_thread(dense_search, vector, k, vectorstore)
+            for vector in query_vectors
+        ])
+    return unique_documents(result_lists)
+
+
+async def aretrieve_documents(query, k=4, mode=None, max_tokens=DEFAULT_CONTEXT_TOKENS):
+    """Versão assíncrona de retrieve_documents (no modo híbrido, denso e BM25 rodam juntos)."""
+    mode = resolve_retrieval_mode(query, mode)
+    vectorstore = await aget_vectorstore()
+    if vectorstore is None:
+        return []
+
+    if mode == "summary":
+        return await asyncio.to_thread(summary_search, query, k, vectorstore)
+
+    if mode == "lexical":
+        return lexical_search(query, k=k)
+
+    if mode == "adaptive":
+        return await asyncio.to_thread(adaptive_search, query, k, vectorstore)
+
+    if mode == "section":
+        return await asyncio.to_thread(section_search, query, max_tokens, vectorstore)
+
+    if mode == "hybrid":
+        dense_docs, sparse_docs = await asyncio.gather(
+            avector_search(query, k=k, vectorstore=vectorstore),
+            asyncio.to_thread(lexical_search, query, k),
+        )
+        dense = [(chunk_id(doc), doc) for doc in dense_docs]
+        sparse = [(chunk_id(doc), doc) for doc in sparse_docs]
+        return reciprocal_rank_fusion([dense, sparse], k=max(k, len(dense)))
+
+    return await avector_search(query, k=k, vectorstore=vectorstore)
+
+
+async def aget_context_with_sources(query, k=4, mode=None, max_tokens=DEFAULT_CONTEXT_TOKENS):
+    """Versão assíncrona de get_context_with_sources."""
+    if not await aget_vectorstore():
+        return "Vector store não inicializado.", []
+    mode = resolve_retrieval_mode(query, mode)
+    all_results = await aretrieve_documents(query, k=k, mode=mode, max_tokens=max_tokens)
+    limit = len(all_results) if mode == "section" else k
+    return assemble_context(query, all_results, k=limit, max_tokens=max_tokens)
+
+
+async def aget_context(query, k=4, mode=None, max_tokens=DEFAULT_CONTEXT_TOKENS):
+    """
+    Versão assíncrona de get_context.
+    Exemplo: contexts = await asyncio.gather(aget_context(q1), aget_context(q2))
+    """
+    return (await aget_context_with_sources(query, k=k, mode=mode, max_tokens=max_tokens))[0]
+
+
+async def asearch_with_filter_with_sources(query, metadata_filter=None, k=4,
+                                           max_tokens=DEFAULT_CONTEXT_TOKENS):
+    """Versão assíncrona de search_with_filter_with_sources."""
+    vectorstore = await aget_vectorstore()
+    if vectorstore is None:
+        return "Vector store não disponível.", []
+
+    try:
+        query_vector = (await aembed_queries([query], vectorstore))[0]
+        with record_stage("search"):
+            results = await asyncio.to_thread(filtered_search, query_vector, metadata_filter, k, vectorstore)
+
+        with record_stage("assembly"):
+            return pack_context(results, max_tokens=max_tokens)
+
+    except Exception as e:
+        _count("filter_fallbacks")
+        print(f"Erro na busca com filtro (fallback nº {search_stats()['filter_fallbacks']}): {e}")
+        return await aget_context_with_sources(query, k, max_tokens=max_tokens)  # Fallback para busca normal
+
+
+async def asearch_with_filter(query, metadata_filter=None, k=4, max_tokens=DEFAULT_CONTEXT_TOKENS):
+    """
+    Versão assíncrona de search_with_filter
+    Exemplo: await asearch_with_filter("navigation", {"tipo": "rulebook"})
+    """
+    return (await asearch_with_filter_with_sources(query, metadata_filter=metadata_filter, k=k,
+                                                   max_tokens=max_tokens))[0]
+
+
+# Inicialização em background: importar este módulo não espera pelo vector store.
+# Apenas quem consulta a base de conhecimento bloqueia, e só no primeiro uso.
+vectorstore_handle.start()
 
 
 if __name__ == "__main__":
     # Teste do sistema
     print("Sistema RAG para Robot Agent carregado!")
     
-    if vectorstore:
+    vectorstore = vectorstore_handle.get()
+    if vectorstore is not None:
         print(f"Vector store inicializado com sucesso.")
         print("Testando busca básica:")
         
@@ -0,0 +1,79 @@
+"""
+Reranking - Seleção de chunks sensível aos scores de similaridade.
+  - adaptive_k: quantos chunks usar, a partir da forma da curva de scores
+    (um resultado dominante basta; scores planos pedem mais contexto)
+  - mmr: Maximal Marginal Relevance vetorizado, para não gastar tokens com
+    chunks quase idênticos
+"""
+
+from typing import List
+
+import numpy as np
+
+from vector_utils import normalize_rows
+
+
+# Diferença de cosseno entre o 1º e o 2º resultado a partir da qual o 1º basta
+DOMINANCE_MARGIN = 0.08
+# Resultados a até esta distância do melhor score ainda são considerados relevantes
+RELEVANCE_WINDOW = 0.06
+# Similaridade entre candidatos acima da qual são tratados como quase duplicados
+REDUNDANCY_THRESHOLD = 0.9
+DEFAULT_MMR_LAMBDA = 0.7
+
+
+def adaptive_k(scores, k_max: int, dominance_margin: float = DOMINANCE_MARGIN,
+               relevance_window: float = RELEVANCE_WINDOW) -> int:
+    """
+    Número de resultados a usar (1..k_max), dados os scores em ordem decrescente.
+    Para cedo quando o melhor resultado domina; senão inclui os que estão
+    dentro da janela de relevância do melhor.
+    """
+    scores = np.asarray(scores, dtype=np.float32)
+    if len(scores) == 0 or k_max <= 0:
+        return 0
+    if len(scores) == 1 or k_max == 1:
+        return 1
+    if scores[0] - scores[1] >= dominance_margin:
+        return 1
+    within = int(np.count_nonzero(scores >= scores[0] - relevance_window))
+    return max(1, min(k_max, within))
+
+
+def is_redundant(candidate_vectors, threshold: float = REDUNDANCY_THRESHOLD) -> bool:
+    """True se algum par de candidatos for quase idêntico."""
+    matrix = normalize_rows(candidate_vectors)
+    if len(matrix) < 2:
+        return False
+    similarity = matrix @ matrix.T
+    np.fill_diagonal(similarity, -1.0)
+    return bool(similarity.max() >= threshold)
+
+
+def mmr(query_vector, candidate_vectors, k: int, lambda_mult: float = DEFAULT_MMR_LAMBDA) -> List[int]:
+    """
+    Maximal Marginal Relevance: escolhe k candidatos equilibrando relevância
+    para a consulta e diversidade entre si. Retorna os índices na ordem escolhida.
+    A cada passo só é atualizado o vetor "maior similaridade com os já escolhidos".
+    """
+    candidates = normalize_rows(candidate_vectors)
+    k = min(k, len(candidates))
+    if k <= 0:
+        return []
+    query = normalize_rows(query_vector)[0]
+    relevance = candidates @ query
+    similarity = candidates @ candidates.T
+
+    selected = [int(np.argmax(relevance))]
+    max_similarity = similarity[selected[0]].copy()
+    available = np.ones(len(candidates), dtype=bool)
+    available[selected[0]] = False
+
+    while len(selected) < k:
+        scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_similarity, similarity[best], out=max_similarity)
+    return selected
@@ -1,29 +1,35 @@
+import os
+import time
+
+# Marca o início do carregamento para reportar o tempo de startup
+_startup_begin = time.perf_counter()
+
 from langchain_ollama import ChatOllama
 from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
-from langchain.agents import AgentExecutor, create_react_agent
 import yaml
 import json
 import re
 
 # Importar ferramentas e funções necessárias
-from main_robot_agent import clean_llm_output
-from conversation_agent import process_conversation
-from src.robot_agent.robot_tools import robot_tools
+# command_executor: agente ReAct de comandos construído uma única vez no main_robot_agent
+from main_robot_agent import command_executor
+from llm_output import clean_llm_output, stream_clean_llm_output
+from conversation_agent import process_conversation, process_conversation_stream
 
 # Importar RAG pipeline diretamente
-from rag_pipeline import get_context, search_with_filter
+from rag_pipeline import (
+    chunk_id, embed_queries, get_context_with_sources, register_index_listener,
+    resolve_retrieval_mode, search_with_filter_with_sources, vectorstore_handle
+)
+from answer_cache import SemanticAnswerCache
+from intent_classifier import IntentClassifier
+from intent_matcher import IntentMatcher, PhraseMatcher
 
 # Configurar a LLM para o router
 router_llm = ChatOllama(model="gemma3:4b", temperature=0.3)
 
-# Configurar a LLM para comandos (igual ao main_robot_agent)
-command_llm = ChatOllama(model="gemma3:4b", temperature=0.1)
-
-# Carregar o prompt do agente de comando
-with open('Prompts/main_prompt.yaml', 'r') as file:
-    command_agent_prompt_text = yaml.safe_load(file)['prompt']
-
-command_agent_prompt = PromptTemplate.from_template(command_agent_prompt_text)
+# REPL em streaming: tokens exibidos à medida que são gerados (ROBOT_STREAMING=0 desativa)
+STREAMING = os.environ.get("ROBOT_STREAMING", "1") != "0"
 
 # Carregar o prompt do router
 with open('Prompts/router_prompt.yaml', 'r') as file:
@@ -48,68 +54,109 @@ Robot response:"""
 
 rag_prompt_template = PromptTemplate.from_template(rag_response_prompt)
 
+# Cache semântico de respostas do rulebook (invalidado quando o índice muda)
+answer_cache = SemanticAnswerCache()
+register_index_listener(answer_cache.invalidate)
+
+# Classificador de intenção treinado (train_intent_classifier.py); None se o artefato não existir
+intent_classifier = IntentClassifier.load()
+
+# Caminho rápido do router: entradas óbvias são classificadas sem chamar a LLM
+intent_matcher = IntentMatcher()
+
+# Perguntas sobre capacidades do próprio robô (não são perguntas sobre robótica)
+self_capability_matcher = PhraseMatcher({pattern: True for pattern in [
+    'what can you do', 'what are you able to', 'can you find', 'can you pick',
+    'can you navigate', 'can you deliver', 'can you help', 'are you able to',
+    'what are your capabilities', 'what do you know how to do'
+]}, whole_words=False)
+
+robotics_matcher = PhraseMatcher({keyword: True for keyword in [
+    'robocup', 'arena', 'competition', 'task', 'rule', 'regulation',
+    'navigation', 'manipulation', 'scoring', 'configuration', 'minimal', 
+    'maximum', 'specification', 'requirement', 'procedure', 'guideline',
+    'safety', 'allowed', 'not allowed', 'points', 'penalty', 'bonus',
+    'home', 'league', 'team', 'judge', 'referee', 'technical'
+]}, whole_words=False)
+
 def is_robotics_question(user_input: str) -> bool:
     """
     Detecta se a pergunta é sobre robótica/competição/regras
     NÃO deve detectar perguntas sobre as capacidades do próprio robô
     """
-    # Perguntas sobre capacidades do próprio robô (não são perguntas sobre robótica)
-    self_capability_patterns = [
-        'what can you do', 'what are you able to', 'can you find', 'can you pick',
-        'can you navigate', 'can you deliver', 'can you help', 'are you able to',
-        'what are your capabilities', 'what do you know how to do'
-    ]
-    
     user_lower = user_input.lower()
     
     # Se é pergunta sobre capacidades do próprio robô, NÃO é pergunta de robótica
-    if any(pattern in user_lower for pattern in self_capability_patterns):
+    if self_capability_matcher.contains_any(user_lower):
         return False
     
-    robotics_keywords = [
-        'robocup', 'arena', 'competition', 'task', 'rule', 'regulation',
-        'navigation', 'manipulation', 'scoring', 'configuration', 'minimal', 
-        'maximum', 'specification', 'requirement', 'procedure', 'guideline',
-        'safety', 'allowed', 'not allowed', 'points', 'penalty', 'bonus',
-        'home', 'league', 'team', 'judge', 'referee', 'technical'
-    ]
-    
-    return any(keyword in user_lower for keyword in robotics_keywords)
+    return robotics_matcher.contains_any(user_lower)
+
+NO_CONTEXT_ANSWER = "I don't have specific information about that in my knowledge base. Could you rephrase your question or ask about competition rules, robot tasks, arena configuration, or procedures?"
+
+KNOWLEDGE_BASE_UNAVAILABLE_ANSWER = "Sorry, my knowledge base is not available right now, so I can't look up the rules. Please try again later."
 
 def answer_robotics_question(user_input: str) -> str:
     """
     Responde perguntas sobre robótica usando o RAG
     """
+    return "".join(answer_robotics_question_stream(user_input))
+
+def answer_robotics_question_stream(user_input: str):
+    """
+    Versão em streaming de answer_robotics_question: gera a resposta em pedaços,
+    à medida que a LLM os produz (respostas em cache saem de uma vez).
+    """
     try:
-        # Buscar contexto relevante
-        context = get_context(user_input, k=3)
+        vectorstore = vectorstore_handle.get()
+        if vectorstore is None:
+            yield KNOWLEDGE_BASE_UNAVAILABLE_ANSWER
+            return
+
+        # Perguntas parecidas com uma já respondida reaproveitam a resposta
+        question_vector = embed_queries([user_input], vectorstore)[0]
+        embedding_model = getattr(vectorstore.embeddings, "model_name", None)
+        cached = answer_cache.lookup(user_input, question_vector, model=embedding_model)
+        if cached:
+            yield cached.answer
+            return
+
+        # Buscar contexto relevante (perguntas amplas usam os resumos de seção, se indexados)
+        mode = resolve_retrieval_mode(user_input, default="hybrid")
+        context, sources = get_context_with_sources(user_input, k=3, mode=mode)
         
+        if not context or context == "Nenhum contexto relevante encontrado.":
+            # Se não encontrou contexto, tentar busca alternativa
+            context, sources = search_with_filter_with_sources(user_input, {"tipo": "rulebook"}, k=2)
+
         if context and context != "Nenhum contexto relevante encontrado.":
             # Usar LLM para formular resposta com contexto
-            response = router_llm.invoke(
+            answer = []
+            for chunk in router_llm.stream(
                 rag_prompt_template.format(context=context, question=user_input)
-            )
-            return response.content
+            ):
+                answer.append(chunk.content)
+                yield chunk.content
+            answer_cache.store(user_input, question_vector, "".join(answer),
+                               [chunk_id(doc) for doc in sources], model=embedding_model)
         else:
-            # Se não encontrou contexto, tentar busca alternativa
-            alt_context = search_with_filter(user_input, {"tipo": "rulebook"}, k=2)
-            if alt_context and alt_context != "Nenhum contexto relevante encontrado.":
-                response = router_llm.invoke(
-                    rag_prompt_template.format(context=alt_context, question=user_input)
-                )
-                return response.content
-            else:
-                return "I don't have specific information about that in my knowledge base. Could you rephrase your question or ask about competition rules, robot tasks, arena configuration, or procedures?"
+            yield NO_CONTEXT_ANSWER
                 
     except Exception as e:
-        return f"Sorry, I encountered an error while searching my knowledge base: {e}"
+        yield f"Sorry, I encountered an error while searching my knowledge base: {e}"
 
 # Função para determinar o tipo de input
 def determine_input_type(user_input: str) -> str:
     """
     Determine if the user input is a command or a conversation.
     Return 'command' or 'conversation'.
+    Obvious inputs are decided by the intent matcher; the LLM is only
+    consulted when its confidence is below the threshold.
     """
+    decision = intent_matcher.route(user_input)
+    if decision:
+        return decision.intent
+
     try:
         # Usar a LLM para interpretar o input
         response = router_llm.invoke(
@@ -161,45 +208,54 @@ def determine_input_type(user_input: str) -> str:
         # Se houver erro, assume que é uma conversação
         return 'conversation'
 
-# Função principal do router
-def route_input(user_input: str) -> str:
+META_REQUEST_WORDS = ['help me', 'explain', 'understand', 'learn', 'teach']
+META_REQUEST_ANSWER = "I apologize, but I am a household assistant robot. I can help you with physical tasks like picking up objects, navigating rooms, and delivering items. I cannot help with academic subjects or explanations."
+TECHNICAL_ISSUE_ANSWER = "I apologize, but I encountered a technical issue. Could you please rephrase your command?"
+
+def resolve_route(user_input: str) -> str:
     """
-    Route the input to the appropriate agent.
+    Decide o destino do input: 'rulebook', 'command' ou 'conversation'.
     """
+    # O classificador treinado decide sozinho quando está confiante
+    prediction = intent_classifier.route(user_input) if intent_classifier else None
+    if prediction:
+        return prediction.label
+
     # Primeiro, verificar se é uma pergunta sobre robótica
     if is_robotics_question(user_input):
-        return answer_robotics_question(user_input)
+        return 'rulebook'
     
     # Se não é sobre robótica, determinar se é comando ou conversação
-    input_type = determine_input_type(user_input)
+    return determine_input_type(user_input)
+
+def _command_error(e: Exception) -> str:
+    """Mensagem para o usuário quando o agente de comandos falha (ou relança o erro limpo)."""
+    error_str = str(e)
+    if "early_stopping_method" in error_str:
+        print("[DEBUG] Detected early_stopping_method error, attempting recovery...")
+        # Informar o usuário sobre o problema técnico
+        return TECHNICAL_ISSUE_ANSWER
+    # Limpar a mensagem de erro
+    cleaned_error = clean_llm_output(error_str)
+    raise Exception(cleaned_error)
+
+# Função principal do router
+def route_input(user_input: str) -> str:
+    """
+    Route the input to the appropriate agent.
+    """
+    route = resolve_route(user_input)
+    if route == 'rulebook':
+        return answer_robotics_question(user_input)
     
-    if input_type == 'command':
+    if route == 'command':
         try:
-            # Criar fresh agent para evitar contaminação de contexto
-            fresh_agent = create_react_agent(command_llm, robot_tools, command_agent_prompt)
-            fresh_executor = AgentExecutor(
-                agent=fresh_agent,
-                tools=robot_tools,
-                verbose=False,
-                handle_parsing_errors=True,
-                max_iterations=15,
-                return_intermediate_steps=True
-            )
-            
-            # Usar o agente de comandos com executor limpo
-            response = fresh_executor.invoke({"input": user_input})
+            # Usar o agente de comandos (executor reutilizado, scratchpad limpo)
+            response = command_executor.invoke(user_input)
             # Limpar o output antes de retornar
             return clean_llm_output(response['output'])
         except Exception as e:
-            # Se falhar, tentar novamente com input reformulado
-            error_str = str(e)
-            if "early_stopping_method" in error_str:
-                print("[DEBUG] Detected early_stopping_method error, attempting recovery...")
-                # Informar o usuário sobre o problema técnico
-                return "I apologize, but I encountered a technical issue. Could you please rephrase your command?"
-            # Limpar a mensagem de erro
-            cleaned_error = clean_llm_output(error_str)
-            raise Exception(cleaned_error)
+            return _command_error(e)
     else:
         # Usar o novo agente de conversação
         response = process_conversation(user_input)
@@ -207,46 +263,85 @@ def route_input(user_input: str) -> str:
         # Se a resposta indica que é um comando, verifica novamente o contexto
         if response == "__COMMAND_MODE__":
             # Verifica se é realmente um comando físico ou uma metáfora/conversação
-            if any(word in user_input.lower() for word in ['help me', 'explain', 'understand', 'learn', 'teach']):
-                return "I apologize, but I am a household assistant robot. I can help you with physical tasks like picking up objects, navigating rooms, and delivering items. I cannot help with academic subjects or explanations."
+            if any(word in user_input.lower() for word in META_REQUEST_WORDS):
+                return META_REQUEST_ANSWER
             try:
-                # Criar fresh agent para evitar contaminação de contexto
-                fresh_agent = create_react_agent(command_llm, robot_tools, command_agent_prompt)
-                fresh_executor = AgentExecutor(
-                    agent=fresh_agent,
-                    tools=robot_tools,
-                    verbose=False,
-                    handle_parsing_errors=True,
-                    max_iterations=15,
-                    return_intermediate_steps=True
-                )
-                
-                command_response = fresh_executor.invoke({"input": user_input})
+                command_response = command_executor.invoke(user_input)
                 return clean_llm_output(command_response['output'])
             except Exception as e:
-                error_str = str(e)
-                if "early_stopping_method" in error_str:
-                    return "I apologize, but I encountered a technical issue. Could you please rephrase your command?"
-                cleaned_error = clean_llm_output(error_str)
-                raise Exception(cleaned_error)
+                return _command_error(e)
             
         return response
 
+def route_input_stream(user_input: str):
+    """
+    Versão em streaming de route_input: gera a resposta em pedaços à medida que
+    a LLM os produz (resposta do RAG, da conversação ou a Final Answer do agente).
+    Os pedaços ainda não passaram por clean_llm_output (ver stream_clean_llm_output).
+    """
+    route = resolve_route(user_input)
+    if route == 'rulebook':
+        yield from answer_robotics_question_stream(user_input)
+        return
+
+    if route != 'command':
+        chunks = process_conversation_stream(user_input)
+        first = next(chunks, "")
+        if first != "__COMMAND_MODE__":
+            yield first
+            yield from chunks
+            return
+        if any(word in user_input.lower() for word in META_REQUEST_WORDS):
+            yield META_REQUEST_ANSWER
+            return
+
+    try:
+        yield from command_executor.stream(user_input)
+    except Exception as e:
+        yield _command_error(e)
+
 # Loop principal de interação
 if __name__ == "__main__":
+    startup_seconds = time.perf_counter() - _startup_begin
+    kb_status = "ready" if vectorstore_handle.is_ready() else "warming up in background"
+    print(f"[Startup] Router ready in {startup_seconds:.2f}s (knowledge base: {kb_status})")
     print("Robot: Hello! I'm your household assistant robot. How can I help you today? (Type 'exit' to quit)")
     while True:
         user_input = input("You: ")
         if user_input.lower() == 'exit':
+            if intent_classifier:
+                stats = intent_classifier.stats()
+                print(f"[Router] Intent classifier decided {stats['confident']} inputs, "
+                      f"{stats['uncertain']} below the threshold")
+            stats = intent_matcher.stats()
+            print(f"[Router] {stats['fast_path']} decisions without the LLM, "
+                  f"{stats['llm_fallbacks']} with the LLM (hit rate {stats['hit_rate']:.0%})")
             print("Robot: Goodbye!")
             break
         
         try:
-            response = route_input(user_input)
-            # Limpar o output final antes de exibir
-            cleaned_response = clean_llm_output(response)
-            print(f"Robot: {cleaned_response}")
+            if STREAMING:
+                # Exibir os tokens já limpos assim que chegam
+                print("Robot: ", end="", flush=True)
+                start_time = time.perf_counter()
+                first_token_seconds = None
+                for chunk in stream_clean_llm_output(route_input_stream(user_input)):
+                    if first_token_seconds is None:
+                        first_token_seconds = time.perf_counter() - start_time
+                    print(chunk, end="", flush=True)
+                print()
+                if first_token_seconds is not None:
+                    print(f"[Router] First token in {first_token_seconds:.2f}s, "
+                          f"full response in {time.perf_counter() - start_time:.2f}s")
+            else:
+                response = route_input(user_input)
+                # Limpar o output final antes de exibir
+                cleaned_response = clean_llm_output(response)
+                print(f"Robot: {cleaned_response}")
         except Exception as e:
+            if STREAMING:
+                # Termina a linha de uma resposta interrompida
+                print()
             error_message = str(e)
             cleaned_error = clean_llm_output(error_message)
             print(f"Robot: An error occurred while processing your request: {cleaned_error}")
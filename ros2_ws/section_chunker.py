@@ -0,0 +1,168 @@
+"""
+Section Chunker - Divide o rulebook respeitando a estrutura de seções.
+Reconhece capítulos ("Chapter 3" + título), seções numeradas ("3.1 Carry My Luggage",
+"2.1.3 Furniture") e os blocos fixos de cada teste ("Setup", "Procedure", ...),
+remove cabeçalhos e rodapés de página e corta cada seção em chunks que nunca
+atravessam o limite da seção.
+
+Cada chunk registra nos metadados o caminho de títulos (heading_path), o id da
+seção e a sua posição dentro dela, para que a recuperação possa expandir um
+chunk para os vizinhos da mesma seção.
+"""
+
+import bisect
+import re
+from typing import Dict, List, Optional
+
+from langchain_core.documents import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+
+# Chunks menores que os do splitter genérico: a expansão por vizinhos completa o contexto
+SECTION_SPLITTER_PARAMS = {
+    "chunk_size": 800,
+    "chunk_overlap": 0,
+    "separators": ["\n\n", "\n", ". ", "; ", " ", ""],
+}
+
+CHAPTER_PATTERN = re.compile(r"^Chapter (\d+)$")
+NUMBERED_HEADING_PATTERN = re.compile(r"^(\d+(?:\.\d+){1,3})\s+([A-Z][^.]{1,80})$")
+# Cabeçalhos de página: "Chapter 3. Tests in Stage I 13", "14 3.1 Carry My Luggage", "Contents iii"
+RUNNING_HEADER_PATTERN = re.compile(r"^(Chapter \d+\. .+ \d+|\d+ \d+(\.\d+)* .+|Contents [ivx]+|[ivx]+ Contents|Index \d+)$")
+FOOTER_PREFIX = "RoboCup@Home Rulebook / "
+
+# Blocos que se repetem na descrição de cada teste
+TEST_SUBHEADINGS = {
+    "Focus",
+    "Setup",
+    "Procedure",
+    "Additional Rules and Remarks",
+    "Referee Instructions",
+    "OC Instructions",
+    "Score Sheet",
+}
+
+
+def clean_page_lines(text: str) -> List[str]:
+    """Linhas da página sem o cabeçalho corrente e sem o rodapé do rulebook."""
+    lines = [line.rstrip() for line in text.split("\n")]
+    if lines and RUNNING_HEADER_PATTERN.match(lines[0].strip()):
+        lines = lines[1:]
+    for i, line in enumerate(lines):
+        if line.startswith(FOOTER_PREFIX):
+            lines = lines[:i]
+            break
+    return lines
+
+
+def _numbered_heading(line: str) -> Optional[tuple]:
+    """(nível, título) de uma seção numerada, ou None (linhas do sumário são ignoradas)."""
+    match = NUMBERED_HEADING_PATTERN.match(line)
+    if not match or ". ." in line or re.search(r"\s\d+$", line):
+        return None
+    return match.group(1).count(".") + 1, f"{match.group(1)} {match.group(2).strip()}"
+
+
+class _Section:
+    def __init__(self, heading_path: List[str], index: int):
+        self.heading_path = list(heading_path)
+        self.index = index
+        self.lines = []
+        self.offsets = []   # (offset no texto da seção, página) de cada linha
+        self.length = 0
+
+    def add_line(self, line: str, page):
+        self.offsets.append((self.length, page))
+        self.lines.append(line)
+        self.length += len(line) + 1
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+    def page_at(self, offset: int):
+        positions = [position for position, _ in self.offsets]
+        return self.offsets[max(0, bisect.bisect_right(positions, offset) - 1)][1]
+
+
+def parse_sections(documents: List[Document]) -> List[_Section]:
+    """Percorre as páginas em ordem e agrupa as linhas por seção."""
+    sections = []
+    path = []            # [(nível, título, é seção numerada)]
+    pending_chapter = None
+
+    def start_section(level, title, numbered=True):
+        while path and path[-1][0] >= level:
+            path.pop()
+        path.append((level, title, numbered))
+        sections.append(_Section([t for _, t, _ in path], len(sections)))
+
+    start_section(1, "Front matter")
+    for doc in documents:
+        page = doc.metadata.get("page")
+        for line in clean_page_lines(doc.page_content):
+            stripped = line.strip()
+            if pending_chapter is not None and stripped:
+                # A linha seguinte a "Chapter N" é o título do capítulo
+                start_section(1, f"{pending_chapter} {stripped}")
+                pending_chapter = None
+                sections[-1].add_line(stripped, page)
+                continue
+
+            chapter = CHAPTER_PATTERN.match(stripped)
+            heading = _numbered_heading(stripped)
+            if chapter:
+                pending_chapter = chapter.group(1)
+                continue
+            if heading:
+                start_section(*heading)
+            elif stripped in TEST_SUBHEADINGS and len(path) > 1:
+                # Subseção do teste atual (um nível abaixo da seção numerada mais interna)
+                numbered_level = max(level for level, _, numbered in path if numbered)
+                start_section(numbered_level + 1, stripped, numbered=False)
+            sections[-1].add_line(line, page)
+    return [section for section in sections if section.text.strip()]
+
+
+def chunk_sections(documents: List[Document], **splitter_overrides) -> List[Document]:
+    """
+    Divide as páginas em chunks alinhados às seções.
+    Metadados de cada chunk (além dos da página de origem):
+      page          página onde o chunk começa
+      heading_path  "2 General Rules and Regulations > 2.1 Scenario > 2.1.3 Furniture"
+      section_id    id estável da seção (fonte + caminho de títulos)
+      chunk_index   posição do chunk dentro da seção
+      section_chunks número de chunks da seção
+      start_index   deslocamento do chunk no texto da seção
+    """
+    if not documents:
+        return []
+    params = dict(SECTION_SPLITTER_PARAMS, **splitter_overrides)
+    splitter = RecursiveCharacterTextSplitter(add_start_index=True, **params)
+    base_metadata = dict(documents[0].metadata)
+    base_metadata.pop("page", None)
+    source = base_metadata.get("source")
+
+    chunks = []
+    seen_paths = {}
+    for section in parse_sections(documents):
+        heading_path = " > ".join(section.heading_path)
+        # Caminhos repetidos (raros) recebem um sufixo para manter o id único
+        seen_paths[heading_path] = seen_paths.get(heading_path, 0) + 1
+        section_id = f"{source}#{heading_path}"
+        if seen_paths[heading_path] > 1:
+            section_id += f" ({seen_paths[heading_path]})"
+        section_chunks = splitter.create_documents([section.text])
+        for chunk_index, piece in enumerate(section_chunks):
+            start = piece.metadata.get("start_index", 0)
+            metadata: Dict = dict(base_metadata)
+            metadata.update({
+                "page": section.page_at(start),
+                "heading_path": heading_path,
+                "section_id": section_id,
+                "chunk_index": chunk_index,
+                "section_chunks": len(section_chunks),
+                "start_index": start,
+            })
+            chunks.append(Document(page_content=piece.page_content, metadata=metadata))
+    return chunks
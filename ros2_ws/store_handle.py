@@ -0,0 +1,71 @@
+"""
+Store Handle - Inicialização preguiçosa e thread-safe de um recurso caro
+(o vector store do rag_pipeline): a fábrica roda uma única vez, numa thread
+em background, e quem precisa do recurso só espera no primeiro uso.
+"""
+
+import threading
+import time
+
+
+class VectorStoreHandle:
+    """
+    Handle preguiçoso e thread-safe para o vector store.
+    A inicialização (embeddings + carregamento/criação do Chroma) roda uma única vez,
+    numa thread em background iniciada por start(), ou na primeira chamada a get().
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._thread = None
+        self._vectorstore = None
+        self.startup_seconds = None
+
+    def start(self):
+        """Dispara a inicialização em background (idempotente)."""
+        with self._lock:
+            if self._thread is None and not self._ready.is_set():
+                self._thread = threading.Thread(
+                    target=self._initialize, name="rag-init", daemon=True
+                )
+                self._thread.start()
+        return self
+
+    def _initialize(self):
+        start_time = time.perf_counter()
+        vectorstore = None
+        try:
+            vectorstore = self._factory()
+        except Exception as e:
+            print(f"Erro ao inicializar vector store: {e}")
+        finally:
+            with self._lock:
+                # set() pode ter sido chamado durante a inicialização; não sobrescrever
+                if not self._ready.is_set():
+                    self._vectorstore = vectorstore
+                    self.startup_seconds = time.perf_counter() - start_time
+                    self._ready.set()
+            if self.startup_seconds is not None:
+                print(f"RAG Pipeline pronto em {self.startup_seconds:.2f}s")
+
+    def is_ready(self):
+        return self._ready.is_set()
+
+    def get(self, timeout=None):
+        """
+        Retorna o vector store, bloqueando apenas até a inicialização terminar.
+        Retorna None se ainda não estiver pronto após `timeout` segundos.
+        """
+        if not self._ready.is_set():
+            self.start()
+            if not self._ready.wait(timeout):
+                return None
+        return self._vectorstore
+
+    def set(self, vectorstore):
+        """Substitui o vector store atual (ex.: após reconstrução)."""
+        with self._lock:
+            self._vectorstore = vectorstore
+            self._ready.set()
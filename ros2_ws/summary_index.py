@@ -0,0 +1,250 @@
+"""
+Summary Index - Resumos hierárquicos do rulebook para perguntas amplas.
+Etapa offline: agrupa os chunks do section_chunker por seção numerada
+("3.1 Carry My Luggage", com Setup, Procedure, ...) e por capítulo, resume cada
+seção com a LLM e resume cada capítulo a partir dos resumos das suas seções.
+Os resumos entram no vector store como nós extras (metadata["node_type"] = "summary"),
+e uma pergunta como "summarize the navigation test" é respondida com um único
+nó compacto em vez de muitos chunks.
+
+Os resumos ficam em cache (chave: texto resumido + resumidor), então rodar de novo
+após uma alteração no rulebook só chama a LLM para as seções que mudaram.
+
+Uso:
+    python summary_index.py [--model gemma3:4b] [--extractive]
+
+    --extractive resume sem LLM (frases iniciais de cada trecho), para testes offline.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+from typing import Dict, List, Optional
+
+from langchain_core.documents import Document
+
+from context_packer import CHARS_PER_TOKEN, estimate_tokens
+
+
+SUMMARY_NODE_TYPE = "summary"
+SUMMARY_CACHE_PATH = "../Classifier_XML/summaries.json"
+SUMMARY_PROMPT_PATH = "Prompts/summary_prompt.yaml"
+DEFAULT_SUMMARY_MODEL = "gemma3:4b"
+
+# Texto máximo enviado à LLM por chamada; seções maiores são resumidas em partes
+MAX_INPUT_TOKENS = 2500
+# Tamanho aproximado de cada resumo
+SUMMARY_TOKENS = 250
+
+# Perguntas que pedem uma visão geral, e não um detalhe específico.
+# Só expressões de visão geral: "explain"/"describe" também abrem perguntas
+# pontuais ("explain the penalty for ..."), que precisam do trecho exato.
+BROAD_QUERY_PATTERN = re.compile(
+    r"\b(summar\w*|overview|outline|in general|big picture|"
+    r"main (rules|points|steps|tasks|tests)|what are the (tasks|tests|stages)|"
+    r"resum\w*|vis[aã]o geral|em geral|principais (regras|pontos|etapas|tarefas|testes)|"
+    r"quais s[aã]o (as tarefas|os testes|as etapas))\b",
+    re.IGNORECASE,
+)
+
+_SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+
+
+def is_broad_query(query: str) -> bool:
+    """True para perguntas amplas, respondidas melhor por um resumo de seção ou capítulo."""
+    return bool(BROAD_QUERY_PATTERN.search(query))
+
+
+# ==================== RESUMIDORES ====================
+
+class LLMSummarizer:
+    """Resume com uma LLM do Ollama, usando o prompt de Prompts/summary_prompt.yaml."""
+
+    def __init__(self, model: str = DEFAULT_SUMMARY_MODEL):
+        import yaml
+        from langchain_core.prompts import PromptTemplate
+        from langchain_ollama import ChatOllama
+
+        self.name = f"ollama:{model}"
+        self.llm = ChatOllama(model=model, temperature=0.1)
+        with open(SUMMARY_PROMPT_PATH, "r") as file:
+            self.prompt = PromptTemplate.from_template(yaml.safe_load(file)["prompt"])
+
+    def summarize(self, title: str, text: str) -> str:
+        response = self.llm.invoke(self.prompt.format(title=title, text=text, max_words=SUMMARY_TOKENS * 3 // 4))
+        return response.content.strip()
+
+
+class ExtractiveSummarizer:
+    """Resumo sem LLM: a primeira frase de cada parágrafo, até o tamanho do resumo."""
+
+    name = "extractive"
+
+    def summarize(self, title: str, text: str) -> str:
+        sentences = []
+        budget = SUMMARY_TOKENS
+        for paragraph in re.split(r"\n\s*\n|\n(?=[A-Z•\-])", text):
+            paragraph = " ".join(paragraph.split())
+            if not paragraph:
+                continue
+            sentence = _SENTENCE_PATTERN.split(paragraph, maxsplit=1)[0]
+            if estimate_tokens(sentence) > budget:
+                break
+            budget -= estimate_tokens(sentence)
+            sentences.append(sentence)
+        return " ".join(sentences)
+
+
+def summarize_text(summarizer, title: str, text: str) -> str:
+    """Resume um texto de qualquer tamanho: partes de até MAX_INPUT_TOKENS, depois o conjunto."""
+    window = MAX_INPUT_TOKENS * CHARS_PER_TOKEN
+    if len(text) <= window:
+        return summarizer.summarize(title, text)
+    parts = [text[start:start + window] for start in range(0, len(text), window)]
+    partial = [summarizer.summarize(f"{title} (part {i + 1}/{len(parts)})", part)
+               for i, part in enumerate(parts)]
+    return summarize_text(summarizer, title, "\n\n".join(partial))
+
+
+# ==================== HIERARQUIA ====================
+
+def group_sections(chunks: List[Document]) -> Dict[str, Dict]:
+    """
+    Agrupa os chunks de seção em capítulos e seções numeradas, na ordem do documento.
+    Retorna {capítulo: {"intro": [chunks], "sections": {caminho da seção: [chunks]}}}.
+    Subseções (Setup, Procedure, 2.1.3 ...) pertencem à seção de segundo nível.
+    """
+    by_section = {}
+    for chunk in chunks:
+        if "section_id" in chunk.metadata:
+            by_section.setdefault(chunk.metadata["section_id"], []).append(chunk)
+
+    def section_order(items):
+        pages = [chunk.metadata.get("page") or 0 for chunk in items]
+        return min(pages), min(chunk.metadata.get("start_index") or 0 for chunk in items)
+
+    chapters = {}
+    for _, items in sorted(by_section.items(), key=lambda item: section_order(item[1])):
+        items.sort(key=lambda chunk: chunk.metadata.get("chunk_index", 0))
+        path = items[0].metadata.get("heading_path", "").split(" > ")
+        chapter = chapters.setdefault(path[0], {"intro": [], "sections": {}})
+        if len(path) == 1:
+            chapter["intro"].extend(items)
+        else:
+            chapter["sections"].setdefault(" > ".join(path[:2]), []).extend(items)
+    return chapters
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _load_cache() -> Dict:
+    if not os.path.exists(SUMMARY_CACHE_PATH):
+        return {}
+    try:
+        with open(SUMMARY_CACHE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"[Summary] Cache inválido ignorado: {e}")
+        return {}
+
+
+def _save_cache(cache: Dict):
+    os.makedirs(os.path.dirname(SUMMARY_CACHE_PATH), exist_ok=True)
+    with open(SUMMARY_CACHE_PATH + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=2, ensure_ascii=False)
+    os.replace(SUMMARY_CACHE_PATH + ".tmp", SUMMARY_CACHE_PATH)
+
+
+def _summary_node(level: str, heading_path: str, text: str, chunks: List[Document]) -> Document:
+    first = chunks[0].metadata
+    source = first.get("source")
+    pages = [chunk.metadata.get("page") for chunk in chunks if chunk.metadata.get("page") is not None]
+    node_id = f"summary:{source}#{heading_path}"
+    metadata = {key: first[key] for key in ("source", "tipo", "file_type") if key in first}
+    metadata.update({
+        "node_type": SUMMARY_NODE_TYPE,
+        "summary_level": level,
+        # O packer identifica o trecho pelo caminho de títulos
+        "heading_path": f"{heading_path} (summary)",
+        "page": min(pages) if pages else 0,
+        "page_end": max(pages) if pages else 0,
+        "chunk_id": node_id,
+    })
+    return Document(page_content=text, metadata=metadata)
+
+
+def build_summary_nodes(chunks: List[Document], summarizer=None, cache: Optional[Dict] = None) -> List[Document]:
+    """
+    Gera os nós de resumo (um por seção numerada e um por capítulo) a partir
+    dos chunks de seção. Resumos já presentes no cache não são recalculados.
+    """
+    summarizer = summarizer or LLMSummarizer()
+    cache = _load_cache() if cache is None else cache
+    nodes = []
+    calls = 0
+
+    def cached_summary(title, text):
+        nonlocal calls
+        key = _text_hash(f"{summarizer.name}\n{title}\n{text}")
+        if key not in cache:
+            cache[key] = summarize_text(summarizer, title, text)
+            calls += 1
+            print(f"[Summary] {title}")
+        return cache[key]
+
+    for chapter, parts in group_sections(chunks).items():
+        section_summaries = []
+        for path, items in parts["sections"].items():
+            text = "\n\n".join(chunk.page_content for chunk in items)
+            summary = cached_summary(path, text)
+            nodes.append(_summary_node("section", path, summary, items))
+            section_summaries.append(f"{path.split(' > ')[-1]}: {summary}")
+
+        # O capítulo é resumido a partir da introdução e dos resumos das seções
+        intro = "\n\n".join(chunk.page_content for chunk in parts["intro"])
+        text = "\n\n".join(filter(None, [intro] + section_summaries))
+        if text.strip():
+            chapter_chunks = parts["intro"] + [chunk for items in parts["sections"].values() for chunk in items]
+            nodes.append(_summary_node("chapter", chapter, cached_summary(chapter, text), chapter_chunks))
+
+    print(f"[Summary] {len(nodes)} resumos ({calls} gerados, {len(nodes) - calls} do cache)")
+    return nodes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera os resumos por seção e capítulo do rulebook")
+    parser.add_argument("--model", default=DEFAULT_SUMMARY_MODEL, help="Modelo do Ollama usado nos resumos")
+    parser.add_argument("--extractive", action="store_true", help="Resumo extrativo, sem LLM")
+    args = parser.parse_args()
+
+    import rag_pipeline
+
+    vectorstore = rag_pipeline.get_vectorstore()
+    if vectorstore is None:
+        print("Vector store não disponível.")
+        return
+    stored = vectorstore.get(include=["documents", "metadatas"])
+    chunks = [
+        Document(page_content=text, metadata=metadata or {})
+        for text, metadata in zip(stored["documents"], stored["metadatas"])
+        if (metadata or {}).get("node_type") != SUMMARY_NODE_TYPE
+    ]
+
+    start_time = time.perf_counter()
+    summarizer = ExtractiveSummarizer() if args.extractive else LLMSummarizer(args.model)
+    cache = _load_cache()
+    try:
+        nodes = build_summary_nodes(chunks, summarizer, cache)
+    finally:
+        _save_cache(cache)
+    rag_pipeline.replace_summary_nodes(nodes, vectorstore)
+    print(f"[Summary] Índice de resumos criado em {time.perf_counter() - start_time:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
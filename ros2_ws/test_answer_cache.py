@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Test the semantic answer cache: per-model thresholds, hit confirmation by
+content terms and invalidation when chunks change.
+"""
+
+from answer_cache import SemanticAnswerCache, threshold_for_model
+from hashing_embeddings import HashingEmbeddings
+
+MODEL = "HashingEmbeddings:hashing-1024"
+
+
+def cached_with(question, answer="answer", chunk_ids=("c1",)):
+    embeddings = HashingEmbeddings()
+    cache = SemanticAnswerCache()
+    cache.store(question, embeddings.embed_query(question), answer, chunk_ids, model=MODEL)
+    return cache, embeddings
+
+
+def test_threshold_depends_on_the_model():
+    assert threshold_for_model(MODEL) > threshold_for_model("OllamaEmbeddings:nomic-embed-text")
+    assert threshold_for_model("unknown") == threshold_for_model(None)
+
+
+def test_rephrasing_hits_and_negation_misses():
+    cache, embeddings = cached_with("Is the robot allowed to touch the referee?")
+    hit = cache.lookup("is the robot allowed to touch the referee",
+                       embeddings.embed_query("is the robot allowed to touch the referee"), model=MODEL)
+    assert hit is not None and hit.answer == "answer"
+    negated = "Is the robot not allowed to touch the referee?"
+    assert cache.lookup(negated, embeddings.embed_query(negated), model=MODEL) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_entries_of_another_model_are_not_reused():
+    question = "How many points for opening the door?"
+    cache, embeddings = cached_with(question)
+    assert cache.lookup(question, embeddings.embed_query(question), model="other") is None
+
+
+def test_removed_chunks_invalidate_only_their_answers():
+    cache, embeddings = cached_with("What is the arena?", chunk_ids=["c1"])
+    other = "Who is the referee?"
+    cache.store(other, embeddings.embed_query(other), "other answer", ["c2"], model=MODEL)
+    cache.invalidate(removed_ids=["c1"])
+    assert cache.stats()["size"] == 1
+    assert cache.lookup(other, embeddings.embed_query(other), model=MODEL).answer == "other answer"
+    cache.invalidate(added_ids=["c3"])
+    assert cache.stats()["size"] == 0
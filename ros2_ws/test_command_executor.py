@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Test the reusable ReAct command executor with a scripted fake LLM: commands
+from concurrent invoke() and stream() calls do not interleave, stream() passes
+on the Final Answer tokens and falls back to the full output without one.
+"""
+
+import threading
+import time
+from typing import Any, Iterator, List, Optional
+
+import pytest
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
+from langchain_core.prompts import PromptTemplate
+from langchain_core.tools import Tool
+
+from command_executor import CommandExecutor
+
+
+PROMPT = PromptTemplate.from_template(
+    "Tools:\n{tools}\nUse one of [{tool_names}].\nQuestion: {input}\nThought:{agent_scratchpad}")
+
+
+class Tracker:
+    """Counts overlapping LLM calls and records the tool calls in order."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.tool_calls = []
+
+    def __enter__(self):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+
+    def __exit__(self, *exc):
+        with self.lock:
+            self.active -= 1
+
+
+class ScriptedLLM(LLM):
+    """
+    First call of a command asks for the `move` tool with the command as input;
+    the next one gives the final answer. With `final_answer=False` it never
+    answers; with `fail=True` it raises.
+    """
+
+    tracker: Any
+    delay: float = 0.01
+    final_answer: bool = True
+    fail: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def _respond(self, prompt: str) -> str:
+        with self.tracker:
+            time.sleep(self.delay)
+            if self.fail:
+                raise RuntimeError("llm unavailable")
+            command = prompt.split("Question: ")[1].split("\n")[0]
+            if self.final_answer and "Observation:" in prompt:
+                return f" I moved.\nFinal Answer: Done with {command} now"
+            return f" I should move.\nAction: move\nAction Input: {command}"
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> str:
+        return self._respond(prompt)
+
+    def _stream(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None,
+                **kwargs) -> Iterator[GenerationChunk]:
+        for word in self._respond(prompt).split(" "):
+            chunk = GenerationChunk(text=word + " ")
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+def make_executor(max_iterations=5, **llm_kwargs):
+    tracker = Tracker()
+
+    def move(command):
+        with tracker.lock:
+            tracker.tool_calls.append(command.strip())
+        time.sleep(0.01)
+        return "moved"
+
+    tool = Tool(name="move", func=move, description="Moves the robot")
+    llm = ScriptedLLM(tracker=tracker, **llm_kwargs)
+    return CommandExecutor(llm, [tool], PROMPT, max_iterations=max_iterations), tracker
+
+
+def test_invoke_runs_the_tool_and_keeps_only_the_last_steps():
+    executor, tracker = make_executor()
+    assert executor.invoke("go to the kitchen")["output"] == "Done with go to the kitchen now"
+    assert executor.invoke("go to the bedroom")["output"] == "Done with go to the bedroom now"
+    assert tracker.tool_calls == ["go to the kitchen", "go to the bedroom"]
+    assert [action.tool_input.strip() for action, _ in executor.last_steps] == ["go to the bedroom"]
+    assert executor.commands == 2
+
+
+def test_concurrent_invoke_and_stream_calls_are_serialized():
+    executor, tracker = make_executor()
+    outputs = {}
+
+    def run(i):
+        command = f"command {i}"
+        if i % 2:
+            outputs[command] = "".join(executor.stream(command)).strip()
+        else:
+            outputs[command] = executor.invoke(command)["output"]
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert outputs == {f"command {i}": f"Done with command {i} now" for i in range(8)}
+    assert tracker.max_active == 1
+    assert sorted(tracker.tool_calls) == sorted(outputs)
+    assert executor.commands == 8
+
+
+def test_stream_yields_the_final_answer_as_it_is_generated():
+    executor, _ = make_executor()
+    chunks = list(executor.stream("go to the kitchen"))
+    assert len(chunks) > 1
+    assert "".join(chunks).strip() == "Done with go to the kitchen now"
+    assert not any("Action" in chunk or "Thought" in chunk for chunk in chunks)
+
+
+def test_stream_falls_back_to_the_full_output_without_a_final_answer():
+    executor, tracker = make_executor(max_iterations=2, final_answer=False)
+    chunks = list(executor.stream("go to the kitchen"))
+    assert chunks == [executor.invoke("go to the kitchen")["output"]]
+    assert "iteration limit" in chunks[0]
+    assert tracker.tool_calls == ["go to the kitchen"] * 4
+
+
+def test_stream_reraises_agent_errors():
+    executor, _ = make_executor(fail=True)
+    with pytest.raises(RuntimeError, match="llm unavailable"):
+        list(executor.stream("go to the kitchen"))
+    # The lock is released: the next command still runs
+    with pytest.raises(RuntimeError, match="llm unavailable"):
+        executor.invoke("go to the kitchen")
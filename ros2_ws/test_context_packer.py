@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Test context packing: merging overlapping chunks, dropping repeated lines and
+keeping the context inside the token budget.
+"""
+
+from types import SimpleNamespace
+
+from context_packer import estimate_tokens, pack_context
+
+
+def doc(text, page=1, start=None, **metadata):
+    metadata = dict(source="rulebook.pdf", page=page, **metadata)
+    if start is not None:
+        metadata["start_index"] = start
+    return SimpleNamespace(page_content=text, metadata=metadata)
+
+
+def test_overlapping_chunks_are_merged():
+    page = "The robot must stop when the referee says stop. " * 4 + "Then it returns to the start."
+    first = doc(page[:120], start=0)
+    second = doc(page[100:], start=100)
+    context, used = pack_context([second, first])
+    assert context == page
+    assert used == [second, first]
+
+
+def test_repeated_header_lines_are_dropped():
+    header = "RoboCup@Home Rulebook Chapter 3 Tests"
+    context, _ = pack_context([doc(f"{header}\nFirst rule about doors.", page=1),
+                               doc(f"{header}\nSecond rule about people.", page=2)])
+    assert context.count(header) == 1
+    assert "First rule" in context and "Second rule" in context
+
+
+def test_budget_is_respected_in_relevance_order():
+    chunks = [doc(f"Rule {i}. " + "word " * 100, page=i) for i in range(5)]
+    context, used = pack_context(chunks, max_tokens=300)
+    assert estimate_tokens(context) <= 300
+    assert used[0] is chunks[0]
+    assert len(used) < len(chunks)
+
+
+def test_section_heading_is_added_once():
+    first = doc("Setup text.", page=3, section_id="s#3.1", heading_path="3 Tests > 3.1 Carry My Luggage")
+    second = doc("Score text.", page=9, section_id="s#3.2", heading_path="3 Tests > 3.2 Receptionist")
+    context, _ = pack_context([first, second])
+    assert context.startswith("[3 Tests > 3.1 Carry My Luggage]\nSetup text.")
+    assert "[3 Tests > 3.2 Receptionist]" in context
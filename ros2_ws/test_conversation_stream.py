@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Test that the streamed conversation reply matches the non-streamed one,
+including verdict tags that the LLM emits split across several tokens.
+"""
+
+from types import SimpleNamespace
+
+import conversation_agent
+
+
+class FakeLLM:
+    """Stands in for ChatOllama: replays the same tokens for invoke() and stream()."""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+
+    def invoke(self, prompt):
+        return SimpleNamespace(content="".join(self.tokens))
+
+    def stream(self, prompt):
+        for token in self.tokens:
+            yield SimpleNamespace(content=token)
+
+
+TOKEN_CASES = [
+    ["[CHAT]", " Hello! I'm fine."],
+    ["[", "CHAT", "]", "\n", "Hello", "!", " I'm fine."],
+    ["CHAT", ":", " Hello", "! I'm", " fine."],
+    ["[CH", "AT", "]:", " ", " Hello! I'm fine."],
+    ["  [chat] ", "\n\n", "Hello! I'm fine.", "\n"],
+    ["[CHAT", "]", ":", "\n", "Line one.\n", "Line two."],
+    ["Hello", "! I'm fine."],
+    ["Chatting", " is fun!"],
+    ["[", "COMMAND", "]", " I understand you want me to go."],
+    ["[OUT_OF", "_DOMAIN]", " I cannot help."],
+    ["I understand you want me to perform a command", "."],
+]
+
+
+def run_both(tokens, monkeypatch):
+    monkeypatch.setattr(conversation_agent, "conversation_llm", FakeLLM(tokens))
+    monkeypatch.setattr(conversation_agent, "get_rag_context", lambda user_input: "")
+    streamed = list(conversation_agent.process_conversation_stream("how are you?"))
+    return conversation_agent.process_conversation("how are you?"), streamed
+
+
+def test_stream_matches_non_stream(monkeypatch):
+    for tokens in TOKEN_CASES:
+        expected, streamed = run_both(tokens, monkeypatch)
+        # Only the trailing whitespace may differ (the stream cannot know where the reply ends)
+        assert "".join(streamed).rstrip() == expected, tokens
+
+
+def test_split_tag_never_reaches_the_user(monkeypatch):
+    _, streamed = run_both(["[", "CHAT", "]", "\n", "Hello", "!"], monkeypatch)
+    assert streamed[0] == "Hello"
+
+
+def test_command_verdict_stops_the_stream(monkeypatch):
+    _, streamed = run_both(["[COMMAND", "]", " Going", " now."], monkeypatch)
+    assert streamed == ["__COMMAND_MODE__"]
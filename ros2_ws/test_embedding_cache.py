@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Test the persistent embedding cache and the query LRU.
+"""
+
+import asyncio
+
+from embedding_cache import CachedEmbeddings, PersistentEmbeddingCache, QueryEmbeddingCache
+
+
+class FakeEmbeddings:
+    """Counts model calls; queries and documents get different vectors."""
+
+    def __init__(self, model, dimensions=3):
+        self.model = model
+        self.dimensions = dimensions
+        self.documents = 0
+        self.queries = 0
+
+    def embed_documents(self, texts):
+        self.documents += len(texts)
+        return [[float(len(text))] * self.dimensions for text in texts]
+
+    def embed_query(self, text):
+        self.queries += 1
+        return [-float(len(text))] * self.dimensions
+
+
+def make_cached(tmp_path, model="fake", dimensions=3, query_cache=None):
+    cache = PersistentEmbeddingCache(str(tmp_path / "embeddings.sqlite3"))
+    return CachedEmbeddings(FakeEmbeddings(model, dimensions), cache,
+                            query_cache=query_cache if query_cache is not None else QueryEmbeddingCache())
+
+
+def test_documents_are_embedded_once_across_instances(tmp_path):
+    first = make_cached(tmp_path)
+    vectors = first.embed_documents(["door", "arena", "door"])
+    assert vectors == [[4.0] * 3, [5.0] * 3, [4.0] * 3]
+    assert first.embeddings.documents == 2
+
+    second = make_cached(tmp_path)
+    assert second.embed_documents(["arena", "door"]) == [[5.0] * 3, [4.0] * 3]
+    assert second.embeddings.documents == 0
+    assert (second.hits, second.misses) == (2, 0)
+
+
+def test_queries_use_embed_query_and_the_lru(tmp_path):
+    cached = make_cached(tmp_path)
+    vectors = cached.embed_queries(["What is the arena?", "what is the  arena", "rules"])
+    assert vectors[0] == vectors[1] == [-18.0] * 3
+    assert cached.embeddings.queries == 2 and cached.embeddings.documents == 0
+
+    assert cached.embed_query("WHAT IS THE ARENA") == [-18.0] * 3
+    assert cached.embeddings.queries == 2
+
+
+def test_query_lru_is_keyed_by_model(tmp_path):
+    shared = QueryEmbeddingCache()
+    small = make_cached(tmp_path, model="small", dimensions=3, query_cache=shared)
+    large = make_cached(tmp_path, model="large", dimensions=5, query_cache=shared)
+    assert len(small.embed_query("where is the kitchen")) == 3
+    assert len(large.embed_query("where is the kitchen")) == 5
+    assert large.embeddings.queries == 1
+
+
+def test_async_queries_match_sync(tmp_path):
+    cached = make_cached(tmp_path)
+    vectors = asyncio.run(cached.aembed_queries(["door", "Door?", "arena"]))
+    assert vectors == [[-4.0] * 3, [-4.0] * 3, [-5.0] * 3]
+    assert cached.embed_queries(["door", "arena"]) == [[-4.0] * 3, [-5.0] * 3]
+    assert cached.embeddings.queries == 2
+
+
+def test_lru_evicts_the_oldest_entry():
+    cache = QueryEmbeddingCache(maxsize=2)
+    cache.put("m", "a", [1.0])
+    cache.put("m", "b", [2.0])
+    assert cache.get("m", "a") == [1.0]
+    cache.put("m", "c", [3.0])
+    assert cache.get("m", "b") is None
+    assert cache.get("m", "a") == [1.0] and cache.get("m", "c") == [3.0]
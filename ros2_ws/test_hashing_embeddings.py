@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Test the hashing embedder: vectors are identical across processes whatever
+PYTHONHASHSEED is, unit-length, and empty text maps to the zero vector.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from hashing_embeddings import HashingEmbeddings
+
+
+TEXTS = ["The robot opens the door of the arena.",
+         "Carry My Luggage: follow the operator to the car.",
+         "Pontuação: 100 pontos por servir o café da manhã"]
+
+EMBED_SCRIPT = ("import json\n"
+                "from hashing_embeddings import HashingEmbeddings\n"
+                f"print(json.dumps(HashingEmbeddings().embed_documents({TEXTS!r})))\n")
+
+
+def embed_in_subprocess(hash_seed):
+    env = dict(os.environ, PYTHONHASHSEED=str(hash_seed))
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.path.dirname(os.path.abspath(__file__)),
+                                                      env.get("PYTHONPATH")]))
+    output = subprocess.run([sys.executable, "-c", EMBED_SCRIPT], env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return np.array(json.loads(output))
+
+
+def test_vectors_do_not_depend_on_the_hash_seed():
+    first, second = embed_in_subprocess(1), embed_in_subprocess(2)
+    assert np.array_equal(first, second)
+    assert np.allclose(first, HashingEmbeddings().embed_documents(TEXTS))
+
+
+def test_vectors_are_l2_normalized():
+    embeddings = HashingEmbeddings(dimensions=256)
+    vectors = np.array(embeddings.embed_documents(TEXTS))
+    assert vectors.shape == (3, 256)
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0, atol=1e-6)
+    assert np.isclose(np.linalg.norm(embeddings.embed_query("robot")), 1.0, atol=1e-6)
+    assert not np.any(embeddings.embed_query(""))
+
+
+def test_query_and_document_vectors_match():
+    embeddings = HashingEmbeddings()
+    assert np.allclose(embeddings.embed_query(TEXTS[0]), embeddings.embed_documents(TEXTS)[0])
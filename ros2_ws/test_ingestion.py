@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Test the ingestion pipeline: prefetch backpressure and error propagation,
+concurrent embedding with ordered single-threaded writes, and create_vector_store
+discarding a half-written store when embedding or writing fails.
+"""
+
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from ingestion import pipelined_ingest, prefetch
+from numpy_store import NumpyVectorStore
+from test_update_index import PAGES, build, pipeline, write_pages  # noqa: F401 (fixture)
+
+
+def doc(i):
+    return SimpleNamespace(page_content=f"chunk {i}", metadata={})
+
+
+class SlowEmbeddings:
+    """Records how many embed_documents calls overlap; can fail on one batch."""
+
+    def __init__(self, delay=0.02, fail_on=None):
+        self.delay = delay
+        self.fail_on = fail_on
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self.lock:
+            self.calls += 1
+            call = self.calls
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delay)
+            if call == self.fail_on:
+                raise RuntimeError("embedding failed")
+            return [[float(text.split()[-1])] for text in texts]
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+def test_prefetch_stays_at_most_maxsize_ahead():
+    produced = []
+
+    def items():
+        for i in range(100):
+            produced.append(i)
+            yield i
+
+    iterator = prefetch(items(), maxsize=3)
+    assert next(iterator) == 0
+    time.sleep(0.2)
+    # The queue holds 3 items and the producer blocks holding one more
+    assert len(produced) <= 1 + 3 + 1
+    assert list(iterator) == list(range(1, 100))
+
+
+def test_prefetch_reraises_producer_errors_after_the_items():
+    def items():
+        yield 1
+        yield 2
+        raise ValueError("broken source")
+
+    received = []
+    with pytest.raises(ValueError, match="broken source"):
+        for item in prefetch(items(), maxsize=1):
+            received.append(item)
+    assert received == [1, 2]
+
+
+def test_prefetch_stops_the_producer_when_the_consumer_stops():
+    closed = threading.Event()
+
+    def items():
+        try:
+            for i in range(1000):
+                yield i
+        finally:
+            closed.set()
+
+    iterator = prefetch(items(), maxsize=2)
+    next(iterator)
+    iterator.close()
+    assert closed.wait(2)
+
+
+def test_embedding_runs_concurrently_and_writes_stay_in_order():
+    embeddings = SlowEmbeddings()
+    writes = []
+
+    def write_fn(docs, vectors):
+        writes.append((threading.current_thread().name, [d.page_content for d in docs], vectors))
+
+    summary = pipelined_ingest((doc(i) for i in range(40)), embeddings, write_fn,
+                               batch_size=2, max_in_flight=4, write_batch_size=8)
+    assert summary["chunks"] == 40
+    assert 1 < embeddings.max_active <= 4
+    assert {name for name, _, _ in writes} == {"ingest-writer"}
+    assert all(len(texts) <= 8 for _, texts, _ in writes)
+    assert [text for _, texts, _ in writes for text in texts] == [f"chunk {i}" for i in range(40)]
+    assert [vector for _, _, vectors in writes for vector in vectors] == [[float(i)] for i in range(40)]
+
+
+def test_a_slow_writer_holds_back_chunk_consumption():
+    release = threading.Event()
+    pulled = []
+
+    def chunks():
+        for i in range(1000):
+            pulled.append(i)
+            yield doc(i)
+
+    def write_fn(docs, vectors):
+        release.wait(5)
+
+    worker = threading.Thread(target=pipelined_ingest,
+                              args=(chunks(), SlowEmbeddings(delay=0), write_fn),
+                              kwargs=dict(batch_size=2, max_in_flight=2, write_batch_size=1))
+    worker.start()
+    time.sleep(0.3)
+    # Result queue (4 batches) + in flight (2) + the batch being written and the one being built
+    assert len(pulled) <= 2 * (4 + 2 + 2)
+    release.set()
+    worker.join(10)
+    assert len(pulled) == 1000
+
+
+def test_embedding_errors_propagate_and_skip_pending_writes():
+    written = []
+    with pytest.raises(RuntimeError, match="embedding failed"):
+        pipelined_ingest([doc(i) for i in range(20)], SlowEmbeddings(fail_on=3),
+                         lambda docs, vectors: written.extend(docs),
+                         batch_size=2, max_in_flight=2, write_batch_size=100)
+    assert written == []
+
+
+def test_writer_errors_propagate():
+    def write_fn(docs, vectors):
+        raise OSError("disk full")
+
+    with pytest.raises(OSError, match="disk full"):
+        pipelined_ingest([doc(i) for i in range(10)], SlowEmbeddings(delay=0), write_fn,
+                         batch_size=2, max_in_flight=2, write_batch_size=2)
+
+
+class FailingEmbeddings:
+    """Wraps the pipeline embeddings; the second embed_documents call fails."""
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+        self.calls = 0
+        self.hits = self.misses = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        if self.calls == 2:
+            raise RuntimeError("embedding failed")
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
+
+
+def assert_no_partial_store(pipeline):
+    assert not os.path.exists(pipeline.NUMPY_STORE_PATH)
+    assert pipeline.load_manifest() is None
+
+
+def test_failed_embedding_batch_discards_the_partial_store(pipeline):
+    write_pages(pipeline, PAGES)
+    pipeline._cached_embeddings = FailingEmbeddings(pipeline.get_cached_embeddings())
+    assert pipeline.create_vector_store(batch_size=1, max_in_flight=1, write_batch_size=1) is None
+    assert_no_partial_store(pipeline)
+
+
+def test_failed_write_discards_the_partial_store(pipeline, monkeypatch):
+    write_pages(pipeline, PAGES)
+    add_embeddings = NumpyVectorStore.add_embeddings
+    calls = []
+
+    def failing_add_embeddings(self, *args, **kwargs):
+        calls.append(1)
+        if len(calls) == 2:
+            raise OSError("disk full")
+        return add_embeddings(self, *args, **kwargs)
+
+    monkeypatch.setattr(NumpyVectorStore, "add_embeddings", failing_add_embeddings)
+    assert pipeline.create_vector_store(batch_size=1, max_in_flight=1, write_batch_size=1) is None
+    assert len(calls) == 2
+    assert_no_partial_store(pipeline)
+
+    # The next start builds a complete store with its manifest
+    monkeypatch.setattr(NumpyVectorStore, "add_embeddings", add_embeddings)
+    store = build(pipeline)
+    assert len(store) == len(PAGES) and pipeline.load_manifest() is not None
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Test the intent classifier: save/load round trip, the threshold stored in the
+artifact, the fall-through below the threshold and the threshold tuning.
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from intent_classifier import DEFAULT_CONFIDENCE_THRESHOLD, INTENT_MODEL_PATH, LABELS, IntentClassifier
+from train_intent_classifier import tune_threshold
+
+
+EMBEDDER = {"type": "hashing", "dimensions": 64}
+SHIPPED_MODEL = os.path.join(os.path.dirname(os.path.abspath(__file__)), INTENT_MODEL_PATH)
+
+
+def make_classifier(threshold=0.8):
+    rng = np.random.default_rng(0)
+    return IntentClassifier(rng.standard_normal((64, 3)) * 5, rng.standard_normal(3), LABELS,
+                            EMBEDDER, threshold=threshold)
+
+
+def test_save_and_load_keep_predictions_and_threshold(tmp_path):
+    classifier = make_classifier(threshold=0.73)
+    path = str(tmp_path / "model" / "intent.npz")
+    classifier.save(path)
+    loaded = IntentClassifier.load(path)
+    assert loaded.labels == list(LABELS) and loaded.embedder_config == EMBEDDER
+    assert loaded.threshold == 0.73
+    assert IntentClassifier.load(path, threshold=0.5).threshold == 0.5
+    texts = ["bring me a coke", "hello robot", "how many points for the door?"]
+    assert np.allclose(loaded.predict_proba(texts), classifier.predict_proba(texts))
+    prediction = loaded.predict(texts[0])
+    assert prediction.label in LABELS and 0 < prediction.confidence <= 1
+
+
+def test_artifacts_without_threshold_use_the_default(tmp_path):
+    classifier = make_classifier()
+    path = str(tmp_path / "old.npz")
+    np.savez_compressed(path, weights=classifier.weights, bias=classifier.bias,
+                        labels=np.array(classifier.labels), embedder=np.array('{"type": "hashing"}'))
+    assert IntentClassifier.load(path).threshold == DEFAULT_CONFIDENCE_THRESHOLD
+
+
+def test_missing_artifact_loads_as_none(tmp_path):
+    assert IntentClassifier.load(str(tmp_path / "missing.npz")) is None
+
+
+def test_uncertain_predictions_fall_through():
+    classifier = make_classifier()
+    text = "bring me a coke"
+    confidence = classifier.predict(text).confidence
+    classifier.threshold = confidence + 1e-3
+    assert classifier.route(text) is None
+    classifier.threshold = confidence - 1e-3
+    assert classifier.route(text).label == classifier.predict(text).label
+    assert classifier.stats() == {"confident": 1, "uncertain": 1, "hit_rate": 0.5}
+
+
+def test_tuned_threshold_excludes_confident_errors():
+    confidences = [0.99, 0.97, 0.95, 0.9, 0.86, 0.83, 0.7, 0.6]
+    correct = [True, True, True, True, True, False, True, False]
+    assert tune_threshold(confidences, correct, target_precision=1.0) == (0.84, 5 / 8, 1.0)
+    # All predictions would give 6/8 correct; dropping the 0.6 error reaches the target
+    assert tune_threshold(confidences, correct, target_precision=0.8) == pytest.approx((0.61, 7 / 8, 6 / 7))
+    assert tune_threshold([0.99, 0.98], [False, False], target_precision=0.9)[0] == 0.99
+
+
+def test_shipped_model_leaves_ambiguous_statements_to_the_router():
+    classifier = IntentClassifier.load(SHIPPED_MODEL)
+    assert classifier is not None and classifier.threshold > 0.5
+    assert classifier.route("the kitchen is dirty") is None
+    assert classifier.route("what is the penalty for touching the referee?").label == "rulebook"
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Test the Aho-Corasick automaton against a naive search and the fast-path
+intent decisions.
+"""
+
+import random
+
+from intent_matcher import AhoCorasick, IntentMatcher, PhraseMatcher
+
+
+def naive_matches(patterns, text):
+    return sorted((start, start + len(pattern), index)
+                  for index, pattern in enumerate(patterns)
+                  for start in range(len(text) - len(pattern) + 1)
+                  if text.startswith(pattern, start))
+
+
+def test_automaton_matches_naive_search():
+    rng = random.Random(3)
+    for _ in range(300):
+        patterns = list({"".join(rng.choice("abc") for _ in range(rng.randint(1, 4))) for _ in range(6)})
+        text = "".join(rng.choice("abc") for _ in range(rng.randint(0, 25)))
+        assert sorted(AhoCorasick(patterns).iter_matches(text)) == naive_matches(patterns, text)
+
+
+def test_whole_words():
+    matcher = PhraseMatcher({"hi": 1, "go to": 2})
+    assert [phrase for phrase, _, _ in matcher.find("hi, go to the kitchen")] == ["hi", "go to"]
+    assert matcher.find("this goes to nothing") == []
+    assert PhraseMatcher({"hi": 1}, whole_words=False).contains_any("this")
+
+
+def test_obvious_inputs_skip_the_llm():
+    matcher = IntentMatcher(entities=["kitchen", "cup"])
+    assert matcher.route("please go to the kitchen and bring me the cup").intent == "command"
+    assert matcher.route("hello, how are you?").intent == "conversation"
+    assert matcher.route("where is John?").intent == "command"
+    assert matcher.classify("where is the kitchen?").intent == "conversation"
+
+
+def test_ambiguous_inputs_fall_back_to_the_llm():
+    matcher = IntentMatcher(entities=[])
+    assert matcher.route("the weather") is None
+    stats = matcher.stats()
+    assert stats["llm_fallbacks"] == 1 and stats["fast_path"] == 0
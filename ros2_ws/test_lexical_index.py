@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Test BM25 ranking, metadata filters and reciprocal rank fusion.
+"""
+
+from types import SimpleNamespace
+
+from lexical_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+
+def doc(text, tipo="rulebook"):
+    return SimpleNamespace(page_content=text, metadata={"tipo": tipo})
+
+
+def make_index():
+    index = BM25Index()
+    index.add_documents([
+        doc("The robot opens the door of the arena."),
+        doc("Touching a person gives a penalty to the team."),
+        doc("Penalty points are subtracted from the final score.", tipo="faq"),
+        doc("Carry My Luggage starts at the living room."),
+    ], ids=["door", "touch", "score", "luggage"])
+    return index
+
+
+def test_tokenize_drops_stopwords_and_case():
+    assert tokenize("What is THE penalty?") == ["penalty"]
+
+
+def test_rare_terms_rank_first():
+    results = make_index().search("penalty for touching a person", k=2)
+    assert [doc_id for doc_id, _, _ in results] == ["touch", "score"]
+    assert results[0][2] > results[1][2]
+
+
+def test_filter_and_repeated_ids():
+    index = make_index()
+    index.add_documents([doc("A duplicate door chunk.")], ids=["door"])
+    assert len(index) == 4
+    results = index.search("penalty", k=4, metadata_filter={"tipo": "faq"})
+    assert [doc_id for doc_id, _, _ in results] == ["score"]
+    assert index.search("the of a", k=4) == []
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    a, b, c = doc("a"), doc("b"), doc("c")
+    fused = reciprocal_rank_fusion([[("a", a), ("b", b)], [("b", b), ("c", c)]], k=3)
+    assert fused == [b, a, c]
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Test that cleaning a streamed LLM response chunk by chunk gives the same text
+as cleaning the complete response.
+"""
+
+import random
+
+from llm_output import clean_llm_output, stream_clean_llm_output
+
+
+def split_randomly(text, rng):
+    chunks = []
+    while text:
+        size = rng.randint(1, 6)
+        chunks.append(text[:size])
+        text = text[size:]
+    return chunks
+
+
+def test_known_responses():
+    cases = [
+        ("  Hello<unused12> world!  ", ["  Hel", "lo<un", "used1", "2> wor", "ld!  "]),
+        ("I am in the kitchen.", ["I", " am", " in", " the", " kitchen."]),
+        ("<unused0>Done", ["<", "unused", "0", ">", "Done"]),
+        ("a < b and <unusedX> stays", ["a <", " b and <unu", "sedX> stays"]),
+        ("Olá, café ok", ["Ol", "á, caf", "é ok"]),
+        ("   ", [" ", "  "]),
+    ]
+    for text, chunks in cases:
+        assert "".join(stream_clean_llm_output(chunks)) == clean_llm_output(text), chunks
+
+
+def test_random_splits_match_the_full_cleaning():
+    rng = random.Random(7)
+    alphabet = ["a", "b", " ", "\n", "<", ">", "unused", "1", "2", "é", ".", "<unused3>", "x"]
+    for _ in range(2000):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 30)))
+        chunks = split_randomly(text, rng)
+        assert "".join(stream_clean_llm_output(chunks)) == clean_llm_output(text), chunks
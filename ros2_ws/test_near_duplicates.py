@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Test MinHash near-duplicate filtering.
+"""
+
+from types import SimpleNamespace
+
+from near_duplicates import NearDuplicateIndex
+
+
+BASE = ("The robot has to navigate to the kitchen, pick up the cup from the table and bring it "
+        "to the operator standing in the living room without touching any furniture on the way.")
+
+
+def doc(text):
+    return SimpleNamespace(page_content=text, metadata={})
+
+
+def test_near_copy_is_dropped_in_favor_of_the_first():
+    other = "The referee fills in the score sheet after each attempt and hands it to the OC."
+    index = NearDuplicateIndex()
+    kept, dropped = index.filter([doc(BASE), doc(BASE.replace("kitchen,", "kitchen")), doc(other)],
+                                 ["a", "b", "c"])
+    assert [d.page_content for d in kept] == [BASE, other]
+    assert dropped == {"b": "a"}
+    assert len(index) == 2
+
+
+def test_already_indexed_ids_are_kept():
+    index = NearDuplicateIndex()
+    index.add_texts(["a"], [BASE])
+    kept, dropped = index.filter([doc(BASE), doc(BASE + " Extra.")], ["a", "b"])
+    assert len(kept) == 1 and dropped == {"b": "a"}
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Test the NumPy vector store: persistence, upsert/delete, filtered search,
+quantized search, the empty store and searches during writes.
+"""
+
+import threading
+
+import numpy as np
+from langchain_core.documents import Document
+
+from hashing_embeddings import HashingEmbeddings
+from numpy_store import NumpyVectorStore
+
+
+TEXTS = [
+    "The robot must open the door before entering the arena.",
+    "Touching a person during the test gives a penalty.",
+    "Carry My Luggage: the robot follows the operator to the car.",
+    "The referee starts the timer when the robot leaves the start area.",
+    "Objects are placed on the kitchen table before Serve Breakfast.",
+    "Teams have a setup time of five minutes before each test.",
+]
+
+
+def make_store(path, quantization=None):
+    documents = [Document(page_content=text, metadata={"tipo": "rulebook" if i % 2 == 0 else "faq", "row": i})
+                 for i, text in enumerate(TEXTS)]
+    return NumpyVectorStore.from_documents(documents, HashingEmbeddings(), str(path),
+                                           ids=[f"id{i}" for i in range(len(TEXTS))],
+                                           quantization=quantization)
+
+
+def test_search_finds_the_matching_chunk(tmp_path):
+    store = make_store(tmp_path)
+    query = HashingEmbeddings().embed_query("penalty for touching a person")
+    results = store.similarity_search_by_vector_with_relevance_scores(query, k=2)
+    assert results[0][0].page_content == TEXTS[1]
+    assert results[0][1] >= results[1][1]
+
+
+def test_store_survives_reload(tmp_path):
+    make_store(tmp_path)
+    assert NumpyVectorStore.exists(str(tmp_path))
+    store = NumpyVectorStore.load(str(tmp_path), HashingEmbeddings())
+    assert len(store) == len(TEXTS)
+    assert store.similarity_search("luggage operator car", k=1)[0].page_content == TEXTS[2]
+
+
+def test_filter_only_returns_the_partition(tmp_path):
+    store = make_store(tmp_path)
+    results = store.similarity_search("robot", k=10, filter={"tipo": "faq"})
+    assert results and all(doc.metadata["tipo"] == "faq" for doc in results)
+
+
+def test_upsert_and_delete(tmp_path):
+    store = make_store(tmp_path)
+    store.add_documents([Document(page_content="A new rule about doors.", metadata={"tipo": "rulebook"})],
+                        ids=["id0"])
+    assert len(store) == len(TEXTS)
+    assert "A new rule about doors." in store.get(ids=["id0"])["documents"]
+
+    store.delete(["id1", "missing"])
+    assert len(store) == len(TEXTS) - 1
+    assert store.get(ids=["id1"])["ids"] == []
+
+
+def test_empty_store_is_falsy_but_usable(tmp_path):
+    store = make_store(tmp_path)
+    store.delete([f"id{i}" for i in range(len(TEXTS))])
+    # Callers must compare with None: an empty store is a valid store
+    assert len(store) == 0 and not store and store is not None
+    assert store.similarity_search("robot", k=4) == []
+    store.add_documents([Document(page_content=TEXTS[0], metadata={"tipo": "rulebook"})], ids=["again"])
+    assert store.similarity_search("door arena", k=1)[0].page_content == TEXTS[0]
+
+
+def test_quantized_search_agrees_with_exact_search(tmp_path):
+    rng = np.random.default_rng(0)
+    words = ("robot arena door referee penalty luggage operator kitchen table score team setup "
+             "timer person object shelf bag guest drink chair navigation speech gesture").split()
+    texts = [" ".join(rng.choice(words, size=12)) for _ in range(200)]
+    # Partial queries: the query vector is not equal to any chunk vector
+    queries = [" ".join(text.split()[:5]) for text in texts[:50]]
+    documents = [Document(page_content=text, metadata={"tipo": "rulebook"}) for text in texts]
+    embeddings = HashingEmbeddings()
+    exact = NumpyVectorStore.from_documents(documents, embeddings, str(tmp_path / "exact"))
+    expected = [exact.similarity_search(query, k=1)[0].page_content for query in queries]
+    for quantization in ("int8", "binary"):
+        store = NumpyVectorStore.from_documents(documents, embeddings, str(tmp_path / quantization),
+                                                quantization=quantization)
+        found = [store.similarity_search(query, k=1)[0].page_content for query in queries]
+        agreement = np.mean([a == b for a, b in zip(found, expected)])
+        assert agreement >= 0.9, (quantization, agreement)
+        # A reloaded quantized store keeps only the quantized matrix resident
+        reloaded = NumpyVectorStore.load(str(tmp_path / quantization), embeddings, quantization=quantization)
+        assert [reloaded.similarity_search(query, k=1)[0].page_content for query in queries] == found
+        sizes = reloaded.index_nbytes()
+        assert sizes["resident"] == sizes["search"] < sizes["full_precision"]
+
+
+def test_searches_during_writes_see_consistent_rows(tmp_path):
+    store = make_store(tmp_path, quantization="int8")
+    query = HashingEmbeddings().embed_query("robot")
+    errors = []
+    done = threading.Event()
+
+    def search():
+        while not done.is_set():
+            try:
+                results = store.similarity_search_by_vector_with_relevance_scores(query, k=3)
+            except Exception as e:
+                errors.append(e)
+                continue
+            # Text and metadata must come from the same row
+            errors.extend(doc for doc, _ in results if TEXTS[doc.metadata["row"]] != doc.page_content)
+
+    readers = [threading.Thread(target=search) for _ in range(3)]
+    for reader in readers:
+        reader.start()
+    try:
+        for i in range(20):
+            store.delete([f"id{i % len(TEXTS)}"])
+            row = (i + 1) % len(TEXTS)
+            store.add_documents([Document(page_content=TEXTS[row], metadata={"tipo": "rulebook", "row": row})],
+                                ids=[f"id{row}"])
+    finally:
+        done.set()
+        for reader in readers:
+            reader.join()
+    assert errors == []
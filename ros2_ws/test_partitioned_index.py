@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Test filtered search over the per-tipo partitions: filters on other keys fall
+back to scanning every partition, and the partitions follow adds and deletes.
+Results are checked against a brute-force filtered search.
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+from langchain_core.documents import Document
+
+from hashing_embeddings import HashingEmbeddings
+from numpy_store import NumpyVectorStore
+from partitioned_index import PartitionedIndex
+from vector_utils import normalize_rows
+
+
+TIPOS = ["rulebook", "faq", "scoresheet"]
+
+
+def make_documents(count, start=0):
+    rng = np.random.default_rng(start)
+    words = "robot arena door referee penalty luggage operator kitchen table score team".split()
+    return [SimpleNamespace(page_content=" ".join(rng.choice(words, size=8)),
+                            metadata={"tipo": TIPOS[i % 3], "source": f"file{i % 2}.pdf", "row": i})
+            for i in range(start, start + count)]
+
+
+def brute_force(vectors, documents, query, k, metadata_filter):
+    scores = normalize_rows(vectors) @ normalize_rows(query)[0]
+    rows = [i for i, doc in enumerate(documents)
+            if all(doc.metadata.get(key) == value for key, value in metadata_filter.items())]
+    rows.sort(key=lambda i: -scores[i])
+    return [documents[i].metadata["row"] for i in rows[:k]]
+
+
+def rows_of(results):
+    return [doc.metadata["row"] for doc, _ in results]
+
+
+def test_filters_match_brute_force_with_and_without_tipo():
+    documents = make_documents(60)
+    vectors = np.random.default_rng(1).standard_normal((60, 16))
+    index = PartitionedIndex()
+    index.add(vectors, documents, [str(i) for i in range(60)])
+    assert index.partitions() == {"rulebook": 20, "faq": 20, "scoresheet": 20}
+
+    query = np.random.default_rng(2).standard_normal(16)
+    for metadata_filter in ({"tipo": "faq"}, {"source": "file1.pdf"},
+                            {"tipo": "rulebook", "source": "file0.pdf"}, {}, {"tipo": "missing"}):
+        assert rows_of(index.search(query, k=5, metadata_filter=metadata_filter)) == \
+            brute_force(vectors, documents, query, 5, metadata_filter), metadata_filter
+
+
+def test_adds_extend_the_partitions_and_skip_known_ids():
+    documents = make_documents(9)
+    vectors = np.random.default_rng(3).standard_normal((12, 16))
+    index = PartitionedIndex()
+    index.add(vectors[:9], documents, [str(i) for i in range(9)])
+    new_documents = make_documents(3, start=9) + [documents[0]]
+    index.add(np.vstack([vectors[9:], vectors[:1]]), new_documents, ["9", "10", "11", "0"])
+    assert len(index) == 12 and index.partitions() == {"rulebook": 4, "faq": 4, "scoresheet": 4}
+
+    all_documents = documents + new_documents[:3]
+    query = vectors[10]
+    assert rows_of(index.search(query, k=3, metadata_filter={"tipo": "faq"})) == \
+        brute_force(vectors, all_documents, query, 3, {"tipo": "faq"})
+
+
+def test_numpy_store_partitions_follow_adds_and_deletes(tmp_path):
+    embeddings = HashingEmbeddings()
+    documents = [Document(page_content=doc.page_content, metadata=doc.metadata) for doc in make_documents(30)]
+    store = NumpyVectorStore.from_documents(documents, embeddings, str(tmp_path),
+                                            ids=[str(i) for i in range(30)])
+
+    def check(query):
+        stored = store.get(include=["documents", "metadatas", "embeddings"])
+        stored_documents = [SimpleNamespace(page_content=text, metadata=metadata)
+                            for text, metadata in zip(stored["documents"], stored["metadatas"])]
+        vector = embeddings.embed_query(query)
+        for metadata_filter in ({"tipo": "faq"}, {"tipo": "scoresheet", "source": "file0.pdf"},
+                                {"source": "file1.pdf"}):
+            expected = brute_force(stored["embeddings"], stored_documents, vector, 4, metadata_filter)
+            found = rows_of(store.similarity_search_by_vector_with_relevance_scores(
+                vector, k=4, filter=metadata_filter))
+            assert found == expected, metadata_filter
+
+    check("referee penalty door")
+    store.delete([str(i) for i in range(0, 30, 3)])   # every rulebook chunk
+    assert store.similarity_search("robot", k=4, filter={"tipo": "rulebook"}) == []
+    check("referee penalty door")
+
+    added = [Document(page_content="new faq about the kitchen table", metadata={"tipo": "faq", "row": 100}),
+             Document(page_content="a new tipo for the arena door", metadata={"tipo": "manual", "row": 101})]
+    store.add_documents(added, ids=["100", "101"])
+    assert [doc.metadata["row"] for doc in store.similarity_search("arena door", k=4, filter={"tipo": "manual"})] == [101]
+    check("kitchen table")
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Test score-aware chunk selection on synthetic scores and vectors: adaptive_k
+cuts at a score gap and stays within 1..k_max, and MMR skips near duplicates.
+"""
+
+import numpy as np
+
+from reranking import adaptive_k, is_redundant, mmr
+
+
+def test_a_dominant_first_result_is_enough():
+    assert adaptive_k([0.82, 0.70, 0.69, 0.68], k_max=4) == 1
+
+
+def test_cut_at_the_gap_after_the_relevant_results():
+    assert adaptive_k([0.80, 0.79, 0.77, 0.60, 0.59], k_max=5) == 3
+    assert adaptive_k([0.80, 0.78, 0.76, 0.75, 0.74], k_max=5) == 5
+
+
+def test_k_stays_between_one_and_k_max():
+    flat = [0.5] * 10
+    assert adaptive_k(flat, k_max=4) == 4
+    assert adaptive_k(flat, k_max=1) == 1
+    assert adaptive_k([0.3], k_max=5) == 1
+    assert adaptive_k([], k_max=5) == 0
+    assert adaptive_k(flat, k_max=0) == 0
+
+
+def test_margin_and_window_are_configurable():
+    scores = [0.80, 0.75, 0.74, 0.50]
+    assert adaptive_k(scores, k_max=4) == 3
+    assert adaptive_k(scores, k_max=4, dominance_margin=0.05) == 1
+    assert adaptive_k(scores, k_max=4, relevance_window=0.4) == 4
+
+
+def near_duplicate_candidates():
+    rng = np.random.default_rng(0)
+    base = rng.standard_normal((3, 32))
+    duplicate = base[0] + 0.01 * rng.standard_normal(32)
+    # Candidates 0 and 1 are near duplicates; 0 is the most relevant
+    candidates = np.vstack([base[0], duplicate, base[1], base[2]])
+    query = base[0] + 0.6 * base[1] + 0.6 * base[2]
+    return query, candidates
+
+
+def test_redundancy_detection():
+    _, candidates = near_duplicate_candidates()
+    assert is_redundant(candidates)
+    assert not is_redundant(candidates[[0, 2, 3]])
+    assert not is_redundant(candidates[:1])
+
+
+def test_mmr_drops_the_near_duplicate():
+    query, candidates = near_duplicate_candidates()
+    relevance = candidates @ query / np.linalg.norm(candidates, axis=1)
+    assert relevance[1] > max(relevance[2], relevance[3])   # by relevance alone the duplicate would come second
+    selected = mmr(query, candidates, k=3)
+    assert selected[0] == 0 and 1 not in selected
+    assert sorted(selected) == [0, 2, 3]
+
+
+def test_mmr_with_lambda_one_is_plain_relevance_order():
+    query, candidates = near_duplicate_candidates()
+    relevance = candidates @ query / np.linalg.norm(candidates, axis=1)
+    assert mmr(query, candidates, k=4, lambda_mult=1.0) == list(np.argsort(-relevance))
+    assert mmr(query, candidates, k=10) == mmr(query, candidates, k=4)
+    assert mmr(query, candidates, k=0) == []
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Test that the rulebook is chunked along its sections.
+"""
+
+from langchain_core.documents import Document
+
+from section_chunker import chunk_sections, parse_sections
+
+
+PAGES = [
+    "Chapter 3\nTests in Stage I\n3.1 Carry My Luggage\nThe robot helps the operator.\n"
+    "Setup\nThe bag is next to the operator.\nRoboCup@Home Rulebook / 2024 page 13",
+    "14 3.1 Carry My Luggage\nProcedure\nThe robot follows the operator.\n"
+    "3.2 Receptionist\nThe robot welcomes guests.",
+]
+
+
+def documents():
+    return [Document(page_content=text, metadata={"source": "rulebook.pdf", "page": page})
+            for page, text in enumerate(PAGES)]
+
+
+def test_headings_build_the_section_paths():
+    paths = [" > ".join(section.heading_path) for section in parse_sections(documents())]
+    assert paths == [
+        "3 Tests in Stage I",
+        "3 Tests in Stage I > 3.1 Carry My Luggage",
+        "3 Tests in Stage I > 3.1 Carry My Luggage > Setup",
+        "3 Tests in Stage I > 3.1 Carry My Luggage > Procedure",
+        "3 Tests in Stage I > 3.2 Receptionist",
+    ]
+
+
+def test_chunks_never_cross_sections_and_skip_headers_and_footers():
+    chunks = chunk_sections(documents())
+    assert [chunk.metadata["heading_path"].split(" > ")[-1] for chunk in chunks] == [
+        "3 Tests in Stage I", "3.1 Carry My Luggage", "Setup", "Procedure", "3.2 Receptionist"]
+    text = "\n".join(chunk.page_content for chunk in chunks)
+    assert "RoboCup@Home Rulebook /" not in text and "14 3.1" not in text
+    procedure = chunks[3]
+    assert procedure.metadata["page"] == 1
+    assert procedure.metadata["section_id"] == "rulebook.pdf#3 Tests in Stage I > 3.1 Carry My Luggage > Procedure"
+    assert len({chunk.metadata["section_id"] for chunk in chunks}) == len(chunks)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Test the VectorStoreHandle lifecycle: one background initialization, blocking
+get(), timeouts, set() during initialization and empty (falsy) stores.
+"""
+
+import threading
+
+from store_handle import VectorStoreHandle
+
+
+class EmptyStore:
+    """A store with no chunks: len() == 0, so it is falsy."""
+
+    def __len__(self):
+        return 0
+
+
+def test_factory_runs_once_in_background():
+    calls = []
+    release = threading.Event()
+
+    def factory():
+        calls.append(threading.current_thread().name)
+        release.wait(5)
+        return "store"
+
+    handle = VectorStoreHandle(factory)
+    handle.start()
+    handle.start()
+    assert not handle.is_ready()
+    assert handle.get(timeout=0.05) is None
+
+    release.set()
+    assert handle.get(timeout=5) == "store"
+    assert handle.get() == "store"
+    assert calls == ["rag-init"]
+    assert handle.startup_seconds is not None
+
+
+def test_get_starts_initialization_on_first_use():
+    handle = VectorStoreHandle(lambda: "store")
+    assert handle.get(timeout=5) == "store"
+
+
+def test_empty_store_is_returned_as_is():
+    store = EmptyStore()
+    handle = VectorStoreHandle(lambda: store)
+    assert handle.get(timeout=5) is store
+
+
+def test_factory_can_use_an_empty_store_it_just_built():
+    # The factory runs on the init thread: it must never wait on its own handle.
+    # A helper that falls back to the handle only when it gets None is safe with an empty store.
+    handle = None
+
+    def helper(vectorstore=None):
+        if vectorstore is None:
+            vectorstore = handle.get()
+        return vectorstore
+
+    def factory():
+        return helper(EmptyStore())
+
+    handle = VectorStoreHandle(factory)
+    assert isinstance(handle.get(timeout=5), EmptyStore)
+
+
+def test_factory_error_leaves_handle_ready_without_store():
+    def factory():
+        raise RuntimeError("no embeddings")
+
+    handle = VectorStoreHandle(factory)
+    assert handle.get(timeout=5) is None
+    assert handle.is_ready()
+
+
+def test_set_during_initialization_wins():
+    release = threading.Event()
+
+    def factory():
+        release.wait(5)
+        return "stale"
+
+    handle = VectorStoreHandle(factory).start()
+    handle.set("rebuilt")
+    release.set()
+    handle._thread.join(5)
+    assert handle.get() == "rebuilt"
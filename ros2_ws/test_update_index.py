@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Test incremental indexing: the manifest diff, deleting stale chunks, removing
+outdated summary nodes, re-chunking after a chunker change and dropping near
+duplicates. Runs in a temporary workspace with the hashing embedder and the
+NumPy backend.
+"""
+
+import pytest
+from langchain_core.documents import Document
+
+
+PAGES = [
+    "Chapter 3\nTests in Stage I\n3.1 Carry My Luggage\n"
+    "The robot helps the operator carry the bag to the car parked outside the arena.",
+    "3.2 Receptionist\nThe robot welcomes the guests at the entrance door and introduces them to the host.",
+    "3.3 Serve Breakfast\nThe robot places the bowl, the spoon and the cereal box on the kitchen table.",
+]
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    """rag_pipeline indexing a text file (pages separated by form feeds) inside tmp_path."""
+    workspace = tmp_path / "ws"
+    workspace.mkdir()
+    monkeypatch.chdir(workspace)
+    monkeypatch.setenv("RAG_EMBEDDINGS", "hashing")
+    monkeypatch.setenv("RAG_VECTOR_BACKEND", "numpy")
+    import rag_pipeline
+    # The store built at import time finds no sources in an empty workspace
+    rag_pipeline.vectorstore_handle.get()
+
+    source_path = tmp_path / "rules.txt"
+    source = {"path": str(source_path),
+              "metadata": {"source": "rules.txt", "tipo": "rulebook", "file_type": "txt"},
+              "chunker": "recursive"}
+
+    def load_source_documents(source):
+        pages = source_path.read_text(encoding="utf-8").split("\f")
+        return [Document(page_content=text, metadata=dict(source["metadata"], page=page))
+                for page, text in enumerate(pages)]
+
+    monkeypatch.setattr(rag_pipeline, "EMBEDDING_BACKEND", "hashing")
+    monkeypatch.setattr(rag_pipeline, "VECTOR_BACKEND", "numpy")
+    monkeypatch.setattr(rag_pipeline, "_cached_embeddings", None)
+    monkeypatch.setattr(rag_pipeline, "_duplicate_indexes", None)
+    monkeypatch.setattr(rag_pipeline, "KNOWLEDGE_SOURCES", [source])
+    monkeypatch.setattr(rag_pipeline, "load_source_documents", load_source_documents)
+    return rag_pipeline
+
+
+def write_pages(pipeline, pages):
+    with open(pipeline.KNOWLEDGE_SOURCES[0]["path"], "w", encoding="utf-8") as f:
+        f.write("\f".join(pages))
+
+
+def build(pipeline, pages=PAGES):
+    write_pages(pipeline, pages)
+    store = pipeline.create_vector_store()
+    pipeline.rebuild_search_indexes(store)
+    return store
+
+
+def manifest_ids(pipeline):
+    entry = pipeline.load_manifest()["sources"]["rules.txt"]
+    return {chunk for page in entry["pages"].values() for chunk in page["chunk_ids"]}
+
+
+def test_unchanged_source_is_not_reindexed(pipeline):
+    store = build(pipeline)
+    assert not pipeline.index_is_stale()
+    assert pipeline.update_index(store)["added"] == 0
+    assert set(store.get()["ids"]) == manifest_ids(pipeline)
+
+
+def test_only_the_changed_page_is_embedded_and_its_old_chunk_deleted(pipeline):
+    store = build(pipeline)
+    old_ids = set(store.get()["ids"])
+    write_pages(pipeline, [PAGES[0], PAGES[1].replace("host", "referee"), PAGES[2]])
+    assert pipeline.index_is_stale()
+
+    summary = pipeline.update_index(store)
+    assert (summary["added"], summary["removed"]) == (1, 1)
+    ids = set(store.get()["ids"])
+    assert len(ids - old_ids) == 1 and len(old_ids - ids) == 1
+    assert ids == manifest_ids(pipeline)
+    assert "referee" in store.get(ids=list(ids - old_ids))["documents"][0]
+
+
+def test_removed_pages_and_sources_are_deleted(pipeline):
+    store = build(pipeline)
+    write_pages(pipeline, PAGES[:2])
+    assert pipeline.update_index(store)["removed"] == 1
+    assert len(store) == 2 and set(store.get()["ids"]) == manifest_ids(pipeline)
+
+    pipeline.KNOWLEDGE_SOURCES[0]["path"] += ".missing"
+    assert pipeline.update_index(store)["removed"] == 2
+    assert len(store) == 0 and pipeline.load_manifest()["sources"] == {}
+
+
+def test_summaries_of_a_changed_source_are_removed(pipeline):
+    store = build(pipeline)
+    summary = Document(page_content="Stage I tests: luggage, receptionist and breakfast.",
+                       metadata={"source": "rules.txt", "node_type": "summary",
+                                 "chunk_id": "summary:rules.txt#3 Tests in Stage I"})
+    pipeline.replace_summary_nodes([summary], store)
+    assert pipeline.summary_count == 1
+    assert "summary:rules.txt#3 Tests in Stage I" in store.get()["ids"]
+
+    write_pages(pipeline, PAGES[:2])
+    pipeline.update_index(store)
+    assert "summary:rules.txt#3 Tests in Stage I" not in store.get()["ids"]
+    assert pipeline.summary_count == 0
+    assert pipeline.load_manifest()["summaries"] == {}
+
+
+def test_chunker_change_rechunks_the_source(pipeline):
+    store = build(pipeline)
+    old_ids = set(store.get()["ids"])
+    pipeline.KNOWLEDGE_SOURCES[0]["section_chunks"] = True
+    assert pipeline.index_is_stale()
+
+    pipeline.update_index(store)
+    ids = set(store.get()["ids"])
+    section_ids = {doc_id for doc_id in ids if doc_id.startswith("section:")}
+    # Recursive chunks are kept (same ids); section chunks are added alongside
+    assert old_ids < ids and ids - old_ids == section_ids
+    assert ids == manifest_ids(pipeline)
+    assert pipeline.load_manifest()["sources"]["rules.txt"]["chunker"] == "recursive+sections"
+    assert pipeline.section_node_count == len(section_ids)
+    assert len(pipeline.lexical_index) == len(old_ids)
+
+
+def test_near_duplicate_pages_are_not_embedded(pipeline):
+    store = build(pipeline)
+    copy = PAGES[2].replace("cereal box", "cereal  box,")
+    write_pages(pipeline, PAGES + [copy])
+
+    summary = pipeline.update_index(store)
+    assert summary["added"] == 0
+    assert len(store) == len(PAGES)
+    entry = pipeline.load_manifest()["sources"]["rules.txt"]
+    assert entry["page_count"] == len(PAGES) + 1
+    assert entry["pages"]["3"]["chunk_ids"] == []
@@ -0,0 +1,247 @@
+"""
+Treina o classificador de intenção usado pelo router (ver intent_classifier.py).
+
+Dados:
+  - command: sentenças dos comandos anotados do HuRIC (Datasets/huric-master/en/*/*.hrc)
+    + comandos extras de Datasets/intent_examples.json (buscas por pessoas)
+  - conversation: exemplos de Datasets/intent_examples.json
+  - rulebook: exemplos de Datasets/intent_examples.json
+
+As perguntas do benchmark do RAG (RAG_Docs/benchmark_queries.json) nunca entram
+no treino nem no teste: elas são o conjunto de avaliação da recuperação. O
+relatório só indica quantas delas o classificador encaminharia ao rulebook.
+
+Uma parte estratificada (--test-fraction) fica fora do treino. O script reporta
+acurácia, precisão/recall por classe, matriz de confusão e latência por predição
+(embedding + modelo) nesse conjunto, e salva o artefato e o relatório em JSON.
+Nesse mesmo conjunto é ajustado o limiar de confiança do router: o menor limiar
+em que as predições aceitas atingem --target-precision. Abaixo dele o router
+volta ao caminho antigo.
+
+Uso:
+    python train_intent_classifier.py [--embeddings hashing|ollama] [--test-fraction 0.2] [--seed 42]
+                                      [--target-precision 0.99]
+"""
+
+import argparse
+import glob
+import json
+import os
+import time
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from intent_classifier import (
+    DEFAULT_EMBEDDER, INTENT_MODEL_PATH, LABELS, IntentClassifier, embed_texts, make_embedder, softmax
+)
+
+
+HURIC_PATH = "../Datasets/huric-master/en"
+EXAMPLES_PATH = "../Datasets/intent_examples.json"
+BENCHMARK_QUERIES_PATH = "../RAG_Docs/benchmark_queries.json"
+REPORT_PATH = "../Classifier_XML/intent_classifier_report.json"
+# Limiares candidatos (o limiar é arredondado para cima, em passos de 0.01)
+THRESHOLD_GRID = np.round(np.arange(0.5, 1.0, 0.01), 2)
+
+
+def load_huric_commands(root: str = HURIC_PATH):
+    """Sentenças de todos os comandos do HuRIC (um arquivo .hrc pode ter mais de um)."""
+    sentences = []
+    for path in sorted(glob.glob(os.path.join(root, "*", "*.hrc"))):
+        try:
+            tree = ET.parse(path)
+        except ET.ParseError as e:
+            print(f"Arquivo HuRIC inválido ignorado ({path}): {e}")
+            continue
+        for element in tree.getroot().findall(".//sentence"):
+            if element.text and element.text.strip():
+                sentences.append(element.text.strip())
+    return sentences
+
+
+def load_benchmark_questions(path: str = BENCHMARK_QUERIES_PATH):
+    """Perguntas do benchmark do RAG (lista vazia se o arquivo não existir)."""
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [query["question"] for query in json.load(f)["queries"]]
+
+
+def load_dataset(excluded=()):
+    """
+    Lista de (sentença, rótulo) sem duplicatas (a primeira ocorrência vence).
+    Sentenças em `excluded` (ex.: as perguntas do benchmark) ficam de fora.
+    """
+    with open(EXAMPLES_PATH, "r", encoding="utf-8") as f:
+        examples = json.load(f)
+    samples = [(sentence, "command") for sentence in load_huric_commands()]
+    for label in LABELS:
+        samples.extend((sentence, label) for sentence in examples.get(label, []))
+
+    unique = {sentence.lower().strip(): None for sentence in excluded}
+    for sentence, label in samples:
+        unique.setdefault(sentence.lower().strip(), (sentence, label))
+    return [sample for sample in unique.values() if sample is not None]
+
+
+def stratified_split(labels, test_fraction: float, seed: int):
+    """Índices de treino e teste, com a mesma proporção de cada classe."""
+    rng = np.random.default_rng(seed)
+    train, test = [], []
+    for label in sorted(set(labels)):
+        rows = np.array([i for i, value in enumerate(labels) if value == label])
+        rng.shuffle(rows)
+        n_test = max(1, int(round(len(rows) * test_fraction)))
+        test.extend(rows[:n_test])
+        train.extend(rows[n_test:])
+    return np.array(sorted(train)), np.array(sorted(test))
+
+
+def fit_logistic_regression(vectors: np.ndarray, targets: np.ndarray, n_classes: int,
+                            l2: float = 1e-4, learning_rate: float = 2.0, epochs: int = 400):
+    """
+    Regressão logística multinomial por gradiente descendente em batch, com pesos
+    de classe balanceados (o HuRIC tem muito mais comandos que as outras classes).
+    """
+    n_samples, dimensions = vectors.shape
+    weights = np.zeros((dimensions, n_classes), dtype=np.float32)
+    bias = np.zeros(n_classes, dtype=np.float32)
+    one_hot = np.eye(n_classes, dtype=np.float32)[targets]
+    counts = np.bincount(targets, minlength=n_classes).astype(np.float32)
+    sample_weights = (n_samples / (n_classes * np.maximum(counts, 1)))[targets][:, None]
+
+    for _ in range(epochs):
+        probabilities = softmax(vectors @ weights + bias)
+        error = (probabilities - one_hot) * sample_weights / n_samples
+        weights -= learning_rate * (vectors.T @ error + l2 * weights)
+        bias -= learning_rate * error.sum(axis=0)
+    return weights, bias
+
+
+def tune_threshold(confidences, correct, target_precision: float, grid=THRESHOLD_GRID):
+    """
+    Menor limiar da grade em que as predições com confiança >= limiar acertam
+    pelo menos `target_precision` delas. Retorna (limiar, cobertura, precisão);
+    se nenhum limiar atingir a meta, o maior da grade.
+    """
+    confidences = np.asarray(confidences, dtype=np.float64)
+    correct = np.asarray(correct, dtype=bool)
+    for threshold in grid:
+        accepted = confidences >= threshold
+        if accepted.any() and correct[accepted].mean() >= target_precision:
+            break
+    accepted = confidences >= threshold
+    precision = float(correct[accepted].mean()) if accepted.any() else 1.0
+    return float(threshold), float(accepted.mean()), precision
+
+
+def evaluate(classifier: IntentClassifier, sentences, labels):
+    """Métricas no conjunto de teste e latência de predições individuais."""
+    latencies = []
+    predicted = []
+    confidences = []
+    for sentence in sentences:
+        prediction = classifier.predict(sentence)
+        latencies.append(prediction.seconds * 1000)
+        predicted.append(prediction.label)
+        confidences.append(prediction.confidence)
+
+    names = classifier.labels
+    confusion = np.zeros((len(names), len(names)), dtype=int)
+    for truth, guess in zip(labels, predicted):
+        confusion[names.index(truth), names.index(guess)] += 1
+    per_class = {}
+    for i, name in enumerate(names):
+        support = int(confusion[i].sum())
+        predicted_count = int(confusion[:, i].sum())
+        per_class[name] = {
+            "support": support,
+            "precision": confusion[i, i] / predicted_count if predicted_count else 0.0,
+            "recall": confusion[i, i] / support if support else 0.0,
+        }
+    errors = [(sentence, truth, guess) for sentence, truth, guess in zip(sentences, labels, predicted)
+              if truth != guess]
+    return {
+        "accuracy": float(np.trace(confusion) / max(1, confusion.sum())),
+        "per_class": per_class,
+        "confusion": {"labels": names, "matrix": confusion.tolist()},
+        "latency_ms": {
+            "p50": float(np.percentile(latencies, 50)),
+            "p95": float(np.percentile(latencies, 95)),
+            "max": float(np.max(latencies)),
+        },
+        "confidences": confidences,
+        "correct": [truth == guess for truth, guess in zip(labels, predicted)],
+        "errors": [{"sentence": s, "label": t, "predicted": g} for s, t, g in errors],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Treina o classificador de intenção do router")
+    parser.add_argument("--embeddings", choices=["hashing", "ollama"], default=DEFAULT_EMBEDDER["type"])
+    parser.add_argument("--model", default="nomic-embed-text", help="Modelo do Ollama (com --embeddings ollama)")
+    parser.add_argument("--dimensions", type=int, default=DEFAULT_EMBEDDER["dimensions"],
+                        help="Dimensão do embedder local (com --embeddings hashing)")
+    parser.add_argument("--test-fraction", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--target-precision", type=float, default=0.99,
+                        help="Precisão mínima das predições aceitas pelo router no conjunto de teste")
+    parser.add_argument("--output", default=INTENT_MODEL_PATH)
+    args = parser.parse_args()
+
+    embedder_config = ({"type": "ollama", "model": args.model} if args.embeddings == "ollama"
+                       else {"type": "hashing", "dimensions": args.dimensions})
+    benchmark_questions = load_benchmark_questions()
+    samples = load_dataset(excluded=benchmark_questions)
+    sentences = [sentence for sentence, _ in samples]
+    labels = [label for _, label in samples]
+    counts = {label: labels.count(label) for label in LABELS}
+    print(f"{len(samples)} sentenças: {counts}")
+
+    train_rows, test_rows = stratified_split(labels, args.test_fraction, args.seed)
+    start_time = time.perf_counter()
+    vectors = embed_texts(make_embedder(embedder_config), sentences)
+    targets = np.array([LABELS.index(label) for label in labels])
+    weights, bias = fit_logistic_regression(vectors[train_rows], targets[train_rows], len(LABELS))
+    print(f"Treino com {len(train_rows)} sentenças em {time.perf_counter() - start_time:.2f}s")
+
+    classifier = IntentClassifier(weights, bias, LABELS, embedder_config)
+    report = evaluate(classifier, [sentences[i] for i in test_rows], [labels[i] for i in test_rows])
+    threshold, coverage, precision = tune_threshold(report.pop("confidences"), report.pop("correct"),
+                                                    args.target_precision)
+    classifier.threshold = threshold
+    benchmark_labels = [classifier.predict(question).label for question in benchmark_questions]
+    report.update({
+        "benchmark_routed_to_rulebook": (benchmark_labels.count("rulebook") / len(benchmark_labels)
+                                         if benchmark_labels else None),
+        "threshold": {"value": threshold, "target_precision": args.target_precision,
+                      "coverage": coverage, "precision": precision},
+        "embedder": embedder_config,
+        "train_size": int(len(train_rows)),
+        "test_size": int(len(test_rows)),
+        "seed": args.seed,
+    })
+
+    print(f"Acurácia no teste ({len(test_rows)} sentenças): {report['accuracy']:.3f}")
+    for name, metrics in report["per_class"].items():
+        print(f"  {name:13} precisão {metrics['precision']:.3f}  recall {metrics['recall']:.3f}  "
+              f"(n={metrics['support']})")
+    print(f"Limiar de confiança {threshold:.2f}: o classificador decide {coverage:.1%} do teste "
+          f"com precisão {precision:.3f}; o resto vai para o caminho antigo do router")
+    latency = report["latency_ms"]
+    print(f"Latência por predição: p50 {latency['p50']:.2f} ms, p95 {latency['p95']:.2f} ms")
+    if benchmark_labels:
+        print(f"Perguntas do benchmark do RAG classificadas como rulebook: "
+              f"{report['benchmark_routed_to_rulebook']:.3f} ({len(benchmark_labels)} perguntas, fora do treino)")
+    for error in report["errors"]:
+        print(f"  erro: {error['sentence']!r} ({error['label']} -> {error['predicted']})")
+
+    classifier.save(args.output)
+    with open(REPORT_PATH, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Modelo salvo em {args.output} (relatório em {REPORT_PATH})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+"""
+Vector Utils - Operações comuns sobre matrizes de embeddings, compartilhadas
+pelo backend NumPy, pelo índice particionado, pelo reranking, pelo cache de
+respostas e pelo classificador de intenção.
+"""
+
+import numpy as np
+
+
+def normalize_rows(vectors) -> np.ndarray:
+    """
+    Normaliza as linhas (norma L2) em float32, para que o produto interno seja o
+    cosseno. Um vetor 1-D vira uma matriz de uma linha; linhas nulas ficam nulas.
+    """
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms